@@ -0,0 +1,104 @@
+from collections import deque
+from typing import Deque, Optional, Tuple
+import time
+import structlog
+from app.core.metrics import circuit_breaker_state, circuit_breaker_transitions_total
+
+logger = structlog.get_logger()
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Gauge value of each state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when every breaker guarding a call is open."""
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a rolling time window, with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 60.0,
+        min_requests: int = 5,
+        failure_rate: float = 0.5,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 1
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.probes = 0  # half-open calls in flight
+        self._results: Deque[Tuple[float, bool]] = deque()
+        circuit_breaker_state.labels(name=name).set(STATE_VALUES[CLOSED])
+
+    def allow_request(self) -> bool:
+        """Allow calls while closed, none while open, and a few probe calls once half-open."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.probes >= self.half_open_calls:
+                return False
+            self.probes += 1
+        return True
+
+    def record_success(self) -> None:
+        """Record a successful call; a successful probe closes the breaker."""
+        if self.state == HALF_OPEN:
+            self.probes = max(self.probes - 1, 0)
+            self._results.clear()
+            self._transition(CLOSED)
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        """Record a failed call; trip when the window's failure rate reaches the threshold."""
+        if self.state == HALF_OPEN:
+            self.probes = max(self.probes - 1, 0)
+            self.trip()
+            return
+        self._record(False)
+
+        failures = sum(1 for _, ok in self._results if not ok)
+        if self.state == CLOSED and len(self._results) >= self.min_requests \
+                and failures / len(self._results) >= self.failure_rate:
+            self.trip()
+
+    def release(self) -> None:
+        """Forget a call that was abandoned before it finished, e.g. a cancelled hedge."""
+        if self.state == HALF_OPEN:
+            self.probes = max(self.probes - 1, 0)
+
+    def trip(self) -> None:
+        """Open the breaker."""
+        self.opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _record(self, ok: bool) -> None:
+        """Add a call result and drop results older than the window."""
+        now = time.monotonic()
+        self._results.append((now, ok))
+        while self._results and now - self._results[0][0] > self.window_seconds:
+            self._results.popleft()
+
+    def _transition(self, state: str) -> None:
+        """Switch state and export it."""
+        if state == self.state:
+            return
+        logger.warning("Circuit breaker state changed", breaker=self.name, previous=self.state, state=state)
+        self.state = state
+        circuit_breaker_state.labels(name=self.name).set(STATE_VALUES[state])
+        circuit_breaker_transitions_total.labels(name=self.name, state=state).inc()
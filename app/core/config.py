@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import List, Optional, Dict
 import os
 
 
@@ -24,6 +24,49 @@ class Settings(BaseSettings):
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
+    redis_socket_timeout: float = 1.0
+    redis_failure_threshold: int = 3  # consecutive failures before Redis is marked down
+    redis_probe_interval: float = 5.0  # seconds between background pings while down
+    redis_max_connections: int = 50
+    cache_compression_threshold: int = 1024  # bytes; larger values are zstd-compressed
+    
+    # In-process cache (L1 in front of Redis)
+    cache_l1_max_size: int = 1024
+    cache_l1_ttl: int = 30
+    cache_version_l1_ttl: int = 1  # seconds a session version is trusted without asking Redis
+    
+    # Read-endpoint caching policy
+    cache_active_ttl: int = 60  # TTL for data of sessions still being processed
+    cache_completed_ttl: Optional[int] = None  # completed sessions are immutable; None = no expiry
+    cache_heatmap_max_cells: int = 262144  # larger heatmap matrices are not cached
+    report_cache_ttl: int = 604800  # generated reports are content-addressed; Redis keeps them a week
+    
+    # Report jobs
+    report_job_workers: int = 4
+    report_job_concurrency: Dict[str, int] = {"ollama": 1, "openai": 8}  # concurrent LLM calls per provider and API process
+    report_job_lease_timeout: float = 120.0  # seconds without a heartbeat before a running job counts as orphaned and is re-queued
+    report_batch_concurrency: int = 4  # parallel LLM calls of one batch request
+    report_batch_max_sessions: int = 1000
+    
+    # Video analysis jobs
+    analysis_mode: str = "inline"  # inline (BackgroundTasks of the API process), redis (stream consumed by run.py --role worker) or local (in-process queue)
+    analysis_stream: str = "analysis:jobs"
+    analysis_dead_letter_stream: str = "analysis:jobs:dead"
+    analysis_stream_maxlen: int = 100000  # approximate trim of acknowledged entries
+    analysis_consumer_group: str = "analysis-workers"
+    analysis_visibility_timeout: float = 300.0  # seconds without a heartbeat before another worker takes the job over
+    analysis_heartbeat_interval: float = 30.0
+    analysis_max_attempts: int = 3
+    analysis_worker_concurrency: int = 1  # jobs per worker process
+    analysis_worker_metrics_port: Optional[int] = None  # Prometheus endpoint of a worker process
+    analysis_drain_timeout: float = 20.0  # seconds a stopping process gives running analyses to checkpoint and mark themselves interrupted
+    analysis_cancel_poll_interval: float = 1.0  # seconds between session status checks for cancellations from other processes
+    
+    # Live updates (WebSocket /ws/sessions/{id})
+    live_update_interval: float = 0.2  # seconds between live state pushes of one analysis; 0 pushes every frame
+    live_channel_prefix: str = "live:session:"  # Redis pub/sub channel of a session in redis analysis mode
+    live_last_update_ttl: int = 60  # seconds the latest state is kept for viewers that connect later
+    live_send_timeout: float = 10.0  # seconds a viewer may block one send before it is disconnected
     
     # Video Processing
     video_source: str = "file"  # webcam, file, or rtsp
@@ -34,6 +77,27 @@ class Settings(BaseSettings):
     yolo_model: str = "yolov8n.pt"
     confidence_threshold: float = 0.5
     iou_threshold: float = 0.45
+    yolo_preload: bool = False  # load YOLO on startup instead of on the first analyzed frame
+    
+    # Heatmap aggregation
+    heatmap_grid_width: int = 256
+    heatmap_grid_height: int = 256
+    heatmap_bucket_seconds: int = 60  # 0 disables per-time-bucket grids
+    heatmap_tile_size: int = 64
+    heatmap_tile_granularities: List[str] = ["minute", "hour"]  # empty list disables the tile pyramid
+    
+    # Tracking
+    tracking_iou_threshold: float = 0.3  # minimum box overlap for a detection to continue a track of the simple tracker
+    tracking_max_distance: float = 1.0  # without overlap, maximum centroid distance to continue a track, in diagonals of its box
+    tracking_max_age: float = 0.5  # seconds of video time a track of the simple tracker survives without a matching detection
+    
+    # Zones
+    zone_mask_scale: float = 0.25  # resolution of rasterized zone masks relative to the frame
+    zone_track_ttl_frames: int = 30  # frames the last position of an unseen track is kept, so crossings during missed detections still count
+    
+    # Persistence
+    bulk_write_batch_size: int = 1000
+    pipeline_checkpoint_interval: float = 30.0  # seconds between commits of pipeline output with a resumable checkpoint; 0 disables checkpoints
     
     # LLM Configuration
     llm_provider: str = "ollama"  # ollama or openai
@@ -42,6 +106,44 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-3.5-turbo"
     
+    # LLM HTTP client (one pooled client per process)
+    llm_connect_timeout: float = 5.0
+    llm_read_timeout: float = 120.0  # generation can take a while
+    llm_write_timeout: float = 10.0
+    llm_pool_timeout: float = 10.0  # wait for a free connection
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 20  # keep every pooled connection warm
+    llm_keepalive_expiry: float = 30.0
+    llm_http2: bool = True  # used only when the h2 package is installed
+    
+    # Prompt budget
+    llm_max_prompt_tokens: int = 1024
+    llm_report_max_tokens: int = 600  # sent as num_predict (Ollama) / max_tokens (OpenAI)
+    llm_summary_max_tokens: int = 150
+    ollama_keep_alive: str = "30m"  # keep the model and its prompt cache loaded between calls
+    
+    # LLM resilience
+    llm_secondary_provider: Optional[str] = None  # ollama or openai; hedged when the primary is slow
+    llm_hedge_delay: float = 15.0  # seconds before the secondary provider is called as well
+    llm_breaker_window: float = 60.0  # seconds of call results the failure rate is computed over
+    llm_breaker_min_requests: int = 5
+    llm_breaker_failure_rate: float = 0.5
+    llm_breaker_open_seconds: float = 30.0  # template fallback only, then a probe call
+    llm_breaker_half_open_calls: int = 1
+    
+    # Profiling (opt-in; endpoints and the X-Profile header need the admin key)
+    profiling_enabled: bool = False
+    admin_api_key: Optional[str] = None
+    x_admin_key_header: str = "X-ADMIN-KEY"
+    x_profile_header: str = "X-Profile"
+    profiling_max_seconds: int = 60
+    profiling_sample_interval: float = 0.005
+    profiling_tracemalloc_frames: int = 10
+    profiling_keep_requests: int = 20  # cProfile reports of recent X-Profile requests
+    
+    # Metrics
+    metrics_max_label_values: int = 200  # further values of a label collapse into one overflow series
+    
     # Logging
     log_level: str = "INFO"
     log_format: str = "json"
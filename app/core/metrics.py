@@ -1,6 +1,47 @@
 """Prometheus metrics definitions."""
 
-from prometheus_client import Counter, Histogram
+from typing import Set
+from prometheus_client import Counter, Histogram, Gauge
+from app.core.config import settings
+
+# Label value shared by every value past a guard's limit
+OVERFLOW_LABEL = "__overflow__"
+
+# Endpoint label of requests that matched no route (404s, scanners)
+UNMATCHED_ROUTE = "__unmatched__"
+
+# Bucket layouts; the client default tops out at 10s, too low for LLM calls
+HTTP_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LLM_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+label_overflow_total = Counter(
+    'metrics_label_overflow_total',
+    'Label values collapsed into the overflow series because the label hit its limit',
+    ['label']
+)
+
+
+class LabelGuard:
+    """Caps the distinct values of a label; values past the limit share one overflow series."""
+    
+    def __init__(self, label: str, max_values: int = None):
+        self.label = label
+        self.max_values = max_values or settings.metrics_max_label_values
+        self.values: Set[str] = set()
+    
+    def __call__(self, value) -> str:
+        value = str(value)
+        if value in self.values:
+            return value
+        if len(self.values) < self.max_values:
+            self.values.add(value)
+            return value
+        label_overflow_total.labels(label=self.label).inc()
+        return OVERFLOW_LABEL
+
+
+endpoint_label = LabelGuard("endpoint")
+class_name_label = LabelGuard("class_name")
 
 # HTTP request metrics
 http_requests_total = Counter(
@@ -12,7 +53,8 @@ http_requests_total = Counter(
 http_request_duration_seconds = Histogram(
     'http_request_duration_seconds',
     'HTTP request duration',
-    ['method', 'endpoint']
+    ['method', 'endpoint'],
+    buckets=HTTP_DURATION_BUCKETS
 )
 
 # Video analysis metrics
@@ -25,8 +67,7 @@ video_analysis_total = Counter(
 # Frame processing metrics
 frames_processed_total = Counter(
     'frames_processed_total',
-    'Total frames processed',
-    ['session_id']
+    'Total frames processed'
 )
 
 # Detection metrics
@@ -36,3 +77,122 @@ detections_total = Counter(
     ['class_name']
 )
 
+
+# Outbound LLM HTTP client metrics
+llm_http_requests_in_flight = Gauge(
+    'llm_http_requests_in_flight',
+    'LLM HTTP requests currently in flight',
+    ['client']
+)
+
+llm_http_request_duration_seconds = Histogram(
+    'llm_http_request_duration_seconds',
+    'LLM HTTP request duration',
+    ['client', 'method', 'status'],
+    buckets=LLM_DURATION_BUCKETS
+)
+
+llm_http_pool_connections = Gauge(
+    'llm_http_pool_connections',
+    'Connections held by the LLM HTTP client pool',
+    ['client', 'state']
+)
+
+# Report job metrics
+report_jobs_queue_depth = Gauge(
+    'report_jobs_queue_depth',
+    'Report jobs waiting for a worker'
+)
+
+report_jobs_total = Counter(
+    'report_jobs_total',
+    'Report jobs by outcome',
+    ['status']
+)
+
+report_job_wait_seconds = Histogram(
+    'report_job_wait_seconds',
+    'Time report jobs spend queued before a worker starts them',
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+report_job_generation_seconds = Histogram(
+    'report_job_generation_seconds',
+    'Time spent generating a report job',
+    ['provider'],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+# Video analysis job queue metrics
+analysis_jobs_total = Counter(
+    'analysis_jobs_total',
+    'Video analysis jobs by outcome',
+    ['status']
+)
+
+analysis_job_wait_seconds = Histogram(
+    'analysis_job_wait_seconds',
+    'Time analysis jobs spend queued before a worker starts them',
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+# Circuit breaker metrics
+circuit_breaker_state = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['name']
+)
+
+circuit_breaker_transitions_total = Counter(
+    'circuit_breaker_transitions_total',
+    'Circuit breaker state transitions',
+    ['name', 'state']
+)
+
+# LLM resilience metrics
+llm_fallback_total = Counter(
+    'llm_fallback_total',
+    'LLM calls answered from the template fallback',
+    ['operation', 'reason']
+)
+
+llm_hedged_requests_total = Counter(
+    'llm_hedged_requests_total',
+    'Secondary provider calls started because the primary was slow or failed',
+    ['provider', 'reason']
+)
+
+# Video pipeline metrics
+pipeline_stage_duration_seconds = Histogram(
+    'pipeline_stage_duration_seconds',
+    'Time spent in each stage of the video analysis pipeline, per frame or flush',
+    ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+pipeline_sessions_in_flight = Gauge(
+    'pipeline_sessions_in_flight',
+    'Video analysis sessions currently being processed'
+)
+
+pipeline_queue_depth = Gauge(
+    'pipeline_queue_depth',
+    'Items held by the video pipeline waiting to be persisted',
+    ['queue']
+)
+
+pipeline_frames_per_second = Gauge(
+    'pipeline_frames_per_second',
+    'Frames per second achieved by all sessions being processed'
+)
+
+# Live update metrics
+live_viewers = Gauge(
+    'live_viewers',
+    'WebSocket viewers of live session updates connected to this process'
+)
+
+live_updates_dropped_total = Counter(
+    'live_updates_dropped_total',
+    'Live updates skipped because a viewer had not taken the previous one yet'
+)
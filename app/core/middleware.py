@@ -2,12 +2,29 @@ from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
+from typing import Optional
+import secrets
 import structlog
 from app.core.config import settings
 
 logger = structlog.get_logger()
 
 
+def has_admin_key(request: Request) -> bool:
+    """Whether the request carries the admin API key; always False while none is configured."""
+    admin_key = request.headers.get(settings.x_admin_key_header)
+    if not settings.admin_api_key or not admin_key:
+        return False
+    return secrets.compare_digest(admin_key, settings.admin_api_key)
+
+
+def has_api_key(api_key: Optional[str]) -> bool:
+    """Whether a key is the API key; for connections the HTTP middleware does not see (WebSockets)."""
+    if not api_key:
+        return False
+    return secrets.compare_digest(api_key, settings.api_key)
+
+
 class APIKeyMiddleware(BaseHTTPMiddleware):
     """Middleware for API key authentication (аналог VerifyTelegramApiKey)."""
     
@@ -152,12 +169,14 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
 class PrometheusMetricsMiddleware(BaseHTTPMiddleware):
     """Middleware to collect Prometheus metrics."""
     
+    # Anything else collapses into OTHER
+    METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+    
     async def dispatch(self, request: Request, call_next):
         import time
-        from app.core.metrics import http_requests_total, http_request_duration_seconds
+        from app.core.metrics import http_requests_total, http_request_duration_seconds, endpoint_label
         
-        method = request.method
-        path = request.url.path
+        method = request.method if request.method in self.METHODS else "OTHER"
         start_time = time.time()
         
         # Process request
@@ -166,8 +185,55 @@ class PrometheusMetricsMiddleware(BaseHTTPMiddleware):
         # Record metrics
         status_code = response.status_code
         duration = time.time() - start_time
+        endpoint = endpoint_label(self.route_template(request))
+        
+        http_requests_total.labels(method=method, endpoint=endpoint, status=status_code).inc()
+        http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
+        
+        return response
+    
+    @staticmethod
+    def route_template(request: Request) -> str:
+        """Path template of the matched route, e.g. /api/v1/video/analyze/{session_id}."""
+        from app.core.metrics import UNMATCHED_ROUTE
+        
+        # The router stores the matched route in the scope shared with this middleware
+        route = request.scope.get("route")
+        return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """Runs admin requests sent with the X-Profile header under cProfile.
+    
+    The report is stored in memory and its id returned in X-Profile-Id. cProfile sees the
+    whole event loop thread, so coroutines of concurrent requests show up too, while sync
+    endpoints run in worker threads and are not covered.
+    """
+    
+    async def dispatch(self, request: Request, call_next):
+        if not request.headers.get(settings.x_profile_header) or not has_admin_key(request):
+            return await call_next(request)
+        
+        import cProfile
+        from app.core.profiling import profiler_lock, request_profiles
         
-        http_requests_total.labels(method=method, endpoint=path, status=status_code).inc()
-        http_request_duration_seconds.labels(method=method, endpoint=path).observe(duration)
+        if not profiler_lock.acquire(blocking=False):
+            response = await call_next(request)
+            response.headers[settings.x_profile_header] = "busy"
+            return response
         
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                response = await call_next(request)
+            finally:
+                profile.disable()
+        finally:
+            profiler_lock.release()
+        
+        report = request_profiles.add(profile, f"{request.method} {request.url.path}")
+        response.headers["X-Profile-Id"] = report["id"]
+        response.headers["X-Profile-Summary"] = f"total={report['total_seconds']:.4f}s calls={report['calls']}"
+        logger.info("Request profiled", path=request.url.path, profile_id=report["id"], total_seconds=report["total_seconds"])
         return response
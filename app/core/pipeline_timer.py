@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
+import time
+from app.core.metrics import (
+    pipeline_stage_duration_seconds,
+    pipeline_sessions_in_flight,
+    pipeline_queue_depth,
+    pipeline_frames_per_second
+)
+
+PIPELINE_STAGES = ("decode", "preprocess", "inference", "postprocess", "tracking", "db_flush")
+
+
+class PipelineTimer:
+    """Times the stages of one analysis session for Prometheus and for its stored timing summary.
+
+    Gauges are process-wide, so each session adds its own share and takes it back in close().
+    """
+
+    def __init__(self, fps_window: float = 1.0):
+        self.fps_window = fps_window
+        self.started = time.perf_counter()
+        self.frames = 0
+        self.totals: Dict[str, float] = {stage: 0.0 for stage in PIPELINE_STAGES}
+        self.counts: Dict[str, int] = {stage: 0 for stage in PIPELINE_STAGES}
+        self.fps = 0.0
+        self._queue_depths: Dict[str, int] = {}
+        self._window_started = self.started
+        self._window_frames = 0
+        pipeline_sessions_in_flight.inc()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as one run of a stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one run of a stage."""
+        pipeline_stage_duration_seconds.labels(stage=name).observe(seconds)
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def observe_speed(self, speed: Dict[str, float]) -> None:
+        """Record detector-reported stage times in milliseconds, e.g. ultralytics result.speed."""
+        for name, milliseconds in speed.items():
+            if milliseconds is not None:
+                self.observe(name, milliseconds / 1000)
+
+    def frame_done(self) -> None:
+        """Count a processed frame and refresh the FPS gauge once per window."""
+        self.frames += 1
+        self._window_frames += 1
+
+        now = time.perf_counter()
+        elapsed = now - self._window_started
+        if elapsed >= self.fps_window:
+            self._set_fps(self._window_frames / elapsed)
+            self._window_started = now
+            self._window_frames = 0
+
+    def set_queue_depth(self, queue: str, depth: int) -> None:
+        """Report how many items of a queue this session currently holds."""
+        previous = self._queue_depths.get(queue, 0)
+        if depth != previous:
+            pipeline_queue_depth.labels(queue=queue).inc(depth - previous)
+            self._queue_depths[queue] = depth
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage totals and means for the session, stored on VideoSession."""
+        wall_seconds = time.perf_counter() - self.started
+        return {
+            "frames": self.frames,
+            "wall_seconds": round(wall_seconds, 3),
+            "fps": round(self.frames / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "stages": {
+                name: {
+                    "total_seconds": round(total, 4),
+                    "mean_ms": round(total / self.counts[name] * 1000, 3) if self.counts[name] else 0.0,
+                    "count": self.counts[name]
+                }
+                for name, total in self.totals.items()
+            }
+        }
+
+    def close(self) -> None:
+        """Withdraw this session from the process-wide gauges."""
+        self._set_fps(0.0)
+        for queue in list(self._queue_depths):
+            self.set_queue_depth(queue, 0)
+        pipeline_sessions_in_flight.dec()
+
+    def _set_fps(self, fps: float) -> None:
+        """Replace this session's share of the aggregate FPS gauge."""
+        pipeline_frames_per_second.inc(fps - self.fps)
+        self.fps = fps
@@ -0,0 +1,177 @@
+"""On-demand profiling: stack sampling, tracemalloc diffs and per-request cProfile."""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# One profiler at a time: concurrent samplers skew each other and only one cProfile can be enabled per thread
+profiler_lock = threading.Lock()
+
+
+class StackSampler:
+    """Statistical profiler that samples the Python stacks of all threads from a background thread.
+
+    Thread-based rather than signal-based, so it also sees the event loop thread while it runs
+    synchronous pipeline code, and needs no signal handler in the main thread.
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or settings.profiling_sample_interval
+        self.samples = 0
+
+    def run(self, seconds: float) -> Counter:
+        """Sample for the given time; returns collapsed stack -> sample count."""
+        stacks: Counter = Counter()
+        own_thread = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stacks[self.collapse(thread_names.get(thread_id, str(thread_id)), frame)] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+        return stacks
+
+    @staticmethod
+    def collapse(thread_name: str, frame) -> str:
+        """Stack as 'thread;outer;...;inner', the collapsed format of flamegraph.pl and speedscope."""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ":"))
+            frame = frame.f_back
+        names.append(thread_name.replace(";", ":"))
+        return ";".join(reversed(names))
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """One 'stack count' line per stack, most sampled first."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_functions(stacks: Counter, limit: int = 25) -> List[Dict[str, Any]]:
+    """Functions by samples spent in them (self) and under them (total)."""
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += count
+        for function in set(frames):
+            total[function] += count
+
+    return [
+        {"function": function, "self_samples": samples, "total_samples": total[function]}
+        for function, samples in own.most_common(limit)
+    ]
+
+
+class MemoryTracker:
+    """tracemalloc baseline snapshot and the allocation growth since it."""
+
+    def __init__(self, frames: int = None):
+        self.frames = frames or settings.profiling_tracemalloc_frames
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_at: Optional[float] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Start tracing if needed and take a new baseline."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.warning("tracemalloc started; allocations are slower until it is stopped")
+
+        self.baseline = self._take()
+        self.baseline_at = time.time()
+        current, peak = tracemalloc.get_traced_memory()
+        return {"traced_bytes": current, "peak_bytes": peak, "frames": tracemalloc.get_traceback_limit()}
+
+    def diff(self, limit: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+        """Largest allocation changes since the baseline."""
+        if self.baseline is None or not tracemalloc.is_tracing():
+            raise ValueError("No baseline snapshot; take one first")
+
+        stats = self._take().compare_to(self.baseline, group_by)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "seconds_since_baseline": round(time.time() - self.baseline_at, 1),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "size_diff_total": sum(stat.size_diff for stat in stats),
+            "top": [
+                {
+                    "location": str(stat.traceback),
+                    "size_diff": stat.size_diff,
+                    "size": stat.size,
+                    "count_diff": stat.count_diff,
+                    "count": stat.count,
+                    **({"traceback": stat.traceback.format()} if group_by == "traceback" else {})
+                }
+                for stat in stats[:limit]
+            ]
+        }
+
+    def stop(self) -> None:
+        """Stop tracing and drop the baseline."""
+        tracemalloc.stop()
+        self.baseline = None
+        self.baseline_at = None
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        """Snapshot without tracemalloc's own and import machinery allocations."""
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+        ))
+
+
+class RequestProfiles:
+    """Recent per-request cProfile reports, kept in memory for the admin to fetch."""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or settings.profiling_keep_requests
+        self._reports: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile, label: str, limit: int = 40) -> Dict[str, Any]:
+        """Store a profile's report; returns its id, total time and call count."""
+        output = io.StringIO()
+        stats = pstats.Stats(profile, stream=output)
+        output.write(f"{label}\n\n")
+        stats.sort_stats("cumulative").print_stats(limit)
+
+        profile_id = uuid.uuid4().hex
+        with self._lock:
+            self._reports[profile_id] = output.getvalue()
+            while len(self._reports) > self.max_size:
+                self._reports.popitem(last=False)
+
+        return {"id": profile_id, "total_seconds": stats.total_tt, "calls": stats.total_calls}
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """Report text of a stored profile."""
+        with self._lock:
+            return self._reports.get(profile_id)
+
+
+# Process-wide instances used by the admin routes and the profiling middleware
+memory_tracker = MemoryTracker()
+request_profiles = RequestProfiles()
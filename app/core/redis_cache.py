@@ -1,107 +1,532 @@
-"""Redis cache service for analytics data."""
+"""Two-tier cache: in-process LRU (L1) in front of Redis (L2)."""
 
+import asyncio
+import inspect
 import json
-import redis
-from typing import Optional, Dict, Any
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import redis.asyncio as redis
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, List
 from app.core.config import settings
 import structlog
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional speedup
+    zstandard = None
+
 logger = structlog.get_logger()
 
+# One-byte header of every cached value: how the JSON payload was compressed
+CODEC_PLAIN = b"\x00"
+CODEC_ZSTD = b"\x01"
+CODEC_ZLIB = b"\x02"
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+# Marker of a cached payload that could not be decoded
+_UNDECODABLE = object()
+
+
+def encode_value(value: Any, compression_threshold: int = None) -> bytes:
+    """Serialize a value to JSON bytes, compressing payloads above the threshold."""
+    threshold = compression_threshold or settings.cache_compression_threshold
+    if orjson is not None:
+        payload = orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        payload = json.dumps(value, default=str).encode("utf-8")
+
+    if len(payload) <= threshold:
+        return CODEC_PLAIN + payload
+    if _zstd_compressor is not None:
+        return CODEC_ZSTD + _zstd_compressor.compress(payload)
+    return CODEC_ZLIB + zlib.compress(payload, 3)
+
+
+def decode_value(raw: bytes) -> Any:
+    """Deserialize a value written by encode_value."""
+    codec, payload = raw[:1], raw[1:]
+    if codec == CODEC_ZSTD:
+        if _zstd_decompressor is None:
+            raise ValueError("zstandard is required to read this cache entry")
+        payload = _zstd_decompressor.decompress(payload)
+    elif codec == CODEC_ZLIB:
+        payload = zlib.decompress(payload)
+    elif codec != CODEC_PLAIN:
+        # Entries written before values had a header are plain JSON
+        payload = raw
+
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+class LRUCache:
+    """Bounded in-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_size: int = None, default_ttl: int = None):
+        self.max_size = max_size or settings.cache_l1_max_size
+        self.default_ttl = default_ttl or settings.cache_l1_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Get (hit, value) for a key, dropping it if expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        ttl = min(ttl, self.default_ttl) if ttl else self.default_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove a key."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all keys."""
+        with self._lock:
+            self._entries.clear()
+
+
+class CacheEntry:
+    """Loader result that carries its own TTL (None caches without expiry).
+
+    With store=False the value is returned to callers but not cached.
+    """
+
+    def __init__(self, value: Any, ttl: Optional[int], store: bool = True):
+        self.value = value
+        self.ttl = ttl
+        self.store = store
+
+
+def session_cache_ttl(status: str) -> Optional[int]:
+    """TTL for cached data of a session: completed sessions never change."""
+    if status == "completed":
+        return settings.cache_completed_ttl
+    return settings.cache_active_ttl
+
+
+class RedisCircuitBreaker:
+    """Marks Redis down after repeated failures; the background ping started on connect marks it up again."""
+
+    def __init__(self, failure_threshold: int = None, probe_interval: float = None):
+        self.failure_threshold = failure_threshold or settings.redis_failure_threshold
+        self.probe_interval = probe_interval or settings.redis_probe_interval
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_open(self) -> bool:
+        """Whether Redis is currently marked down."""
+        return self.opened_at is not None
+
+    def allow_request(self) -> bool:
+        """Allow requests while closed; while open only the background probe talks to Redis."""
+        return self.opened_at is None
+
+    def record_success(self) -> None:
+        """Reset the failure counter and close the breaker."""
+        if self.opened_at is not None:
+            logger.info("Redis is back up")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failure and trip the breaker once the threshold is reached."""
+        self.failures += 1
+        if self.failures >= self.failure_threshold and self.opened_at is None:
+            self.trip()
+
+    def trip(self) -> None:
+        """Mark Redis as down."""
+        self.opened_at = time.monotonic()
+        logger.warning("Redis marked as down", failures=self.failures)
+
+    def start_probe(self, ping: Callable[[], Awaitable[Any]]) -> None:
+        """Start pinging Redis in the background whenever it is marked down."""
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe(ping), name="redis-probe")
+
+    async def stop_probe(self) -> None:
+        """Stop the background probe."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    async def _probe(self, ping: Callable[[], Awaitable[Any]]) -> None:
+        """Ping once per probe interval while open; no user request waits on a down Redis."""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            if self.opened_at is None:
+                continue
+            try:
+                await ping()
+            except Exception as e:
+                logger.debug("Redis probe failed", error=str(e))
+                continue
+            self.record_success()
+
 
 class RedisCache:
     """Redis cache service for storing and retrieving analytics data."""
-    
+
+    SESSIONS_VERSION_KEY = "cache:version:sessions"
+
     def __init__(self):
-        """Initialize Redis connection."""
-        try:
-            self.client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                db=settings.redis_db,
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5
-            )
-            # Test connection
-            self.client.ping()
-            self.enabled = True
-            logger.info("Redis connection established")
-        except Exception as e:
-            logger.warning("Redis not available, falling back to no-cache", error=str(e))
-            self.client = None
-            self.enabled = False
-    
-    def is_enabled(self) -> bool:
-        """Check if Redis is enabled and available."""
-        if not self.enabled or not self.client:
-            return False
+        """Initialize L1 cache and the shared Redis connection pool."""
+        self.l1 = LRUCache()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.breaker = RedisCircuitBreaker()
+        self.enabled = True
+
+        # The pool connects lazily, so constructing it never blocks on Redis
+        self.pool = redis.ConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            max_connections=settings.redis_max_connections,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            socket_timeout=settings.redis_socket_timeout
+        )
+        self.client = redis.Redis(connection_pool=self.pool)
+
+    async def connect(self) -> bool:
+        """Check the Redis connection on startup and start the recovery probe."""
+        self.breaker.start_probe(self.client.ping)
         try:
-            self.client.ping()
+            await self.client.ping()
+            self.breaker.record_success()
+            logger.info("Redis connection established", max_connections=settings.redis_max_connections)
             return True
-        except:
+        except Exception as e:
+            # Requests fall back to the in-process cache until the probe reaches Redis
+            logger.warning("Redis not available, falling back to in-process cache", error=str(e))
+            self.breaker.trip()
             return False
-    
-    def get(self, key: str) -> Optional[Any]:
+
+    async def close(self) -> None:
+        """Stop the probe and close all pooled connections."""
+        await self.breaker.stop_probe()
+        await self.client.aclose()
+        await self.pool.disconnect()
+
+    def is_enabled(self) -> bool:
+        """Check if Redis is enabled and not marked down (no network round-trip)."""
+        return self.enabled and not self.breaker.is_open
+
+    def _allow_request(self) -> bool:
+        """Whether this call may go to Redis."""
+        return self.enabled and self.breaker.allow_request()
+
+    async def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
-        if not self.is_enabled():
+        hit, value = self.l1.get(key)
+        if hit:
+            return value
+
+        if not self._allow_request():
             return None
-        
+
         try:
-            value = self.client.get(key)
-            if value:
-                return json.loads(value)
-            return None
+            raw = await self.client.get(key)
+            self.breaker.record_success()
         except Exception as e:
+            self.breaker.record_failure()
             logger.error("Failed to get from cache", key=key, error=str(e))
             return None
-    
-    def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
-        """Set value in cache with TTL."""
-        if not self.is_enabled():
+
+        if not raw:
+            return None
+        value = self._decode(key, raw)
+        if value is _UNDECODABLE:
+            await self.delete(key)
+            return None
+        self.l1.set(key, value)
+        return value
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = 3600,
+        session_id: Optional[str] = None
+    ) -> bool:
+        """Set value in cache with TTL (None keeps it until invalidated)."""
+        self.l1.set(key, value, ttl)
+
+        if not self._allow_request():
             return False
-        
+
         try:
-            self.client.setex(
-                key,
-                ttl,
-                json.dumps(value, default=str)
-            )
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.set(key, encode_value(value), ex=ttl)
+                if session_id:
+                    # Index of the session's keys, so clearing it needs no key scan. It lives as long as
+                    # its longest-lived entry: entries of a session only go from expiring (active) to
+                    # never expiring (completed), never back
+                    index_key = self._session_index_key(session_id)
+                    pipe.sadd(index_key, key)
+                    if ttl is None:
+                        pipe.persist(index_key)
+                    else:
+                        pipe.expire(index_key, ttl, nx=True)
+                        pipe.expire(index_key, ttl, gt=True)
+                await pipe.execute()
+            self.breaker.record_success()
             return True
         except Exception as e:
+            self.breaker.record_failure()
             logger.error("Failed to set cache", key=key, error=str(e))
             return False
-    
-    def delete(self, key: str) -> bool:
+
+    async def delete(self, key: str) -> bool:
         """Delete key from cache."""
-        if not self.is_enabled():
+        return await self.delete_many([key])
+
+    async def mget(self, keys: List[str]) -> Dict[str, Any]:
+        """Get many values in one round-trip; missing keys are left out of the result."""
+        values: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            hit, value = self.l1.get(key)
+            if hit:
+                values[key] = value
+            else:
+                missing.append(key)
+
+        if not missing or not self._allow_request():
+            return values
+
+        try:
+            raws = await self.client.mget(missing)
+            self.breaker.record_success()
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error("Failed to get many from cache", keys=len(missing), error=str(e))
+            return values
+
+        undecodable = []
+        for key, raw in zip(missing, raws):
+            if not raw:
+                continue
+            value = self._decode(key, raw)
+            if value is _UNDECODABLE:
+                undecodable.append(key)
+                continue
+            self.l1.set(key, value)
+            values[key] = value
+
+        if undecodable:
+            await self.delete_many(undecodable)
+        return values
+
+    @staticmethod
+    def _decode(key: str, raw: bytes) -> Any:
+        """Decode a cached payload; a corrupt or old-format one is a miss, not a Redis failure."""
+        try:
+            return decode_value(raw)
+        except Exception as e:
+            logger.warning("Dropping undecodable cache entry", key=key, error=str(e))
+            return _UNDECODABLE
+
+    async def mset(self, items: Dict[str, Any], ttl: int = 3600) -> bool:
+        """Set many values with TTL in one pipelined round-trip."""
+        for key, value in items.items():
+            self.l1.set(key, value, ttl)
+
+        if not items or not self._allow_request():
             return False
-        
+
         try:
-            self.client.delete(key)
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(key, ttl, encode_value(value))
+                await pipe.execute()
+            self.breaker.record_success()
             return True
         except Exception as e:
-            logger.error("Failed to delete from cache", key=key, error=str(e))
+            self.breaker.record_failure()
+            logger.error("Failed to set many in cache", keys=len(items), error=str(e))
             return False
-    
-    def clear_session_cache(self, session_id: str) -> bool:
-        """Clear all cache entries for a session."""
-        if not self.is_enabled():
+
+    async def delete_many(self, keys: List[str]) -> bool:
+        """Delete many keys in one pipelined round-trip."""
+        for key in keys:
+            self.l1.delete(key)
+
+        if not keys or not self._allow_request():
             return False
-        
+
         try:
-            # Clear analytics cache
-            self.delete(f"analytics:{session_id}")
-            # Clear heatmap cache
-            self.delete(f"heatmap:{session_id}")
-            # Clear stats cache
-            self.delete(f"stats:{session_id}")
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.delete(key)
+                await pipe.execute()
+            self.breaker.record_success()
             return True
         except Exception as e:
+            self.breaker.record_failure()
+            logger.error("Failed to delete from cache", keys=keys, error=str(e))
+            return False
+
+    async def get_version(self, key: str) -> int:
+        """Get a version counter (0 when it was never bumped)."""
+        hit, version = self.l1.get(key)
+        if hit:
+            return version
+
+        version = 0
+        if self._allow_request():
+            try:
+                raw = await self.client.get(key)
+                self.breaker.record_success()
+                version = int(raw) if raw else 0
+            except Exception as e:
+                self.breaker.record_failure()
+                logger.error("Failed to get cache version", key=key, error=str(e))
+                return 0
+
+        self.l1.set(key, version, settings.cache_version_l1_ttl)
+        return version
+
+    async def session_key(self, prefix: str, session_id: str, *params: Any) -> str:
+        """Versioned cache key of session data, including request parameters."""
+        version = await self.get_version(self._session_version_key(session_id))
+        return ":".join([prefix, session_id, f"v{version}", *[str(param) for param in params]])
+
+    async def sessions_key(self, prefix: str, *params: Any) -> str:
+        """Versioned cache key of cross-session data such as session lists."""
+        version = await self.get_version(self.SESSIONS_VERSION_KEY)
+        return ":".join([prefix, f"v{version}", *[str(param) for param in params]])
+
+    async def bump_session_version(self, session_id: Optional[str] = None) -> None:
+        """Invalidate all cached data of a session (and session lists) in O(1)."""
+        keys = [self.SESSIONS_VERSION_KEY]
+        if session_id:
+            keys.append(self._session_version_key(session_id))
+
+        if self._allow_request():
+            try:
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.incr(key)
+                    versions = await pipe.execute()
+                self.breaker.record_success()
+                for key, version in zip(keys, versions):
+                    self.l1.set(key, version, settings.cache_version_l1_ttl)
+                return
+            except Exception as e:
+                self.breaker.record_failure()
+                logger.error("Failed to bump cache version", session_id=session_id, error=str(e))
+
+        # Redis is down: only this process can see the new version
+        for key in keys:
+            hit, version = self.l1.get(key)
+            self.l1.set(key, (version if hit else 0) + 1, settings.cache_l1_ttl)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: Optional[int] = 3600,
+        session_id: Optional[str] = None
+    ) -> Optional[Any]:
+        """Get value from cache or load it once for all concurrent callers (single-flight).
+
+        The loader may return a CacheEntry to choose the TTL from the loaded data.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            value = await self.get(key)
+            if value is not None:
+                return value
+            # Another caller may have started loading while we waited on Redis
+            inflight = self._inflight.get(key)
+
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = loader()
+            if inspect.isawaitable(value):
+                value = await value
+
+            store = True
+            if isinstance(value, CacheEntry):
+                value, ttl, store = value.value, value.ttl, value.store
+
+            if value is not None and store:
+                await self.set(key, value, ttl, session_id=session_id)
+
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def clear_session_cache(self, session_id: str) -> bool:
+        """Clear all cache entries for a session."""
+        # Bumping the version makes every cached key of the session unreachable at once
+        await self.bump_session_version(session_id)
+
+        if not self._allow_request():
+            return False
+
+        try:
+            # Drop the now unreachable keys too, since completed sessions are cached without TTL,
+            # and the index and version counter of the deleted session
+            index_key = self._session_index_key(session_id)
+            keys = [key.decode() if isinstance(key, bytes) else key for key in await self.client.smembers(index_key)]
+            return await self.delete_many(keys + [index_key, self._session_version_key(session_id)])
+        except Exception as e:
+            self.breaker.record_failure()
             logger.error("Failed to clear session cache", session_id=session_id, error=str(e))
             return False
 
+    @staticmethod
+    def _session_version_key(session_id: str) -> str:
+        """Version counter key of a session."""
+        return f"cache:version:session:{session_id}"
+
+    @staticmethod
+    def _session_index_key(session_id: str) -> str:
+        """Key of the set of cache keys written for a session."""
+        return f"cache:keys:session:{session_id}"
+
 
 # Global Redis cache instance
 redis_cache = RedisCache()
-
@@ -0,0 +1,13 @@
+"""Small shared helpers."""
+
+from datetime import datetime
+
+
+def epoch_bucket(timestamp: datetime, bucket_seconds: int) -> int:
+    """Get the epoch-aligned bucket index a timestamp falls into."""
+    return int(timestamp.timestamp() // bucket_seconds)
+
+
+def bucket_start_time(bucket_index: int, bucket_seconds: int) -> datetime:
+    """Get the start time of an epoch-aligned bucket."""
+    return datetime.fromtimestamp(bucket_index * bucket_seconds)
@@ -4,6 +4,7 @@ from sqlalchemy.pool import StaticPool
 import structlog
 from app.core.config import settings
 from app.database.models import Base
+from app.database.schema import upgrade_tables
 
 logger = structlog.get_logger()
 
@@ -29,9 +30,10 @@ def get_db():
 
 
 def create_tables():
-    """Create all tables."""
+    """Create missing tables and add missing columns to existing ones."""
     try:
         Base.metadata.create_all(bind=engine)
+        upgrade_tables(engine)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error("Failed to create database tables", error=str(e))
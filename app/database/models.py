@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer, Float, Text, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, Integer, Float, Text, ForeignKey, Boolean, LargeBinary, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -20,6 +20,10 @@ class VideoSession(Base):
     total_people = Column(Integer, default=0)
     peak_people_count = Column(Integer, default=0)
     average_stay_time = Column(Float, default=0.0)
+    frame_width = Column(Integer, nullable=True)
+    frame_height = Column(Integer, nullable=True)
+    zones_config = Column(Text, nullable=True)  # JSON with zone and line definitions
+    timing_summary = Column(Text, nullable=True)  # JSON with per-stage pipeline timings, set on completion
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -27,7 +31,13 @@ class VideoSession(Base):
     detections = relationship("Detection", back_populates="session", cascade="all, delete-orphan")
     tracked_objects = relationship("TrackedObject", back_populates="session", cascade="all, delete-orphan")
     heatmap_points = relationship("HeatmapPoint", back_populates="session", cascade="all, delete-orphan")
+    heatmap_grids = relationship("HeatmapGrid", back_populates="session", cascade="all, delete-orphan")
+    heatmap_tiles = relationship("HeatmapTile", back_populates="session", cascade="all, delete-orphan")
+    minute_rollups = relationship("MinuteRollup", back_populates="session", cascade="all, delete-orphan")
+    zone_rollups = relationship("ZoneRollup", back_populates="session", cascade="all, delete-orphan")
     reports = relationship("Report", back_populates="session", cascade="all, delete-orphan")
+    report_jobs = relationship("ReportJob", back_populates="session", cascade="all, delete-orphan")
+    checkpoint = relationship("PipelineCheckpoint", back_populates="session", cascade="all, delete-orphan", uselist=False)
 
 class Detection(Base):
     __tablename__ = "detections"
@@ -74,6 +84,81 @@ class HeatmapPoint(Base):
     # Relationships
     session = relationship("VideoSession", back_populates="heatmap_points")
 
+class HeatmapGrid(Base):
+    __tablename__ = "heatmap_grids"
+    
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("video_sessions.id"), nullable=False, index=True)
+    bucket_start = Column(DateTime, nullable=True)  # None for the whole-session grid
+    bucket_seconds = Column(Integer, default=0)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    points_count = Column(Integer, default=0)
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed float32 .npy
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    session = relationship("VideoSession", back_populates="heatmap_grids")
+
+class HeatmapTile(Base):
+    __tablename__ = "heatmap_tiles"
+    __table_args__ = (
+        Index("ix_heatmap_tiles_lookup", "session_id", "granularity", "level", "tile_x", "tile_y", "bucket_index"),
+    )
+    
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("video_sessions.id"), nullable=False)
+    granularity = Column(String, nullable=False)  # minute or hour
+    bucket_index = Column(Integer, nullable=False)  # epoch-aligned bucket number
+    level = Column(Integer, nullable=False)  # 0 = full grid resolution, each level halves it
+    tile_x = Column(Integer, nullable=False)
+    tile_y = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # cumulative sum up to and including bucket_index
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    session = relationship("VideoSession", back_populates="heatmap_tiles")
+
+class MinuteRollup(Base):
+    __tablename__ = "session_minute_rollups"
+    __table_args__ = (
+        UniqueConstraint("session_id", "bucket_index", name="uq_session_minute_rollups_bucket"),
+    )
+    
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("video_sessions.id"), nullable=False)
+    bucket_index = Column(Integer, nullable=False)  # epoch minute
+    minute_start = Column(DateTime, nullable=False)
+    frames = Column(Integer, default=0)
+    detections = Column(Integer, default=0)
+    people_sum = Column(Integer, default=0)  # sum of per-frame people counts, for averages
+    people_max = Column(Integer, default=0)
+    entries = Column(Integer, default=0)  # tracks first seen in this minute
+    
+    # Relationships
+    session = relationship("VideoSession", back_populates="minute_rollups")
+
+class ZoneRollup(Base):
+    __tablename__ = "zone_minute_rollups"
+    __table_args__ = (
+        Index("ix_zone_minute_rollups_session", "session_id", "kind", "name", "bucket_index"),
+    )
+    
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("video_sessions.id"), nullable=False)
+    kind = Column(String, nullable=False)  # zone or line
+    name = Column(String, nullable=False)
+    bucket_index = Column(Integer, nullable=False)  # epoch minute
+    minute_start = Column(DateTime, nullable=False)
+    frames = Column(Integer, default=0)
+    occupancy_sum = Column(Integer, default=0)  # zones: sum of per-frame counts
+    occupancy_max = Column(Integer, default=0)
+    in_count = Column(Integer, default=0)  # lines: crossings per direction
+    out_count = Column(Integer, default=0)
+    
+    # Relationships
+    session = relationship("VideoSession", back_populates="zone_rollups")
+
 class Report(Base):
     __tablename__ = "reports"
     
@@ -81,7 +166,43 @@ class Report(Base):
     session_id = Column(String, ForeignKey("video_sessions.id"), nullable=False)
     report_type = Column(String, nullable=False)
     content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # hash of template, model and input data
+    model = Column(String, nullable=True)
+    template_version = Column(String, nullable=True)
     generated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
     # Relationships
     session = relationship("VideoSession", back_populates="reports")
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+    
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("video_sessions.id"), nullable=False, index=True)
+    report_type = Column(String, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)  # lower runs first
+    dedup_key = Column(String(64), nullable=False, index=True)  # identical pending jobs share it
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed by the process running the job; a stale one means it died
+    claimed_by = Column(String, nullable=True)  # token of the current claim; only its holder may finish the job
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    session = relationship("VideoSession", back_populates="report_jobs")
+
+class PipelineCheckpoint(Base):
+    __tablename__ = "pipeline_checkpoints"
+    
+    session_id = Column(String, ForeignKey("video_sessions.id"), primary_key=True)  # one checkpoint per session, overwritten
+    frame_index = Column(Integer, nullable=False)  # frames consumed from the source; resume reads frame_index next
+    state = Column(Text, nullable=False)  # JSON with tracker and accumulator state
+    rows_written = Column(Integer, default=0)  # pipeline rows committed together with this checkpoint
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    session = relationship("VideoSession", back_populates="checkpoint")
@@ -0,0 +1,50 @@
+"""Schema upgrades for databases created by an earlier version; create_all only adds missing tables.
+
+The upgrade is generic: it brings every existing table up to its model, whichever change added the
+column. Columns it has added so far: video_sessions.frame_width, frame_height, zones_config and
+timing_summary; reports.content_hash, model and template_version; report_jobs.heartbeat_at and
+claimed_by.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+import structlog
+from app.database.models import Base
+
+logger = structlog.get_logger()
+
+
+def upgrade_tables(bind: Engine) -> int:
+    """Add columns that models gained after their table was created; create_all never alters a table.
+
+    Only nullable columns are added, together with their indexes, so existing rows stay valid.
+    Returns the number of columns added.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    quote = bind.dialect.identifier_preparer.quote
+    added = 0
+
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in existing_columns]
+            for column in missing:
+                if not column.nullable:
+                    raise RuntimeError(f"Column {table.name}.{column.name} is NOT NULL and cannot be added automatically")
+
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+                logger.info("Database column added", table=table.name, column=column.name)
+                added += 1
+
+            # Indexes over the new columns, once all of them exist
+            missing_names = {column.name for column in missing}
+            for index in table.indexes:
+                if missing_names & {column.name for column in index.columns}:
+                    index.create(connection, checkfirst=True)
+
+    return added
+
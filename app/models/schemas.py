@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from enum import Enum
 
@@ -104,6 +104,20 @@ class AnalyticsData(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
 
 
+# Zone Models
+class ZoneDefinition(BaseModel):
+    """Polygon zone for occupancy counting (frame pixel coordinates)."""
+    name: str = Field(..., min_length=1, description="Unique zone name")
+    polygon: List[Tuple[float, float]] = Field(..., min_length=3, description="Polygon vertices as (x, y)")
+
+
+class LineDefinition(BaseModel):
+    """Directed entry line for in/out counting (frame pixel coordinates)."""
+    name: str = Field(..., min_length=1, description="Unique line name")
+    start: Tuple[float, float] = Field(..., description="Line start point (x, y)")
+    end: Tuple[float, float] = Field(..., description="Line end point (x, y)")
+
+
 # API Request/Response Models
 class VideoAnalysisRequest(BaseModel):
     """Request to start video analysis."""
@@ -111,6 +125,18 @@ class VideoAnalysisRequest(BaseModel):
     source_path: Optional[str] = Field(None, description="Path to video file or RTSP URL")
     duration: Optional[int] = Field(None, ge=1, description="Analysis duration in seconds")
     confidence_threshold: Optional[float] = Field(None, ge=0, le=1, description="Detection confidence threshold")
+    zones: List[ZoneDefinition] = Field(default_factory=list, description="Zones for occupancy counting")
+    lines: List[LineDefinition] = Field(default_factory=list, description="Lines for in/out counting")
+    
+    @field_validator("zones", "lines")
+    @classmethod
+    def unique_names(cls, items: List[BaseModel]) -> List[BaseModel]:
+        """Zone and line names key the counters and rollups, so they must be unique."""
+        names = [item.name for item in items]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate names: {', '.join(duplicates)}")
+        return items
 
 
 class VideoAnalysisResponse(BaseModel):
@@ -129,6 +155,22 @@ class ReportRequest(BaseModel):
     include_timeline: bool = Field(default=True, description="Include timeline data")
 
 
+class ReportJobRequest(BaseModel):
+    """Request to queue a report generation job."""
+    session_id: str = Field(..., description="Session ID to generate report for")
+    report_type: str = Field(default="summary", description="Type of report to generate")
+    priority: int = Field(default=5, ge=0, le=9, description="Job priority, lower runs first")
+
+
+class ReportBatchRequest(BaseModel):
+    """Request to generate reports for many sessions at once."""
+    session_ids: Optional[List[str]] = Field(None, description="Sessions to generate reports for")
+    start_date: Optional[datetime] = Field(None, description="Start of session date range (instead of session_ids)")
+    end_date: Optional[datetime] = Field(None, description="End of session date range (instead of session_ids)")
+    report_type: str = Field(default="summary", description="Type of report to generate")
+    concurrency: Optional[int] = Field(None, ge=1, le=32, description="Parallel LLM calls")
+
+
 class ReportResponse(BaseModel):
     """Generated report response."""
     session_id: str = Field(..., description="Session ID")
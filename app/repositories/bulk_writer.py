@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Optional, Type
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import uuid
+from app.core.config import settings
+from app.database.models import Base
+import structlog
+
+logger = structlog.get_logger()
+
+
+class BulkWriter:
+    """Buffers pipeline rows per model and writes them as batched INSERTs."""
+    
+    def __init__(
+        self,
+        db: Session,
+        batch_size: Optional[int] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+        autoflush: bool = True
+    ):
+        self.db = db
+        self.batch_size = batch_size or settings.bulk_write_batch_size
+        self.defaults = defaults or {}
+        # Without autoflush rows stay buffered until the caller flushes, so no transaction is held open meanwhile
+        self.autoflush = autoflush
+        self.buffers: Dict[Type[Base], List[Dict[str, Any]]] = {}
+        self.total_written = 0
+    
+    @property
+    def pending(self) -> int:
+        """Number of buffered rows not yet written."""
+        return sum(len(rows) for rows in self.buffers.values())
+    
+    def add(self, model: Type[Base], row: Dict[str, Any]) -> None:
+        """Buffer a row, flushing once the batch size is reached."""
+        self.add_many(model, [row])
+    
+    def add_many(self, model: Type[Base], rows: List[Dict[str, Any]]) -> None:
+        """Buffer several rows of the same model."""
+        if not rows:
+            return
+        
+        buffer = self.buffers.setdefault(model, [])
+        for row in rows:
+            row = {**self.defaults, **row}
+            if "id" not in row:
+                row["id"] = str(uuid.uuid4())
+            buffer.append(row)
+        
+        if self.autoflush and self.pending >= self.batch_size:
+            self.flush()
+    
+    def flush(self, commit: bool = True) -> int:
+        """Write all buffered rows, one executemany INSERT per model."""
+        if not self.pending:
+            return 0
+        
+        try:
+            written = 0
+            for model, rows in self.buffers.items():
+                if rows:
+                    self.db.execute(insert(model), rows)
+                    written += len(rows)
+            
+            if commit:
+                self.db.commit()
+            
+            self.buffers = {}
+            self.total_written += written
+            logger.debug("Bulk rows written", rows=written)
+            return written
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to write bulk rows", error=str(e))
+            raise
@@ -0,0 +1,58 @@
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from datetime import datetime
+import json
+from app.database.models import PipelineCheckpoint
+from app.repositories.base_repository import BaseRepository
+import structlog
+
+logger = structlog.get_logger()
+
+
+class CheckpointRepository(BaseRepository[PipelineCheckpoint]):
+    """Repository for the resumable state of running analyses."""
+
+    def __init__(self, db: Session):
+        super().__init__(db, PipelineCheckpoint)
+
+    def get_checkpoint(self, session_id: str) -> Optional[PipelineCheckpoint]:
+        """Get the latest checkpoint of a session."""
+        try:
+            return self.db.query(PipelineCheckpoint).filter(PipelineCheckpoint.session_id == session_id).first()
+        except Exception as e:
+            logger.error("Failed to get pipeline checkpoint", session_id=session_id, error=str(e))
+            raise
+
+    def save_checkpoint(self, session_id: str, frame_index: int, state: Dict[str, Any], rows_written: int) -> PipelineCheckpoint:
+        """Overwrite the session checkpoint and commit it together with everything pending in the transaction."""
+        try:
+            checkpoint = self.get_checkpoint(session_id)
+            if checkpoint is None:
+                checkpoint = PipelineCheckpoint(session_id=session_id)
+                self.db.add(checkpoint)
+
+            checkpoint.frame_index = frame_index
+            checkpoint.state = json.dumps(state)
+            checkpoint.rows_written = rows_written
+            checkpoint.updated_at = datetime.utcnow()
+            self.db.commit()
+
+            logger.debug("Pipeline checkpoint saved", session_id=session_id, frame_index=frame_index)
+            return checkpoint
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to save pipeline checkpoint", session_id=session_id, error=str(e))
+            raise
+
+    def delete_checkpoint(self, session_id: str, commit: bool = True) -> None:
+        """Drop the checkpoint of a session; without commit it goes out with the caller's transaction."""
+        try:
+            self.db.query(PipelineCheckpoint).filter(
+                PipelineCheckpoint.session_id == session_id
+            ).delete(synchronize_session=False)
+            if commit:
+                self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to delete pipeline checkpoint", session_id=session_id, error=str(e))
+            raise
@@ -0,0 +1,110 @@
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, desc
+from datetime import datetime
+from app.database.models import HeatmapGrid, HeatmapTile
+from app.repositories.base_repository import BaseRepository
+import structlog
+
+logger = structlog.get_logger()
+
+
+class HeatmapRepository(BaseRepository[HeatmapGrid]):
+    """Repository for pre-aggregated heatmap grids."""
+    
+    def __init__(self, db: Session):
+        super().__init__(db, HeatmapGrid)
+    
+    def get_session_grid(self, session_id: str) -> Optional[HeatmapGrid]:
+        """Get the whole-session grid."""
+        try:
+            return (
+                self.db.query(HeatmapGrid)
+                .filter(
+                    and_(
+                        HeatmapGrid.session_id == session_id,
+                        HeatmapGrid.bucket_start.is_(None)
+                    )
+                )
+                .first()
+            )
+        except Exception as e:
+            logger.error("Failed to get session heatmap grid", session_id=session_id, error=str(e))
+            raise
+    
+    def get_bucket_grids(
+        self,
+        session_id: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> List[HeatmapGrid]:
+        """Get per-time-bucket grids whose bucket starts within the range."""
+        try:
+            query = (
+                self.db.query(HeatmapGrid)
+                .filter(
+                    and_(
+                        HeatmapGrid.session_id == session_id,
+                        HeatmapGrid.bucket_start.isnot(None)
+                    )
+                )
+            )
+            
+            if start_time:
+                query = query.filter(HeatmapGrid.bucket_start >= start_time)
+            if end_time:
+                query = query.filter(HeatmapGrid.bucket_start <= end_time)
+            
+            return query.order_by(HeatmapGrid.bucket_start).all()
+        except Exception as e:
+            logger.error("Failed to get heatmap bucket grids", session_id=session_id, error=str(e))
+            raise
+    
+    def get_cumulative_tile(
+        self,
+        session_id: str,
+        granularity: str,
+        level: int,
+        tile_x: int,
+        tile_y: int,
+        bucket_index: Optional[int] = None
+    ) -> Optional[HeatmapTile]:
+        """Get the latest cumulative tile at or before a bucket (None bucket means latest)."""
+        try:
+            query = (
+                self.db.query(HeatmapTile)
+                .filter(
+                    and_(
+                        HeatmapTile.session_id == session_id,
+                        HeatmapTile.granularity == granularity,
+                        HeatmapTile.level == level,
+                        HeatmapTile.tile_x == tile_x,
+                        HeatmapTile.tile_y == tile_y
+                    )
+                )
+            )
+            
+            if bucket_index is not None:
+                query = query.filter(HeatmapTile.bucket_index <= bucket_index)
+            
+            return query.order_by(desc(HeatmapTile.bucket_index)).first()
+        except Exception as e:
+            logger.error("Failed to get cumulative heatmap tile", session_id=session_id, error=str(e))
+            raise
+    
+    def has_tiles(self, session_id: str, granularity: str) -> bool:
+        """Check whether a tile pyramid was built for a session."""
+        try:
+            return (
+                self.db.query(HeatmapTile.id)
+                .filter(
+                    and_(
+                        HeatmapTile.session_id == session_id,
+                        HeatmapTile.granularity == granularity
+                    )
+                )
+                .first()
+            ) is not None
+        except Exception as e:
+            logger.error("Failed to check heatmap tiles", session_id=session_id, error=str(e))
+            raise
@@ -0,0 +1,135 @@
+from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime, timedelta
+import uuid
+from app.database.models import ReportJob
+from app.repositories.base_repository import BaseRepository
+import structlog
+
+logger = structlog.get_logger()
+
+
+class ReportJobRepository(BaseRepository[ReportJob]):
+    """Repository for queued report generation jobs."""
+    
+    def __init__(self, db: Session):
+        super().__init__(db, ReportJob)
+    
+    def create_job(self, session_id: str, report_type: str, priority: int, dedup_key: str) -> ReportJob:
+        """Create a pending report job."""
+        return self.create({
+            "id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "report_type": report_type,
+            "priority": priority,
+            "dedup_key": dedup_key,
+            "status": "pending"
+        })
+    
+    def get_active_job(self, dedup_key: str) -> Optional[ReportJob]:
+        """Get a pending or running job with the same dedup key."""
+        try:
+            return (
+                self.db.query(ReportJob)
+                .filter(
+                    ReportJob.dedup_key == dedup_key,
+                    ReportJob.status.in_(["pending", "running"])
+                )
+                .first()
+            )
+        except Exception as e:
+            logger.error("Failed to get active report job", dedup_key=dedup_key, error=str(e))
+            raise
+    
+    def get_pending_jobs(self, older_than: Optional[float] = None) -> List[ReportJob]:
+        """Get jobs waiting to run, highest priority first; optionally only those waiting longer than older_than seconds."""
+        try:
+            query = self.db.query(ReportJob).filter(ReportJob.status == "pending")
+            if older_than is not None:
+                query = query.filter(ReportJob.created_at < datetime.utcnow() - timedelta(seconds=older_than))
+            return query.order_by(ReportJob.priority, ReportJob.created_at).all()
+        except Exception as e:
+            logger.error("Failed to get pending report jobs", error=str(e))
+            raise
+    
+    def claim_job(self, job_id: str) -> Optional[ReportJob]:
+        """Mark a pending job as running under a new claim token; None if it is not pending any more."""
+        try:
+            now = datetime.utcnow()
+            claimed = (
+                self.db.query(ReportJob)
+                .filter(ReportJob.id == job_id, ReportJob.status == "pending")
+                .update(
+                    {"status": "running", "started_at": now, "heartbeat_at": now, "claimed_by": str(uuid.uuid4())},
+                    synchronize_session=False
+                )
+            )
+            self.db.commit()
+            return self.get(job_id) if claimed else None
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to claim report job", job_id=job_id, error=str(e))
+            raise
+    
+    def touch_jobs(self, claims: List[str]) -> None:
+        """Refresh the heartbeat of the jobs this process still holds by these claim tokens."""
+        if not claims:
+            return
+        try:
+            (
+                self.db.query(ReportJob)
+                .filter(ReportJob.claimed_by.in_(claims), ReportJob.status == "running")
+                .update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to refresh report job heartbeats", jobs=len(claims), error=str(e))
+            raise
+    
+    def reset_stale_jobs(self, lease_timeout: float) -> List[ReportJob]:
+        """Put running jobs whose process stopped sending heartbeats back to pending; returns them."""
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=lease_timeout)
+            stale = (
+                self.db.query(ReportJob)
+                .filter(
+                    ReportJob.status == "running",
+                    # Jobs claimed before heartbeats existed only have started_at
+                    func.coalesce(ReportJob.heartbeat_at, ReportJob.started_at) < cutoff
+                )
+                .all()
+            )
+            for job in stale:
+                job.status = "pending"
+                job.started_at = None
+                job.heartbeat_at = None
+                job.claimed_by = None
+            self.db.commit()
+            return stale
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to reset stale report jobs", error=str(e))
+            raise
+    
+    def mark_finished(self, job_id: str, claim: str, result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        """Store the outcome of a job still running under this claim; False if the claim was taken over."""
+        update: Dict[str, Any] = {
+            "status": "failed" if error else "completed",
+            "result": result,
+            "error": error,
+            "finished_at": datetime.utcnow()
+        }
+        try:
+            finished = (
+                self.db.query(ReportJob)
+                .filter(ReportJob.id == job_id, ReportJob.claimed_by == claim, ReportJob.status == "running")
+                .update(update, synchronize_session=False)
+            )
+            self.db.commit()
+            return bool(finished)
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to finish report job", job_id=job_id, error=str(e))
+            raise
@@ -0,0 +1,63 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import desc
+import uuid
+from app.database.models import Report
+from app.repositories.base_repository import BaseRepository
+import structlog
+
+logger = structlog.get_logger()
+
+
+class ReportRepository(BaseRepository[Report]):
+    """Repository for generated LLM reports."""
+    
+    def __init__(self, db: Session):
+        super().__init__(db, Report)
+    
+    def get_by_content_hash(self, content_hash: str, session_id: Optional[str] = None) -> Optional[Report]:
+        """Get the latest report generated for a content hash, preferring the given session."""
+        try:
+            query = self.db.query(Report).filter(Report.content_hash == content_hash)
+            if session_id:
+                report = query.filter(Report.session_id == session_id).order_by(desc(Report.generated_at)).first()
+                if report:
+                    return report
+            
+            return query.order_by(desc(Report.generated_at)).first()
+        except Exception as e:
+            logger.error("Failed to get report by content hash", content_hash=content_hash, error=str(e))
+            raise
+    
+    def get_session_report(self, session_id: str, content_hash: str) -> Optional[Report]:
+        """Get the latest report of a session for a content hash."""
+        try:
+            return (
+                self.db.query(Report)
+                .filter(Report.session_id == session_id, Report.content_hash == content_hash)
+                .order_by(desc(Report.generated_at))
+                .first()
+            )
+        except Exception as e:
+            logger.error("Failed to get session report", session_id=session_id, content_hash=content_hash, error=str(e))
+            raise
+    
+    def create_report(
+        self,
+        session_id: str,
+        report_type: str,
+        content: str,
+        content_hash: Optional[str] = None,
+        model: Optional[str] = None,
+        template_version: Optional[str] = None
+    ) -> Report:
+        """Store a generated report for a session."""
+        return self.create({
+            "id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "report_type": report_type,
+            "content": content,
+            "content_hash": content_hash,
+            "model": model,
+            "template_version": template_version
+        })
@@ -0,0 +1,85 @@
+from typing import List, Dict, Any
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.database.models import MinuteRollup
+from app.repositories.base_repository import BaseRepository
+from app.core.utils import bucket_start_time
+import structlog
+
+logger = structlog.get_logger()
+
+
+class RollupRepository(BaseRepository[MinuteRollup]):
+    """Repository for per-session, per-minute time-series rollups."""
+    
+    def __init__(self, db: Session):
+        super().__init__(db, MinuteRollup)
+    
+    def get_timeline(self, session_id: str, bucket_minutes: int = 1) -> List[Dict[str, Any]]:
+        """Get the session timeline downsampled to bucket_minutes in SQL."""
+        try:
+            # Integer modulo keeps the bucket math portable between SQLite and PostgreSQL
+            bucket = (MinuteRollup.bucket_index - MinuteRollup.bucket_index % bucket_minutes).label("bucket")
+            
+            rows = (
+                self.db.query(
+                    bucket,
+                    func.sum(MinuteRollup.frames),
+                    func.sum(MinuteRollup.detections),
+                    func.sum(MinuteRollup.people_sum),
+                    func.max(MinuteRollup.people_max),
+                    func.sum(MinuteRollup.entries)
+                )
+                .filter(MinuteRollup.session_id == session_id)
+                .group_by(bucket)
+                .order_by(bucket)
+                .all()
+            )
+            
+            return [
+                {
+                    "start_time": bucket_start_time(bucket_index, 60),
+                    "frames": frames or 0,
+                    "detections": detections or 0,
+                    "people_sum": people_sum or 0,
+                    "people_avg": round(people_sum / frames, 3) if frames else 0.0,
+                    "people_max": people_max or 0,
+                    "entries": entries or 0
+                }
+                for bucket_index, frames, detections, people_sum, people_max, entries in rows
+            ]
+        except Exception as e:
+            logger.error("Failed to get session timeline", session_id=session_id, error=str(e))
+            raise
+    
+    def get_hourly_totals(self, session_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Hourly people/frame totals of many sessions in one grouped query."""
+        try:
+            if not session_ids:
+                return {}
+            
+            bucket = (MinuteRollup.bucket_index - MinuteRollup.bucket_index % 60).label("bucket")
+            rows = (
+                self.db.query(
+                    MinuteRollup.session_id,
+                    bucket,
+                    func.sum(MinuteRollup.people_sum),
+                    func.sum(MinuteRollup.frames)
+                )
+                .filter(MinuteRollup.session_id.in_(session_ids))
+                .group_by(MinuteRollup.session_id, bucket)
+                .order_by(MinuteRollup.session_id, bucket)
+                .all()
+            )
+            
+            totals: Dict[str, List[Dict[str, Any]]] = {session_id: [] for session_id in session_ids}
+            for session_id, bucket_index, people_sum, frames in rows:
+                totals[session_id].append({
+                    "start_time": bucket_start_time(bucket_index, 60),
+                    "people_sum": people_sum or 0,
+                    "frames": frames or 0
+                })
+            return totals
+        except Exception as e:
+            logger.error("Failed to get hourly totals", count=len(session_ids), error=str(e))
+            raise
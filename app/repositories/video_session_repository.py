@@ -1,8 +1,21 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import json
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, desc, func
 from datetime import datetime, timedelta
-from app.database.models import VideoSession, Detection, TrackedObject, HeatmapPoint, Report
+from app.database.models import (
+    VideoSession,
+    Detection,
+    TrackedObject,
+    HeatmapPoint,
+    HeatmapGrid,
+    HeatmapTile,
+    MinuteRollup,
+    ZoneRollup,
+    PipelineCheckpoint,
+    Report
+)
 from app.repositories.base_repository import BaseRepository
 import structlog
 
@@ -20,15 +33,18 @@ class VideoSessionRepository(BaseRepository[VideoSession]):
         session_id: str,
         source_type: str,
         source_path: Optional[str] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        zones_config: Optional[Dict[str, Any]] = None,
+        status: str = "active"
     ) -> VideoSession:
         """Create a new video session."""
         session_data = {
             "id": session_id,
             "source_type": source_type,
             "source_path": source_path,
-            "status": "active"
+            "status": status,
             # metadata removed - not in VideoSession model
+            "zones_config": json.dumps(zones_config) if zones_config else None
         }
         return self.create(session_data)
     
@@ -45,15 +61,22 @@ class VideoSessionRepository(BaseRepository[VideoSession]):
             logger.error("Failed to get active sessions", error=str(e))
             raise
     
-    def complete_session(self, session_id: str) -> Optional[VideoSession]:
-        """Mark session as completed."""
+    def complete_session(
+        self,
+        session_id: str,
+        timing_summary: Optional[Dict[str, Any]] = None,
+        status: str = "completed"
+    ) -> Optional[VideoSession]:
+        """Mark session as finished: completed, or cancelled/interrupted with the output so far."""
         try:
             session = self.get(session_id)
             if not session:
                 return None
             
-            session.status = "completed"
+            session.status = status
             session.end_time = datetime.now()
+            if timing_summary is not None:
+                session.timing_summary = json.dumps(timing_summary)
             self.db.commit()
             self.db.refresh(session)
             
@@ -64,6 +87,43 @@ class VideoSessionRepository(BaseRepository[VideoSession]):
             logger.error("Failed to complete session", session_id=session_id, error=str(e))
             raise
     
+    def get_status(self, session_id: str) -> Optional[str]:
+        """Current status straight from the database, bypassing loaded objects; None if the session is gone."""
+        try:
+            return self.db.query(VideoSession.status).filter(VideoSession.id == session_id).scalar()
+        except Exception as e:
+            logger.error("Failed to get session status", session_id=session_id, error=str(e))
+            raise
+    
+    def reset_session_data(self, session_id: str) -> Optional[VideoSession]:
+        """Delete the pipeline output of a session and mark it active again, so it can be reprocessed."""
+        try:
+            session = self.get(session_id)
+            if not session:
+                return None
+            
+            for model in (
+                Detection, TrackedObject, HeatmapPoint, HeatmapGrid, HeatmapTile, MinuteRollup, ZoneRollup, PipelineCheckpoint
+            ):
+                self.db.query(model).filter(model.session_id == session_id).delete(synchronize_session=False)
+            
+            session.status = "active"
+            session.end_time = None
+            session.timing_summary = None
+            session.total_frames = 0
+            session.total_people = 0
+            session.peak_people_count = 0
+            session.average_stay_time = 0.0
+            self.db.commit()
+            self.db.refresh(session)
+            
+            logger.info("Session data reset", session_id=session_id)
+            return session
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Failed to reset session data", session_id=session_id, error=str(e))
+            raise
+    
     def update_session_stats(
         self,
         session_id: str,
@@ -117,6 +177,48 @@ class VideoSessionRepository(BaseRepository[VideoSession]):
             logger.error("Failed to get sessions by date range", error=str(e))
             raise
     
+    def get_sessions_by_ids(self, session_ids: List[str]) -> List[VideoSession]:
+        """Get many sessions in one query."""
+        try:
+            if not session_ids:
+                return []
+            return self.db.query(VideoSession).filter(VideoSession.id.in_(session_ids)).all()
+        except Exception as e:
+            logger.error("Failed to get sessions by ids", count=len(session_ids), error=str(e))
+            raise
+    
+    def get_heatmap_points_counts(self, session_ids: List[str]) -> Dict[str, int]:
+        """Heatmap point counts of many sessions (grids, or raw rows for older sessions) in two queries."""
+        try:
+            if not session_ids:
+                return {}
+            
+            counts = dict(
+                self.db.query(HeatmapGrid.session_id, func.sum(HeatmapGrid.points_count))
+                .filter(
+                    and_(
+                        HeatmapGrid.session_id.in_(session_ids),
+                        HeatmapGrid.bucket_start.is_(None)
+                    )
+                )
+                .group_by(HeatmapGrid.session_id)
+                .all()
+            )
+            
+            legacy_ids = [session_id for session_id in session_ids if not counts.get(session_id)]
+            if legacy_ids:
+                counts.update(
+                    self.db.query(HeatmapPoint.session_id, func.count(HeatmapPoint.id))
+                    .filter(HeatmapPoint.session_id.in_(legacy_ids))
+                    .group_by(HeatmapPoint.session_id)
+                    .all()
+                )
+            
+            return {session_id: int(counts.get(session_id) or 0) for session_id in session_ids}
+        except Exception as e:
+            logger.error("Failed to get heatmap points counts", count=len(session_ids), error=str(e))
+            raise
+    
     def get_session_with_analytics(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session with full analytics data."""
         try:
@@ -138,12 +240,23 @@ class VideoSessionRepository(BaseRepository[VideoSession]):
                 .count()
             )
             
-            # Get heatmap points
-            heatmap_points = (
-                self.db.query(HeatmapPoint)
-                .filter(HeatmapPoint.session_id == session_id)
-                .all()
+            # Count heatmap points (pre-aggregated grid, or raw rows for older sessions)
+            heatmap_points_count = (
+                self.db.query(func.coalesce(func.sum(HeatmapGrid.points_count), 0))
+                .filter(
+                    and_(
+                        HeatmapGrid.session_id == session_id,
+                        HeatmapGrid.bucket_start.is_(None)
+                    )
+                )
+                .scalar()
             )
+            if not heatmap_points_count:
+                heatmap_points_count = (
+                    self.db.query(HeatmapPoint)
+                    .filter(HeatmapPoint.session_id == session_id)
+                    .count()
+                )
             
             # Get reports
             reports = (
@@ -157,19 +270,39 @@ class VideoSessionRepository(BaseRepository[VideoSession]):
                 "session": session,
                 "detections_count": detections_count,
                 "tracked_objects_count": tracked_objects_count,
-                "heatmap_points": heatmap_points,
+                "heatmap_points_count": heatmap_points_count,
                 "reports": reports
             }
         except Exception as e:
             logger.error("Failed to get session with analytics", session_id=session_id, error=str(e))
             raise
     
-    def get_recent_sessions(self, limit: int = 10) -> List[VideoSession]:
-        """Get recent sessions."""
+    def get_heatmap_point_arrays(self, session_id: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get heatmap point coordinates and intensities as numpy arrays."""
+        try:
+            rows = (
+                self.db.query(HeatmapPoint.x, HeatmapPoint.y, HeatmapPoint.intensity)
+                .filter(HeatmapPoint.session_id == session_id)
+                .all()
+            )
+            
+            if not rows:
+                empty = np.empty(0, dtype=np.float32)
+                return empty, empty, empty
+            
+            data = np.asarray(rows, dtype=np.float32)
+            return data[:, 0], data[:, 1], data[:, 2]
+        except Exception as e:
+            logger.error("Failed to get heatmap point arrays", session_id=session_id, error=str(e))
+            raise
+    
+    def get_recent_sessions(self, limit: int = 10, skip: int = 0) -> List[VideoSession]:
+        """Get a page of recent sessions, newest first."""
         try:
             return (
                 self.db.query(VideoSession)
-                .order_by(desc(VideoSession.start_time))
+                .order_by(desc(VideoSession.start_time), VideoSession.id)
+                .offset(skip)
                 .limit(limit)
                 .all()
             )
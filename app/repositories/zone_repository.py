@@ -0,0 +1,55 @@
+from typing import List, Dict, Any
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.database.models import ZoneRollup
+from app.repositories.base_repository import BaseRepository
+from app.core.utils import bucket_start_time
+import structlog
+
+logger = structlog.get_logger()
+
+
+class ZoneRepository(BaseRepository[ZoneRollup]):
+    """Repository for zone occupancy and line crossing rollups."""
+    
+    def __init__(self, db: Session):
+        super().__init__(db, ZoneRollup)
+    
+    def get_zone_timeline(self, session_id: str, bucket_minutes: int = 1) -> List[Dict[str, Any]]:
+        """Get zone and line series downsampled to bucket_minutes in SQL."""
+        try:
+            bucket = (ZoneRollup.bucket_index - ZoneRollup.bucket_index % bucket_minutes).label("bucket")
+            
+            rows = (
+                self.db.query(
+                    ZoneRollup.kind,
+                    ZoneRollup.name,
+                    bucket,
+                    func.sum(ZoneRollup.frames),
+                    func.sum(ZoneRollup.occupancy_sum),
+                    func.max(ZoneRollup.occupancy_max),
+                    func.sum(ZoneRollup.in_count),
+                    func.sum(ZoneRollup.out_count)
+                )
+                .filter(ZoneRollup.session_id == session_id)
+                .group_by(ZoneRollup.kind, ZoneRollup.name, bucket)
+                .order_by(ZoneRollup.kind, ZoneRollup.name, bucket)
+                .all()
+            )
+            
+            return [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "start_time": bucket_start_time(bucket_index, 60),
+                    "frames": frames or 0,
+                    "occupancy_avg": round(occupancy_sum / frames, 3) if frames else 0.0,
+                    "occupancy_max": occupancy_max or 0,
+                    "in_count": in_count or 0,
+                    "out_count": out_count or 0
+                }
+                for kind, name, bucket_index, frames, occupancy_sum, occupancy_max, in_count, out_count in rows
+            ]
+        except Exception as e:
+            logger.error("Failed to get zone timeline", session_id=session_id, error=str(e))
+            raise
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from datetime import datetime
+import asyncio
+import structlog
+
+from app.core.config import settings
+from app.core.middleware import has_admin_key
+from app.core.profiling import (
+    StackSampler,
+    format_collapsed,
+    top_functions,
+    profiler_lock,
+    memory_tracker,
+    request_profiles
+)
+from app.utils.response_helper import success_response
+
+logger = structlog.get_logger()
+
+
+# Dependency injection functions
+def require_admin_key(request: Request) -> None:
+    """Allow only requests with the admin API key."""
+    if not has_admin_key(request):
+        raise HTTPException(status_code=403, detail="Admin API key required")
+
+
+router = APIRouter(
+    prefix="/admin/profiling",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin_key)]
+)
+
+
+@router.post("/cpu")
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0),
+    interval: float = Query(None, gt=0, le=1),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$")
+):
+    """Sample the stacks of every thread for N seconds; returns collapsed stacks for a flamegraph."""
+    if seconds > settings.profiling_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must not exceed {settings.profiling_max_seconds}")
+
+    if not profiler_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another profile is running")
+
+    try:
+        sampler = StackSampler(interval)
+        logger.info("CPU profiling started", seconds=seconds, interval=sampler.interval)
+        # Sample from a worker thread so the event loop keeps running and shows up in the samples
+        stacks = await asyncio.to_thread(sampler.run, seconds)
+    finally:
+        profiler_lock.release()
+
+    logger.info("CPU profiling finished", samples=sampler.samples, stacks=len(stacks))
+
+    if format == "json":
+        return success_response(
+            data={
+                "seconds": seconds,
+                "interval": sampler.interval,
+                "samples": sampler.samples,
+                "top_functions": top_functions(stacks)
+            },
+            message="CPU profile collected"
+        )
+
+    filename = f"cpu-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.collapsed"
+    return PlainTextResponse(
+        format_collapsed(stacks),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/memory/snapshot")
+async def memory_snapshot():
+    """Start tracemalloc if needed and take the baseline snapshot for later diffs."""
+    data = memory_tracker.snapshot()
+    return success_response(data=data, message="Memory baseline taken")
+
+
+@router.get("/memory/diff")
+async def memory_diff(
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """Allocation growth since the baseline snapshot, largest first."""
+    try:
+        data = memory_tracker.diff(limit=limit, group_by=group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return success_response(data=data, message="Memory diff calculated")
+
+
+@router.delete("/memory")
+async def memory_stop():
+    """Stop tracemalloc, which slows down every allocation while it runs."""
+    memory_tracker.stop()
+    return success_response(message="Memory tracing stopped")
+
+
+@router.get("/requests/{profile_id}")
+async def get_request_profile(profile_id: str):
+    """cProfile report of a request sent with the X-Profile header."""
+    report = request_profiles.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return PlainTextResponse(report)
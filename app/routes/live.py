@@ -0,0 +1,77 @@
+from fastapi import APIRouter, WebSocket, status
+import asyncio
+import json
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import live_viewers
+from app.core.middleware import has_api_key
+from app.services.live_updates import LiveSubscription, live_broker, encode_delta, END
+
+logger = structlog.get_logger()
+router = APIRouter(prefix="/ws", tags=["Live"])
+
+
+@router.websocket("/sessions/{session_id}")
+async def session_live_updates(websocket: WebSocket, session_id: str):
+    """Stream people count, track boxes and zone occupancy of a running analysis."""
+    # Browsers cannot set headers on a WebSocket, so the key may also come as a query parameter
+    api_key = websocket.headers.get(settings.x_api_key_header) or websocket.query_params.get("api_key")
+    if not has_api_key(api_key):
+        logger.warning("Invalid API key", path=websocket.url.path, ip=websocket.client.host if websocket.client else None)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        async with live_broker.subscribe(session_id) as subscription:
+            live_viewers.inc()
+            sender = asyncio.create_task(_send_updates(websocket, subscription))
+            receiver = asyncio.create_task(_wait_disconnect(websocket))
+            try:
+                done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                sender.cancel()
+                receiver.cancel()
+                live_viewers.dec()
+
+            if sender in done:
+                error = sender.exception()
+                if error is None:
+                    # The analysis finished
+                    await _close(websocket, status.WS_1000_NORMAL_CLOSURE)
+                elif isinstance(error, asyncio.TimeoutError):
+                    logger.warning("Live viewer too slow, disconnecting", session_id=session_id, dropped=subscription.dropped)
+                    await _close(websocket, status.WS_1013_TRY_AGAIN_LATER)
+            logger.debug("Live viewer disconnected", session_id=session_id, dropped=subscription.dropped)
+    except Exception as e:
+        logger.error("Live updates failed", session_id=session_id, error=str(e))
+        await _close(websocket, status.WS_1011_INTERNAL_ERROR)
+
+
+async def _send_updates(websocket: WebSocket, subscription: LiveSubscription) -> None:
+    """Send each viewer the changes since the last update it was sent, until the analysis ends."""
+    previous = None
+    while True:
+        update = await subscription.get()
+        message = json.dumps(encode_delta(previous, update), separators=(",", ":"))
+        await asyncio.wait_for(websocket.send_text(message), timeout=settings.live_send_timeout)
+        previous = update
+        if update["t"] == END:
+            return
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    """Consume client messages until it disconnects; viewers have nothing to say."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+async def _close(websocket: WebSocket, code: int) -> None:
+    """Close the connection; the viewer may be gone already."""
+    try:
+        await websocket.close(code=code)
+    except Exception:
+        pass
@@ -1,17 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Dict, Any
+import json
 import structlog
 from datetime import datetime
 
 from app.database.connection import get_db
 from app.services.llm_service import LLMService
+from app.services.report_service import ReportService
+from app.services.report_job_service import ReportJobQueue
+from app.services.prompt_builder import compact_data
 from app.services.analytics_service import AnalyticsService
+from app.services.heatmap_service import HeatmapRenderer, TIME_GRANULARITIES
 from app.repositories.video_session_repository import VideoSessionRepository
 from app.repositories.detection_repository import DetectionRepository
-from app.core.redis_cache import redis_cache
+from app.repositories.report_repository import ReportRepository
+from app.repositories.report_job_repository import ReportJobRepository
+from app.core.redis_cache import redis_cache, CacheEntry, session_cache_ttl
+from app.core.config import settings
 from app.models.schemas import (
     ReportRequest,
+    ReportJobRequest,
+    ReportBatchRequest,
     ReportResponse,
     AnalyticsData
 )
@@ -40,16 +51,30 @@ def get_analytics_service(
     return AnalyticsService(session_repo, detection_repo)
 
 
-def get_llm_service() -> LLMService:
-    """Get LLM service."""
-    return LLMService()
+def get_llm_service(request: Request) -> LLMService:
+    """Get the process-wide LLM service created on startup."""
+    return request.app.state.llm_service
+
+
+def get_report_jobs(request: Request) -> ReportJobQueue:
+    """Get the process-wide report job queue created on startup."""
+    return request.app.state.report_jobs
+
+
+def get_report_service(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> ReportService:
+    """Get report service."""
+    return ReportService(get_llm_service(request), ReportRepository(db))
 
 
 @router.post("/generate")
 async def generate_report(
     request: ReportRequest,
     llm_service: LLMService = Depends(get_llm_service),
-    analytics_service: AnalyticsService = Depends(get_analytics_service)
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    report_service: ReportService = Depends(get_report_service)
 ):
     """Generate AI-powered analytics report."""
     try:
@@ -59,22 +84,18 @@ async def generate_report(
             raise HTTPException(status_code=404, detail="Session not found or no analytics data available")
         
         # Prepare data for LLM
-        llm_data = {
-            "total_people": analytics.total_people,
-            "peak_people_count": analytics.peak_people_count,
-            "average_stay_time": analytics.average_stay_time,
-            "total_frames": analytics.total_frames,
-            "session_duration": (analytics.end_time - analytics.start_time).total_seconds() if analytics.end_time else 0,
-            "peak_hours": analytics.peak_hours,
-            "heatmap_points_count": len(analytics.heatmap_points)
-        }
+        llm_data = analytics_service.build_llm_data(analytics)
         
-        # Generate report using LLM
+        # Generate report using LLM (or reuse one generated for identical data)
         if request.report_type == "summary":
-            summary = await llm_service.generate_report(llm_data)
+            summary = await report_service.get_or_generate(
+                request.session_id, request.report_type, llm_data, llm_service.generate_report
+            )
         else:
             # For other report types, generate summary for now
-            summary = await llm_service.generate_report(llm_data)
+            summary = await report_service.get_or_generate(
+                request.session_id, request.report_type, llm_data, llm_service.generate_report
+            )
         
         # Convert analytics to dict with ISO format for datetime fields
         analytics_dict = analytics.dict()
@@ -116,6 +137,194 @@ async def generate_report(
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
 
 
+@router.post("/generate/stream")
+async def generate_report_stream(
+    request: ReportRequest,
+    llm_service: LLMService = Depends(get_llm_service),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    report_service: ReportService = Depends(get_report_service)
+):
+    """Generate AI-powered analytics report, streamed as Server-Sent Events."""
+    try:
+        analytics = analytics_service.get_session_analytics(request.session_id)
+        if not analytics:
+            raise HTTPException(status_code=404, detail="Session not found or no analytics data available")
+        
+        llm_data = analytics_service.build_llm_data(analytics)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to start report stream", session_id=request.session_id, error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
+    
+    async def events():
+        try:
+            async for chunk in report_service.stream_report(
+                request.session_id,
+                request.report_type,
+                llm_data,
+                llm_service.stream_report
+            ):
+                yield _sse_event("token", {"text": chunk})
+            
+            yield _sse_event("done", {
+                "session_id": request.session_id,
+                "report_type": request.report_type,
+                "generated_at": datetime.now().isoformat(),
+                "raw_data": llm_data if request.include_heatmap else None
+            })
+            logger.info("Report streamed successfully", session_id=request.session_id, report_type=request.report_type)
+        except Exception as e:
+            logger.error("Report stream failed", session_id=request.session_id, error=str(e), exc_info=True)
+            yield _sse_event("error", {"detail": f"Failed to generate report: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # keep reverse proxies from buffering the stream
+        }
+    )
+
+
+def _ndjson_line(data: Dict[str, Any]) -> str:
+    """Format one NDJSON line."""
+    return json.dumps(data, ensure_ascii=False, default=str) + "\n"
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event; JSON data keeps newlines inside a single data line."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/batch")
+async def generate_reports_batch(
+    request: ReportBatchRequest,
+    llm_service: LLMService = Depends(get_llm_service),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    report_service: ReportService = Depends(get_report_service)
+):
+    """Generate reports for many sessions, streamed back as NDJSON as each one completes."""
+    try:
+        if request.session_ids:
+            session_ids = list(dict.fromkeys(request.session_ids))
+        elif request.start_date and request.end_date:
+            sessions = analytics_service.session_repo.get_sessions_by_date_range(
+                request.start_date,
+                request.end_date,
+                limit=settings.report_batch_max_sessions
+            )
+            session_ids = [session.id for session in sessions]
+        else:
+            raise HTTPException(status_code=400, detail="Provide session_ids or start_date and end_date")
+        
+        if len(session_ids) > settings.report_batch_max_sessions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.report_batch_max_sessions} sessions per batch"
+            )
+        
+        # All analytics in a few set-based queries instead of several per session
+        analytics = analytics_service.get_sessions_analytics(session_ids)
+        items = {
+            session_id: analytics_service.build_llm_data(analytics[session_id])
+            for session_id in session_ids
+            if session_id in analytics
+        }
+        missing = [session_id for session_id in session_ids if session_id not in analytics]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to start report batch", error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to generate reports: {str(e)}")
+    
+    logger.info("Report batch started", sessions=len(items), missing=len(missing))
+    
+    async def lines():
+        for session_id in missing:
+            yield _ndjson_line({"session_id": session_id, "status": "not_found", "report_type": request.report_type})
+        
+        async for result in report_service.generate_batch(
+            request.report_type,
+            items,
+            llm_service.generate_report,
+            concurrency=request.concurrency
+        ):
+            yield _ndjson_line({**result, "report_type": request.report_type, "raw_data": items[result["session_id"]]})
+        
+        logger.info("Report batch completed", sessions=len(items))
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/jobs")
+async def create_report_job(
+    request: ReportJobRequest,
+    db: Session = Depends(get_db),
+    report_jobs: ReportJobQueue = Depends(get_report_jobs),
+    session_repo: VideoSessionRepository = Depends(get_video_session_repo)
+):
+    """Queue a report generation job and return its id immediately."""
+    try:
+        if not session_repo.get(request.session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        job, deduplicated = report_jobs.submit(db, request.session_id, request.report_type, request.priority)
+        
+        return success_response(
+            data={
+                "job_id": job.id,
+                "status": job.status,
+                "priority": job.priority,
+                "deduplicated": deduplicated
+            },
+            message="Report job queued"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to queue report job", session_id=request.session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs/{job_id}")
+async def get_report_job(
+    job_id: str,
+    db: Session = Depends(get_db)
+):
+    """Get status and result of a report job."""
+    try:
+        job = ReportJobRepository(db).get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Report job not found")
+        
+        return success_response(
+            data={
+                "job_id": job.id,
+                "session_id": job.session_id,
+                "report_type": job.report_type,
+                "priority": job.priority,
+                "status": job.status,
+                "result": job.result,
+                "error": job.error,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "started_at": job.started_at.isoformat() if job.started_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None
+            },
+            message="Report job retrieved"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to get report job", job_id=job_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/sessions/{session_id}/analytics")
 async def get_session_analytics(
     session_id: str,
@@ -123,39 +332,34 @@ async def get_session_analytics(
 ):
     """Get analytics data for a session."""
     try:
-        # Try to get from cache
-        cache_key = f"analytics:{session_id}"
-        cached_data = redis_cache.get(cache_key)
-        
-        if cached_data:
-            logger.info("Returning analytics from cache", session_id=session_id)
-            return success_response(
-                data=cached_data,
-                message="Analytics data retrieved successfully (cached)"
-            )
+        def load_analytics() -> Optional[CacheEntry]:
+            session = analytics_service.session_repo.get(session_id)
+            analytics = analytics_service.get_session_analytics(session_id) if session else None
+            if not analytics:
+                return None
+            
+            # Convert to dict with ISO format for datetime fields
+            analytics_dict = analytics.dict()
+            if analytics_dict.get('start_time'):
+                analytics_dict['start_time'] = analytics.start_time.isoformat() if analytics.start_time else None
+            if analytics_dict.get('end_time'):
+                analytics_dict['end_time'] = analytics.end_time.isoformat() if analytics.end_time else None
+            
+            # Convert heatmap points timestamps to ISO
+            if analytics_dict.get('heatmap_points'):
+                for point in analytics_dict['heatmap_points']:
+                    if point.get('timestamp') and isinstance(point['timestamp'], datetime):
+                        point['timestamp'] = point['timestamp'].isoformat()
+            
+            logger.info("Cached analytics data", session_id=session_id)
+            return CacheEntry(analytics_dict, session_cache_ttl(session.status))
         
-        # Get from database
-        analytics = analytics_service.get_session_analytics(session_id)
-        if not analytics:
+        # Concurrent misses for the same session share a single database load
+        cache_key = await redis_cache.session_key("analytics", session_id)
+        analytics_dict = await redis_cache.get_or_load(cache_key, load_analytics, session_id=session_id)
+        if not analytics_dict:
             raise HTTPException(status_code=404, detail="Session not found or no analytics data available")
         
-        # Convert to dict with ISO format for datetime fields
-        analytics_dict = analytics.dict()
-        if analytics_dict.get('start_time'):
-            analytics_dict['start_time'] = analytics.start_time.isoformat() if analytics.start_time else None
-        if analytics_dict.get('end_time'):
-            analytics_dict['end_time'] = analytics.end_time.isoformat() if analytics.end_time else None
-        
-        # Convert heatmap points timestamps to ISO
-        if analytics_dict.get('heatmap_points'):
-            for point in analytics_dict['heatmap_points']:
-                if point.get('timestamp') and isinstance(point['timestamp'], datetime):
-                    point['timestamp'] = point['timestamp'].isoformat()
-        
-        # Save to cache (TTL: 1 hour)
-        redis_cache.set(cache_key, analytics_dict, ttl=3600)
-        logger.info("Cached analytics data", session_id=session_id)
-        
         return success_response(
             data=analytics_dict,
             message="Analytics data retrieved successfully"
@@ -171,38 +375,191 @@ async def get_session_analytics(
 @router.get("/sessions/{session_id}/heatmap")
 async def get_heatmap_data(
     session_id: str,
-    width: int = 100,
-    height: int = 100,
+    width: int = Query(100, ge=1, le=2000),
+    height: int = Query(100, ge=1, le=2000),
+    blur_sigma: float = Query(0.0, ge=0, le=50),
+    normalization: str = "none",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     analytics_service: AnalyticsService = Depends(get_analytics_service)
 ):
-    """Get heatmap data for a session."""
+    """Get heatmap data for a session, optionally limited to a time range."""
     try:
-        analytics = analytics_service.get_session_analytics(session_id)
-        if not analytics:
+        if normalization not in HeatmapRenderer.NORMALIZATIONS:
+            raise HTTPException(status_code=400, detail=f"Unsupported normalization: {normalization}")
+        
+        def load_heatmap() -> Optional[CacheEntry]:
+            session = analytics_service.session_repo.get(session_id)
+            if not session:
+                return None
+            
+            # Generate heatmap data
+            heatmap_data = analytics_service.generate_session_heatmap(
+                session_id,
+                width,
+                height,
+                blur_sigma=blur_sigma,
+                normalization=normalization,
+                start_time=start,
+                end_time=end
+            )
+            if not heatmap_data:
+                return None
+            
+            return CacheEntry({
+                "session_id": session_id,
+                "width": width,
+                "height": height,
+                "frame_width": heatmap_data["frame_width"],
+                "frame_height": heatmap_data["frame_height"],
+                "normalization": normalization,
+                "blur_sigma": blur_sigma,
+                "heatmap_matrix": heatmap_data["heatmap"].tolist(),
+                "points_count": heatmap_data["points_count"]
+            }, session_cache_ttl(session.status))
+        
+        if width * height > settings.cache_heatmap_max_cells:
+            # Very large matrices would crowd everything else out of the cache
+            entry = load_heatmap()
+            heatmap = entry.value if entry else None
+        else:
+            cache_key = await redis_cache.session_key(
+                "heatmap",
+                session_id,
+                f"{width}x{height}",
+                blur_sigma,
+                normalization,
+                start.isoformat() if start else "",
+                end.isoformat() if end else ""
+            )
+            heatmap = await redis_cache.get_or_load(cache_key, load_heatmap, session_id=session_id)
+        
+        if not heatmap:
             raise HTTPException(status_code=404, detail="Session not found or no analytics data available")
         
-        # Generate heatmap data
-        heatmap_matrix = analytics_service.generate_heatmap_data(
-            analytics.heatmap_points, 
-            width, 
-            height
+        return success_response(
+            data=heatmap,
+            message="Heatmap data retrieved successfully"
         )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to get heatmap data", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/sessions/{session_id}/heatmap/tiles/{level}/{tile_x}/{tile_y}")
+async def get_heatmap_tile(
+    session_id: str,
+    level: int,
+    tile_x: int,
+    tile_y: int,
+    granularity: str = "minute",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    normalization: str = "none",
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    """Get a heatmap pyramid tile for a zoom level and time range."""
+    try:
+        if granularity not in TIME_GRANULARITIES:
+            raise HTTPException(status_code=400, detail=f"Unsupported granularity: {granularity}")
+        if normalization not in HeatmapRenderer.NORMALIZATIONS:
+            raise HTTPException(status_code=400, detail=f"Unsupported normalization: {normalization}")
+        if level < 0 or tile_x < 0 or tile_y < 0:
+            raise HTTPException(status_code=400, detail="Tile coordinates must be non-negative")
+        
+        tile_data = analytics_service.get_heatmap_tile(
+            session_id,
+            level,
+            tile_x,
+            tile_y,
+            granularity=granularity,
+            start_time=start,
+            end_time=end,
+            normalization=normalization
+        )
+        if not tile_data:
+            raise HTTPException(status_code=404, detail="Heatmap tiles not found for session")
+        
         return success_response(
             data={
                 "session_id": session_id,
-                "width": width,
-                "height": height,
-                "heatmap_matrix": heatmap_matrix.tolist(),
-                "points_count": len(analytics.heatmap_points)
+                "level": level,
+                "tile_x": tile_x,
+                "tile_y": tile_y,
+                "granularity": granularity,
+                "bounds": tile_data["bounds"],
+                "total": tile_data["total"],
+                "tile": tile_data["tile"].tolist()
             },
-            message="Heatmap data retrieved successfully"
+            message="Heatmap tile retrieved successfully"
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Failed to get heatmap data", session_id=session_id, error=str(e))
+        logger.error("Failed to get heatmap tile", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/sessions/{session_id}/timeline")
+async def get_session_timeline(
+    session_id: str,
+    bucket_minutes: int = Query(1, ge=1, le=1440),
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    """Get occupancy timeline for a session."""
+    try:
+        timeline = analytics_service.get_session_timeline(session_id, bucket_minutes)
+        
+        return success_response(
+            data={
+                "session_id": session_id,
+                "bucket_minutes": bucket_minutes,
+                "timeline": [
+                    {**bucket, "start_time": bucket["start_time"].isoformat()}
+                    for bucket in timeline
+                ]
+            },
+            message="Session timeline retrieved successfully"
+        )
+        
+    except Exception as e:
+        logger.error("Failed to get session timeline", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/sessions/{session_id}/zones")
+async def get_zone_statistics(
+    session_id: str,
+    bucket_minutes: int = Query(1, ge=1, le=1440),
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    """Get zone occupancy and line crossing counts for a session."""
+    try:
+        zone_stats = analytics_service.get_zone_statistics(session_id, bucket_minutes)
+        if zone_stats is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        for item in list(zone_stats["zones"].values()) + list(zone_stats["lines"].values()):
+            for point in item["timeline"]:
+                point["start_time"] = point["start_time"].isoformat()
+        
+        return success_response(
+            data={
+                "session_id": session_id,
+                "bucket_minutes": bucket_minutes,
+                **zone_stats
+            },
+            message="Zone statistics retrieved successfully"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to get zone statistics", session_id=session_id, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -213,13 +570,25 @@ async def get_detection_statistics(
 ):
     """Get detection statistics for a session."""
     try:
-        stats = analytics_service.get_detection_statistics(session_id)
+        def load_stats() -> Optional[CacheEntry]:
+            session = analytics_service.session_repo.get(session_id)
+            if not session:
+                return None
+            stats = analytics_service.get_detection_statistics(session_id)
+            return CacheEntry(stats, session_cache_ttl(session.status))
+        
+        cache_key = await redis_cache.session_key("stats", session_id)
+        stats = await redis_cache.get_or_load(cache_key, load_stats, session_id=session_id)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="Session not found")
         
         return success_response(
             data=stats,
             message="Detection statistics retrieved successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to get detection statistics", session_id=session_id, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -229,7 +598,8 @@ async def get_detection_statistics(
 async def get_session_summary(
     session_id: str,
     llm_service: LLMService = Depends(get_llm_service),
-    analytics_service: AnalyticsService = Depends(get_analytics_service)
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    report_service: ReportService = Depends(get_report_service)
 ):
     """Get AI-generated session summary."""
     try:
@@ -246,8 +616,13 @@ async def get_session_summary(
             "peak_hours": analytics.peak_hours
         }
         
-        # Generate summary
-        summary = await llm_service.generate_summary(str(summary_data))
+        # Generate summary (or reuse one generated for identical data)
+        summary = await report_service.get_or_generate(
+            session_id,
+            "session_summary",
+            summary_data,
+            lambda data: llm_service.generate_summary(compact_data(data))
+        )
         
         return success_response(
             data={
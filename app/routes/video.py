@@ -1,23 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import asyncio
+import json
+import time
 import uuid
+import numpy as np
 import structlog
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from app.database.connection import get_db
 from app.services.video_service import VideoService, VideoSourceFactory
 from app.services.detection_service import DetectionService
 from app.services.tracking_service import TrackingService
 from app.services.llm_service import LLMService
-from app.services.analytics_service import AnalyticsService
+from app.services.analytics_service import AnalyticsService, MinuteRollupAccumulator, SessionStatsAccumulator
+from app.services.heatmap_service import HeatmapAccumulator
+from app.services.zone_service import ZoneCounter
+from app.services.analysis_queue import AnalysisJob, AnalysisJobQueue
+from app.services.checkpoint_service import PipelineCheckpointer, resume_request
+from app.services.session_control import session_registry, CANCELLED, DELETED, INTERRUPTED
+from app.services.live_updates import LivePublisher
 from app.repositories.video_session_repository import VideoSessionRepository
 from app.repositories.detection_repository import DetectionRepository
+from app.repositories.checkpoint_repository import CheckpointRepository
+from app.repositories.bulk_writer import BulkWriter
+from app.database.models import (
+    Detection as DetectionModel,
+    TrackedObject as TrackedObjectModel,
+    HeatmapGrid,
+    HeatmapTile,
+    MinuteRollup,
+    PipelineCheckpoint,
+    ZoneRollup
+)
+from app.core.config import settings
+from app.core.redis_cache import redis_cache
+from app.core.pipeline_timer import PipelineTimer
+from app.core.metrics import (
+    video_analysis_total,
+    frames_processed_total,
+    detections_total,
+    class_name_label,
+    analysis_jobs_total
+)
 from app.models.schemas import (
     VideoAnalysisRequest, 
     VideoAnalysisResponse, 
     VideoFrame,
-    VideoSourceType
+    VideoSourceType,
+    ZoneDefinition,
+    LineDefinition
 )
 from app.utils.response_helper import success_response, error_response
 
@@ -44,11 +77,6 @@ def get_analytics_service(
     return AnalyticsService(session_repo, detection_repo)
 
 
-def get_video_service() -> VideoService:
-    """Get video service."""
-    return VideoService.create_from_config()
-
-
 def get_detection_service() -> DetectionService:
     """Get detection service."""
     return DetectionService.create_person_detector()
@@ -59,26 +87,38 @@ def get_tracking_service() -> TrackingService:
     return TrackingService.create_simple_tracker()  # Используем Simple пока DeepSORT не работает
 
 
-def get_llm_service() -> LLMService:
-    """Get LLM service."""
-    return LLMService()
+def get_llm_service(request: Request) -> LLMService:
+    """Get the process-wide LLM service created on startup."""
+    return request.app.state.llm_service
+
+
+def get_analysis_queue(request: Request) -> Optional[AnalysisJobQueue]:
+    """Get the analysis job queue; None when analysis runs inline in this process."""
+    return getattr(request.app.state, "analysis_queue", None)
 
 
 @router.post("/analyze", response_model=VideoAnalysisResponse)
 async def analyze_video(
     request: VideoAnalysisRequest,
     background_tasks: BackgroundTasks,
-    video_service: VideoService = Depends(get_video_service),
     detection_service: DetectionService = Depends(get_detection_service),
     tracking_service: TrackingService = Depends(get_tracking_service),
     llm_service: LLMService = Depends(get_llm_service),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
-    session_repo: VideoSessionRepository = Depends(get_video_session_repo)
+    session_repo: VideoSessionRepository = Depends(get_video_session_repo),
+    analysis_queue: Optional[AnalysisJobQueue] = Depends(get_analysis_queue)
 ):
     """Start video analysis session."""
     try:
         # Generate session ID
         session_id = str(uuid.uuid4())
+        zones_config = {
+            "zones": [zone.dict() for zone in request.zones],
+            "lines": [line.dict() for line in request.lines]
+        } if request.zones or request.lines else None
+        
+        if analysis_queue is not None:
+            return await _queue_video_analysis(session_id, request, zones_config, session_repo, analysis_queue)
         
         # Create video source based on request
         video_source = VideoSourceFactory.create(request.source_type, request.source_path)
@@ -88,9 +128,11 @@ async def analyze_video(
         session = session_repo.create_session(
             session_id=session_id,
             source_type=request.source_type.value,
-            source_path=request.source_path
+            source_path=request.source_path,
             # metadata removed - not in VideoSession model
+            zones_config=zones_config
         )
+        await redis_cache.bump_session_version()
         
         # Start analysis in background
         background_tasks.add_task(
@@ -102,7 +144,9 @@ async def analyze_video(
             llm_service,
             analytics_service,
             session_repo,
-            request.duration
+            request.duration,
+            request.zones,
+            request.lines
         )
         
         logger.info("Video analysis started", session_id=session_id)
@@ -113,11 +157,176 @@ async def analyze_video(
             message="Video analysis started successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to start video analysis", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _queue_video_analysis(
+    session_id: str,
+    request: VideoAnalysisRequest,
+    zones_config: Optional[dict],
+    session_repo: VideoSessionRepository,
+    analysis_queue: AnalysisJobQueue
+) -> VideoAnalysisResponse:
+    """Hand the analysis to a worker; the API process never opens the source or loads the model."""
+    session_repo.create_session(
+        session_id=session_id,
+        source_type=request.source_type.value,
+        source_path=request.source_path,
+        zones_config=zones_config,
+        status="queued"
+    )
+    await redis_cache.bump_session_version()
+    
+    try:
+        await analysis_queue.enqueue(AnalysisJob(session_id, request.model_dump(mode="json")))
+    except Exception as e:
+        logger.error("Failed to queue video analysis", session_id=session_id, error=str(e))
+        session_repo.update(session_id, {"status": "failed"})
+        await redis_cache.bump_session_version(session_id)
+        raise HTTPException(status_code=503, detail="Analysis queue unavailable")
+    
+    analysis_jobs_total.labels(status="queued").inc()
+    logger.info("Video analysis queued", session_id=session_id)
+    
+    return VideoAnalysisResponse(
+        session_id=session_id,
+        status="queued",
+        message="Video analysis queued"
+    )
+
+
+def _pipeline_alive(checkpoint: Optional[PipelineCheckpoint]) -> bool:
+    """Whether a pipeline still owns the session: a running one refreshes its checkpoint every interval."""
+    stale_after = timedelta(seconds=3 * settings.pipeline_checkpoint_interval)
+    return checkpoint is not None and datetime.utcnow() - checkpoint.updated_at < stale_after
+
+
+@router.post("/analyze/{session_id}/resume", response_model=VideoAnalysisResponse)
+async def resume_video_analysis(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    detection_service: DetectionService = Depends(get_detection_service),
+    tracking_service: TrackingService = Depends(get_tracking_service),
+    llm_service: LLMService = Depends(get_llm_service),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    session_repo: VideoSessionRepository = Depends(get_video_session_repo),
+    analysis_queue: Optional[AnalysisJobQueue] = Depends(get_analysis_queue)
+):
+    """Continue a failed or abandoned analysis from its last checkpoint."""
+    try:
+        session = session_repo.get(session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        checkpoint = CheckpointRepository(session_repo.db).get_checkpoint(session_id)
+        request = resume_request(session, checkpoint) if checkpoint else None
+        if request is None:
+            raise HTTPException(status_code=409, detail="Session has no checkpoint to resume from")
+        
+        # An active or cancelling session whose checkpoint went stale lost its pipeline
+        running = session.status in ("active", "cancelling") and _pipeline_alive(checkpoint)
+        if session.status == "queued" or running:
+            raise HTTPException(status_code=409, detail="Analysis is still running")
+        frame_index = checkpoint.frame_index
+        
+        if analysis_queue is not None:
+            # The worker resumes whenever the session has a checkpoint
+            session_repo.update(session_id, {"status": "queued"})
+            await redis_cache.bump_session_version(session_id)
+            try:
+                await analysis_queue.enqueue(AnalysisJob(session_id, request.model_dump(mode="json")))
+            except Exception as e:
+                logger.error("Failed to queue video analysis", session_id=session_id, error=str(e))
+                session_repo.update(session_id, {"status": "failed"})
+                await redis_cache.bump_session_version(session_id)
+                raise HTTPException(status_code=503, detail="Analysis queue unavailable")
+            analysis_jobs_total.labels(status="queued").inc()
+            status = "queued"
+        else:
+            video_service = VideoService(VideoSourceFactory.create(request.source_type, request.source_path))
+            session_repo.update(session_id, {"status": "active"})
+            await redis_cache.bump_session_version(session_id)
+            background_tasks.add_task(
+                _process_video_analysis,
+                session_id,
+                video_service,
+                detection_service,
+                tracking_service,
+                llm_service,
+                analytics_service,
+                session_repo,
+                request.duration,
+                request.zones,
+                request.lines,
+                True
+            )
+            status = "started"
+        
+        logger.info("Video analysis resumed", session_id=session_id, frame_index=frame_index)
+        
+        return VideoAnalysisResponse(
+            session_id=session_id,
+            status=status,
+            message=f"Video analysis resumed from frame {frame_index}"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to resume video analysis", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze/{session_id}/cancel", response_model=VideoAnalysisResponse)
+async def cancel_video_analysis(
+    session_id: str,
+    session_repo: VideoSessionRepository = Depends(get_video_session_repo)
+):
+    """Stop a queued or running analysis; the output written so far is kept."""
+    try:
+        session = session_repo.get(session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if session.status not in ("queued", "active", "interrupted", "cancelling"):
+            raise HTTPException(status_code=409, detail=f"Analysis is already {session.status}")
+        
+        if session_registry.cancel(session_id, CANCELLED):
+            # The pipeline of this process finalizes the output and marks the session cancelled
+            status = "cancelling"
+        elif session.status in ("active", "cancelling") and _pipeline_alive(
+            CheckpointRepository(session_repo.db).get_checkpoint(session_id)
+        ):
+            # Running in another process, which polls the session status
+            session_repo.update(session_id, {"status": "cancelling"})
+            status = "cancelling"
+        else:
+            # Not running anywhere (queued, interrupted, or its pipeline died); a worker claiming its job
+            # skips it, and a pipeline wrongly taken for dead stops when it polls the status
+            session_repo.update(session_id, {"status": CANCELLED, "end_time": datetime.utcnow()})
+            status = CANCELLED
+        await redis_cache.bump_session_version(session_id)
+        if status == CANCELLED:
+            await LivePublisher(session_id).end(CANCELLED)
+        
+        logger.info("Video analysis cancel requested", session_id=session_id, status=status)
+        
+        return VideoAnalysisResponse(
+            session_id=session_id,
+            status=status,
+            message="Video analysis cancelled" if status == CANCELLED else "Video analysis is stopping"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to cancel video analysis", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 async def _process_video_analysis(
     session_id: str,
     video_service: VideoService,
@@ -126,41 +335,87 @@ async def _process_video_analysis(
     llm_service: LLMService,
     analytics_service: AnalyticsService,
     session_repo: VideoSessionRepository,
-    duration: int = None
+    duration: int = None,
+    zones: List[ZoneDefinition] = None,
+    lines: List[LineDefinition] = None,
+    resume: bool = False
 ):
-    """Process video analysis in background."""
+    """Process video analysis in background; resume continues from the session's last checkpoint."""
+    timer = PipelineTimer()
+    cancel_token = session_registry.start(session_id)
+    live_publisher = LivePublisher(session_id)
     try:
-        # Create detection repo using same DB session
-        detection_repo = DetectionRepository(session_repo.db)
-        
-        frames = []
         frame_count = 0
+        frame_size = None
+        heatmap_accumulator = HeatmapAccumulator()
+        rollup_accumulator = MinuteRollupAccumulator()
+        session_stats = SessionStatsAccumulator()
+        zone_counter = ZoneCounter(zones or [], lines or [])
+        checkpoint_repo = CheckpointRepository(session_repo.db)
+        bulk_writer = BulkWriter(session_repo.db, defaults={"session_id": session_id})
+        checkpointer = PipelineCheckpointer(
+            session_id,
+            checkpoint_repo,
+            bulk_writer,
+            {
+                "tracking": tracking_service,
+                "heatmap": heatmap_accumulator,
+                "rollups": rollup_accumulator,
+                "zones": zone_counter,
+                "stats": session_stats
+            },
+            request={
+                "duration": duration,
+                "zones": [zone.model_dump() for zone in zones or []],
+                "lines": [line.model_dump() for line in lines or []]
+            }
+        )
+        # Rows become visible only with a checkpoint, so a resume never finds rows past it
+        bulk_writer.autoflush = not checkpointer.enabled
         max_frames = duration * 30 if duration else 1000  # Assume 30 FPS
+        # Frames of a file are timed by their position in it, so rollups and buckets follow the video, not the server
+        session = session_repo.get(session_id)
+        video_start = session.start_time if session else datetime.utcnow()
         
-        logger.info("Starting video processing", session_id=session_id, max_frames=max_frames)
+        checkpoint = checkpoint_repo.get_checkpoint(session_id) if resume else None
+        if checkpoint is not None:
+            frame_count = checkpointer.restore(checkpoint)
+            if not video_service.seek(frame_count):
+                logger.warning("Video source cannot seek, resuming at its current position", session_id=session_id, frame_index=frame_count)
         
-        # Test video source first
-        try:
-            logger.info("Testing video source...")
-            frame_generator = video_service.get_frames()
-            logger.info("Video source initialized successfully")
-        except Exception as e:
-            logger.error("Failed to initialize video source", error=str(e))
-            raise
+        logger.info("Starting video processing", session_id=session_id, max_frames=max_frames, start_frame=frame_count)
         
+        decode_started = time.perf_counter()
         for ret, frame in video_service.get_frames():
+            timer.observe("decode", time.perf_counter() - decode_started)
             if not ret:
                 logger.warning("Video frame read failed", frame_count=frame_count)
                 break
+            if cancel_token.poll(session_repo):
+                break
             
             frame_count += 1
+            if frame_size is None and frame is not None:
+                # Heatmaps are binned in real frame coordinates, so remember the frame size
+                frame_height, frame_width = frame.shape[:2]
+                frame_size = (frame_width, frame_height)
+                session_repo.update(session_id, {"frame_width": frame_width, "frame_height": frame_height})
+                heatmap_accumulator.set_frame_size(frame_width, frame_height)
+                if zone_counter.enabled:
+                    zone_counter.set_frame_size(frame_width, frame_height)
+            
             if frame_count > max_frames:
                 logger.info("Reached max frames limit", frame_count=frame_count, max_frames=max_frames)
                 break
             
             # Detect objects
             try:
+                detect_started = time.perf_counter()
                 detections = detection_service.detect_objects(frame)
+                if detection_service.last_speed:
+                    timer.observe_speed(detection_service.last_speed)
+                else:
+                    timer.observe("inference", time.perf_counter() - detect_started)
                 logger.debug("Detections found", frame_count=frame_count, detections_count=len(detections))
                 
                 # Если детекций нет, это нормально для некоторых кадров
@@ -170,163 +425,205 @@ async def _process_video_analysis(
             except Exception as e:
                 logger.error("Detection failed", frame_count=frame_count, error=str(e))
                 detections = []
+            if cancel_token.cancelled:
+                frame_count -= 1  # not processed; read again on resume
+                break
             
-            # DEBUG: Принудительно добавляем детекцию для теста каждые 50 кадров
-            if frame_count % 50 == 0 and len(detections) == 0:
-                logger.info("Adding test detection", frame_count=frame_count)
-                from app.models.schemas import BoundingBox, Detection as DetectionSchema
-                detections = [DetectionSchema(
-                    class_id=0,
-                    class_name="person",
-                    confidence=0.8,
-                    bbox=BoundingBox(x1=100, y1=100, x2=200, y2=300)
-                )]
-            
-            # Track objects
+            # Track objects in video time, so stay times do not depend on processing speed
+            frame_timestamp = video_service.frame_timestamp(frame_count - 1, video_start)
             try:
-                tracked_objects = tracking_service.track_objects(detections)
+                with timer.stage("tracking"):
+                    tracked_objects = tracking_service.track_objects(detections, frame_timestamp)
                 logger.info("Objects tracked", frame_count=frame_count, tracked_count=len(tracked_objects))
             except Exception as e:
                 logger.error("Tracking failed", frame_count=frame_count, error=str(e))
                 tracked_objects = []
+            if cancel_token.cancelled:
+                frame_count -= 1
+                break
             
             # Create video frame
             video_frame = VideoFrame(
                 frame_number=frame_count,
+                timestamp=frame_timestamp,
                 detections=detections,
                 tracked_objects=tracked_objects
             )
-            frames.append(video_frame)
+            session_stats.add_frame(video_frame)
+            written = bulk_writer.total_written
+            flush_started = time.perf_counter()
+            
+            # Detections and tracked objects are streamed out instead of kept until the end
+            bulk_writer.add_many(DetectionModel, _detection_rows(video_frame))
+            bulk_writer.add_many(TrackedObjectModel, _tracked_object_rows(video_frame))
+            
+            # Zone occupancy and line crossings
+            occupancy = {}
+            if zone_counter.enabled:
+                try:
+                    occupancy = zone_counter.process(tracked_objects, video_frame.timestamp)["occupancy"]
+                    bulk_writer.add_many(ZoneRollup, zone_counter.pop_rollups())
+                except Exception as e:
+                    logger.error("Zone counting failed", frame_count=frame_count, error=str(e))
+            
+            # Per-minute time-series rollups
+            rollup_accumulator.add_frame(video_frame)
+            bulk_writer.add_many(MinuteRollup, rollup_accumulator.pop_rollups())
+            
+            # Accumulate heatmap grid from detection centers
+            if detections:
+                heatmap_accumulator.add(
+                    np.array([(d.bbox.x1 + d.bbox.x2) / 2 for d in detections], dtype=np.float32),
+                    np.array([(d.bbox.y1 + d.bbox.y2) / 2 for d in detections], dtype=np.float32),
+                    np.array([d.confidence for d in detections], dtype=np.float32),
+                    video_frame.timestamp
+                )
+                bulk_writer.add_many(HeatmapGrid, heatmap_accumulator.pop_grids())
+                if heatmap_accumulator.pyramid:
+                    bulk_writer.add_many(HeatmapTile, heatmap_accumulator.pyramid.pop_tiles())
+            
+            if bulk_writer.total_written != written:
+                timer.observe("db_flush", time.perf_counter() - flush_started)
+            
+            # Invalidate cached reads of this session whenever new data became visible
+            if checkpointer.due():
+                with timer.stage("db_flush"):
+                    checkpointer.save(frame_count)
+                await redis_cache.bump_session_version(session_id)
+            elif bulk_writer.autoflush and bulk_writer.total_written != written:
+                await redis_cache.bump_session_version(session_id)
+            
+            frames_processed_total.inc()
+            for detection in detections:
+                detections_total.labels(class_name=class_name_label(detection.class_name)).inc()
+            timer.set_queue_depth("bulk_rows", bulk_writer.pending)
+            timer.frame_done()
+            
+            # Live state for WebSocket viewers, straight from the pipeline
+            await live_publisher.frame(frame_count, tracked_objects, occupancy)
+            
+            # Let other tasks (requests, job heartbeats) run between frames
+            await asyncio.sleep(0)
             
             # Log progress every 10 frames (more frequent for debugging)
             if frame_count % 10 == 0:
                 logger.info("Processing progress", session_id=session_id, frames=frame_count, detections=len(detections), tracked=len(tracked_objects))
+            
+            decode_started = time.perf_counter()
         
-        # Save all detections to database at the end (bulk save)
-        logger.info("Saving all detections to database", session_id=session_id, total_frames=len(frames))
-        total_detections_to_save = sum(len(frame.detections) for frame in frames)
-        logger.info(f"Total detections to save: {total_detections_to_save}")
+        if cancel_token.reason == DELETED:
+            # Nothing left to write the output to
+            session_repo.db.rollback()
+            video_analysis_total.labels(status="cancelled").inc()
+            await live_publisher.end(DELETED)
+            logger.info("Video analysis stopped, session deleted", session_id=session_id, frames=frame_count)
+            return
         
-        if total_detections_to_save == 0:
-            logger.warning("No detections to save - skipping database save")
-        else:
-            try:
-                from app.database.models import Detection as DetectionModel
-                import uuid
-                
-                saved_count = 0
-                for frame in frames:
-                    for detection in frame.detections:
-                        detection_db = DetectionModel(
-                            id=str(uuid.uuid4()),
-                            session_id=session_id,
-                            frame_number=frame.frame_number,
-                            class_name=detection.class_name,
-                            confidence=detection.confidence,
-                            bbox_x=detection.bbox.x1,
-                            bbox_y=detection.bbox.y1,
-                            bbox_width=detection.bbox.x2 - detection.bbox.x1,
-                            bbox_height=detection.bbox.y2 - detection.bbox.y1
-                        )
-                        detection_repo.db.add(detection_db)
-                        saved_count += 1
-                
-                detection_repo.db.commit()
-                logger.info("All detections saved to database successfully", total_saved=saved_count)
-            except Exception as e:
-                logger.error("Failed to save detections to database", error=str(e), exc_info=True)
-                detection_repo.db.rollback()
-                raise
-            
-            # Save tracked objects
-            try:
-                from app.database.models import TrackedObject as TrackedObjectModel
-                from datetime import datetime
-                
-                tracked_objects_count = sum(len(frame.tracked_objects) for frame in frames)
-                logger.info(f"Saving {tracked_objects_count} tracked objects to database")
-                
-                saved_tracked = 0
-                for frame in frames:
-                    for tracked_obj in frame.tracked_objects:
-                        tracked_db = TrackedObjectModel(
-                            id=tracked_obj.id,
-                            session_id=session_id,
-                            track_id=tracked_obj.track_id,
-                            first_seen=tracked_obj.first_seen,
-                            last_seen=tracked_obj.last_seen,
-                            total_detections=tracked_obj.total_detections,
-                            duration=tracked_obj.duration,
-                            is_active=tracked_obj.is_active
-                        )
-                        detection_repo.db.add(tracked_db)
-                        saved_tracked += 1
-                
-                detection_repo.db.commit()
-                logger.info("All tracked objects saved to database successfully", total_saved=saved_tracked)
-            except Exception as e:
-                logger.error("Failed to save tracked objects to database", error=str(e), exc_info=True)
-                detection_repo.db.rollback()
-            
-            # Save heatmap points (extract from detections)
-            try:
-                from app.database.models import HeatmapPoint as HeatmapPointModel
-                
-                heatmap_points_count = 0
-                saved_heatmap = 0
-                
-                for frame in frames:
-                    for detection in frame.detections:
-                        # Create heatmap point from detection center
-                        center_x = (detection.bbox.x1 + detection.bbox.x2) / 2
-                        center_y = (detection.bbox.y1 + detection.bbox.y2) / 2
-                        
-                        heatmap_db = HeatmapPointModel(
-                            id=str(uuid.uuid4()),
-                            session_id=session_id,
-                            x=center_x,
-                            y=center_y,
-                            intensity=detection.confidence,
-                            timestamp=frame.timestamp
-                        )
-                        detection_repo.db.add(heatmap_db)
-                        saved_heatmap += 1
-                        heatmap_points_count += 1
-                
-                if heatmap_points_count > 0:
-                    detection_repo.db.commit()
-                    logger.info("All heatmap points saved to database successfully", total_saved=saved_heatmap)
-            except Exception as e:
-                logger.error("Failed to save heatmap points to database", error=str(e), exc_info=True)
-                detection_repo.db.rollback()
+        if cancel_token.reason == INTERRUPTED and checkpointer.enabled:
+            # Shutdown: commit the buffered rows with a checkpoint and keep the open minutes open for a resume
+            with timer.stage("db_flush"):
+                checkpointer.save(frame_count)
+            session_repo.update_session_stats(
+                session_id=session_id,
+                total_frames=session_stats.total_frames,
+                total_people=session_stats.total_people,
+                peak_people_count=session_stats.peak_people_count,
+                average_stay_time=session_stats.average_stay_time
+            )
+            session_repo.update(session_id, {"status": INTERRUPTED, "timing_summary": json.dumps(timer.summary())})
+            await redis_cache.bump_session_version(session_id)
+            video_analysis_total.labels(status=INTERRUPTED).inc()
+            await live_publisher.end(INTERRUPTED)
+            logger.info("Video analysis interrupted", session_id=session_id, frame_index=frame_count)
+            return
+        
+        # Close the open minutes and time buckets
+        flush_started = time.perf_counter()
+        if heatmap_accumulator.pyramid:
+            heatmap_accumulator.pyramid.finalize()
+            bulk_writer.add_many(HeatmapTile, heatmap_accumulator.pyramid.pop_tiles())
+        bulk_writer.add_many(HeatmapGrid, heatmap_accumulator.pop_grids(final=True))
         
-        # Calculate analytics
-        analytics = analytics_service.calculate_analytics(frames, session_id)
+        if zone_counter.enabled:
+            zone_counter.finalize()
+            bulk_writer.add_many(ZoneRollup, zone_counter.pop_rollups())
         
-        # Update session with analytics
+        rollup_accumulator.finalize()
+        bulk_writer.add_many(MinuteRollup, rollup_accumulator.pop_rollups())
+        
+        # The remaining rows, the checkpoint removal and the session stats are committed together
+        logger.info("Saving pipeline output", session_id=session_id, rows=bulk_writer.pending, detections=session_stats.total_detections)
+        bulk_writer.flush(commit=False)
+        checkpoint_repo.delete_checkpoint(session_id, commit=False)
         session_repo.update_session_stats(
             session_id=session_id,
-            total_frames=analytics.total_frames,
-            total_people=analytics.total_people,
-            peak_people_count=analytics.peak_people_count,
-            average_stay_time=analytics.average_stay_time
+            total_frames=session_stats.total_frames,
+            total_people=session_stats.total_people,
+            peak_people_count=session_stats.peak_people_count,
+            average_stay_time=session_stats.average_stay_time
         )
+        timer.observe("db_flush", time.perf_counter() - flush_started)
+        timer.set_queue_depth("bulk_rows", bulk_writer.pending)
         
-        # Complete session
-        session_repo.complete_session(session_id)
+        # Complete session; a cancelled one keeps the output up to where it stopped
+        timing_summary = timer.summary()
+        status = cancel_token.reason or "completed"
+        session_repo.complete_session(session_id, timing_summary=timing_summary, status=status)
+        await redis_cache.bump_session_version(session_id)
+        video_analysis_total.labels(status=status).inc()
+        await live_publisher.end(status)
         
-        logger.info("Video analysis completed", session_id=session_id, frames=frame_count)
+        logger.info("Video analysis finished", session_id=session_id, status=status, frames=frame_count, fps=timing_summary["fps"])
         
     except Exception as e:
         logger.error("Video analysis failed", session_id=session_id, error=str(e))
-        # Mark session as failed
+        video_analysis_total.labels(status="failed").inc()
+        # Mark session as failed; output up to the last checkpoint stays and can be resumed
         try:
+            session_repo.db.rollback()
             session = session_repo.get(session_id)
             if session:
                 session.status = "failed"
                 session_repo.db.commit()
+            await redis_cache.bump_session_version(session_id)
+            await live_publisher.end("failed")
         except:
             pass
+    finally:
+        session_registry.finish(session_id)
+        timer.close()
+
+
+def _detection_rows(video_frame: VideoFrame) -> List[dict]:
+    """Detection rows of one frame."""
+    return [
+        {
+            "frame_number": video_frame.frame_number,
+            "timestamp": video_frame.timestamp,
+            "class_name": detection.class_name,
+            "confidence": detection.confidence,
+            "bbox_x": detection.bbox.x1,
+            "bbox_y": detection.bbox.y1,
+            "bbox_width": detection.bbox.x2 - detection.bbox.x1,
+            "bbox_height": detection.bbox.y2 - detection.bbox.y1
+        }
+        for detection in video_frame.detections
+    ]
+
+
+def _tracked_object_rows(video_frame: VideoFrame) -> List[dict]:
+    """TrackedObject rows of one frame; row ids are generated, track ids repeat across sessions."""
+    return [
+        {
+            "track_id": tracked_obj.track_id,
+            "first_seen": tracked_obj.first_seen,
+            "last_seen": tracked_obj.last_seen,
+            "total_detections": tracked_obj.total_detections,
+            "duration": tracked_obj.duration,
+            "is_active": tracked_obj.is_active
+        }
+        for tracked_obj in video_frame.tracked_objects
+    ]
 
 
 @router.get("/analyze/{session_id}")
@@ -349,7 +646,8 @@ async def get_analysis_status(
                 "total_frames": session.total_frames,
                 "total_people": session.total_people,
                 "peak_people_count": session.peak_people_count,
-                "average_stay_time": session.average_stay_time
+                "average_stay_time": session.average_stay_time,
+                "timing_summary": json.loads(session.timing_summary) if session.timing_summary else None
             },
             message="Analysis status retrieved"
         )
@@ -369,21 +667,27 @@ async def get_sessions(
 ):
     """Get recent analysis sessions."""
     try:
-        sessions = session_repo.get_recent_sessions(limit=limit)
+        def load_sessions() -> List[dict]:
+            sessions = session_repo.get_recent_sessions(limit=limit, skip=skip)
+            
+            session_data = []
+            for session in sessions:
+                session_data.append({
+                    "session_id": session.id,
+                    "status": session.status,
+                    "source_type": session.source_type,
+                    "start_time": session.start_time.isoformat() if session.start_time else None,
+                    "end_time": session.end_time.isoformat() if session.end_time else None,
+                    "total_frames": session.total_frames,
+                    "total_people": session.total_people,
+                    "peak_people_count": session.peak_people_count,
+                    "average_stay_time": session.average_stay_time
+                })
+            return session_data
         
-        session_data = []
-        for session in sessions:
-            session_data.append({
-                "session_id": session.id,
-                "status": session.status,
-                "source_type": session.source_type,
-                "start_time": session.start_time.isoformat() if session.start_time else None,
-                "end_time": session.end_time.isoformat() if session.end_time else None,
-                "total_frames": session.total_frames,
-                "total_people": session.total_people,
-                "peak_people_count": session.peak_people_count,
-                "average_stay_time": session.average_stay_time
-            })
+        # The list key changes whenever any session is created, updated or deleted
+        cache_key = await redis_cache.sessions_key("sessions", skip, limit)
+        session_data = await redis_cache.get_or_load(cache_key, load_sessions, ttl=settings.cache_active_ttl)
         
         return success_response(
             data=session_data,
@@ -402,10 +706,14 @@ async def delete_session(
 ):
     """Delete analysis session."""
     try:
+        # A pipeline of this process stops without writing; one elsewhere notices the missing session
+        session_registry.cancel(session_id, DELETED)
         success = session_repo.delete(session_id)
         if not success:
             raise HTTPException(status_code=404, detail="Session not found")
         
+        await redis_cache.clear_session_cache(session_id)
+        
         return success_response(
             message="Session deleted successfully"
         )
@@ -0,0 +1,302 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import itertools
+import json
+import time
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+import structlog
+from app.core.config import settings
+from app.models.schemas import VideoAnalysisRequest
+
+logger = structlog.get_logger()
+
+
+class AnalysisJob:
+    """A queued video analysis: the session to process and the request that created it."""
+
+    def __init__(
+        self,
+        session_id: str,
+        request: Dict[str, Any],
+        attempt: int = 1,
+        enqueued_at: float = None,
+        job_id: Optional[str] = None,
+        deliveries: int = 1
+    ):
+        self.session_id = session_id
+        self.request = request
+        self.attempt = attempt  # attempt the message was queued for
+        self.enqueued_at = enqueued_at or time.time()
+        self.job_id = job_id
+        self.deliveries = deliveries  # times this message was handed to a worker
+
+    @property
+    def attempts(self) -> int:
+        """Attempts so far, counting redeliveries after a worker died as well as explicit retries."""
+        return self.attempt + self.deliveries - 1
+
+    @property
+    def analysis_request(self) -> VideoAnalysisRequest:
+        """The original analyze request."""
+        return VideoAnalysisRequest(**self.request)
+
+    def to_fields(self) -> Dict[str, str]:
+        """Flat string fields of a stream entry."""
+        return {
+            "session_id": self.session_id,
+            "request": json.dumps(self.request),
+            "attempt": str(self.attempt),
+            "enqueued_at": str(self.enqueued_at)
+        }
+
+    @classmethod
+    def from_fields(cls, job_id: str, fields: Dict[str, str], deliveries: int = 1) -> 'AnalysisJob':
+        """Job from a stream entry."""
+        return cls(
+            session_id=fields["session_id"],
+            request=json.loads(fields["request"]),
+            attempt=int(fields.get("attempt", 1)),
+            enqueued_at=float(fields.get("enqueued_at", 0)) or None,
+            job_id=job_id,
+            deliveries=deliveries
+        )
+
+
+class AnalysisJobQueue(ABC):
+    """At-least-once queue of analysis jobs: a claimed job is redelivered unless acked before its visibility timeout."""
+
+    def __init__(self, visibility_timeout: float = None, max_attempts: int = None):
+        self.visibility_timeout = visibility_timeout or settings.analysis_visibility_timeout
+        self.max_attempts = max_attempts or settings.analysis_max_attempts
+
+    @abstractmethod
+    async def enqueue(self, job: AnalysisJob) -> str:
+        """Add a job; returns its id."""
+        pass
+
+    @abstractmethod
+    async def claim(self, consumer: str, block_seconds: float = 5.0) -> Optional[AnalysisJob]:
+        """Next job for a consumer: an expired one first, then a new one; None if none arrived in time."""
+        pass
+
+    @abstractmethod
+    async def ack(self, job: AnalysisJob) -> None:
+        """Remove a finished job from the pending jobs."""
+        pass
+
+    @abstractmethod
+    async def touch(self, job: AnalysisJob, consumer: str) -> None:
+        """Heartbeat: restart the visibility timeout of a job still being processed."""
+        pass
+
+    @abstractmethod
+    async def dead_letter(self, job: AnalysisJob, error: str) -> None:
+        """Move a job that used up its attempts out of the queue."""
+        pass
+
+    def attempt_allowed(self, attempt: int) -> bool:
+        """Whether a job may make its attempt with this number (1-based), by retry or by redelivery."""
+        return attempt <= self.max_attempts
+
+    async def retry(self, job: AnalysisJob, error: str) -> bool:
+        """Queue a failed job again; False (and dead-lettered) once its attempts are used up."""
+        if not self.attempt_allowed(job.attempts + 1):
+            await self.dead_letter(job, error)
+            return False
+
+        # Enqueue before the ack: a crash in between leaves a duplicate, never a lost job
+        await self.enqueue(AnalysisJob(job.session_id, job.request, job.attempts + 1, job.enqueued_at))
+        await self.ack(job)
+        logger.warning("Analysis job queued for retry", session_id=job.session_id, attempt=job.attempts + 1, error=error)
+        return True
+
+    async def release(self, job: AnalysisJob) -> None:
+        """Queue an unfinished job again without counting an attempt, e.g. when its worker shuts down."""
+        await self.enqueue(AnalysisJob(job.session_id, job.request, job.attempts, job.enqueued_at))
+        await self.ack(job)
+        logger.info("Analysis job released", session_id=job.session_id, attempt=job.attempts)
+
+    async def close(self) -> None:
+        """Release connections."""
+        pass
+
+
+class RedisStreamJobQueue(AnalysisJobQueue):
+    """Durable queue on a Redis stream shared by any number of worker processes through a consumer group."""
+
+    def __init__(
+        self,
+        client: redis.Redis = None,
+        stream: str = None,
+        group: str = None,
+        dead_letter_stream: str = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        # A client of its own: XREADGROUP blocks longer than the cache client's socket timeout
+        self.client = client or redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            decode_responses=True,
+            socket_connect_timeout=settings.redis_socket_timeout
+        )
+        self.stream = stream or settings.analysis_stream
+        self.group = group or settings.analysis_consumer_group
+        self.dead_letter_stream = dead_letter_stream or settings.analysis_dead_letter_stream
+        self._group_ready = False
+
+    async def _ensure_group(self) -> None:
+        """Create the stream and the consumer group on first use."""
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            logger.info("Analysis consumer group created", stream=self.stream, group=self.group)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def enqueue(self, job: AnalysisJob) -> str:
+        """Add a job; the stream is trimmed to roughly analysis_stream_maxlen entries."""
+        await self._ensure_group()
+        job.job_id = await self.client.xadd(
+            self.stream,
+            job.to_fields(),
+            maxlen=settings.analysis_stream_maxlen,
+            approximate=True
+        )
+        logger.info("Analysis job queued", session_id=job.session_id, job_id=job.job_id, attempt=job.attempt)
+        return job.job_id
+
+    async def claim(self, consumer: str, block_seconds: float = 5.0) -> Optional[AnalysisJob]:
+        """Take over a job whose worker stopped sending heartbeats, otherwise read a new one."""
+        await self._ensure_group()
+
+        reclaimed = await self.client.xautoclaim(
+            self.stream,
+            self.group,
+            consumer,
+            min_idle_time=int(self.visibility_timeout * 1000),
+            start_id="0-0",
+            count=1
+        )
+        for job_id, fields in reclaimed[1]:
+            if not fields:
+                # Trimmed from the stream while pending; nothing left to process
+                await self.client.xack(self.stream, self.group, job_id)
+                continue
+            job = AnalysisJob.from_fields(job_id, fields, await self._deliveries(job_id))
+            logger.warning("Analysis job reclaimed", session_id=job.session_id, job_id=job_id, attempts=job.attempts)
+            return job
+
+        response = await self.client.xreadgroup(
+            self.group,
+            consumer,
+            {self.stream: ">"},
+            count=1,
+            block=int(block_seconds * 1000)
+        )
+        for _, entries in response or []:
+            for job_id, fields in entries:
+                return AnalysisJob.from_fields(job_id, fields)
+        return None
+
+    async def _deliveries(self, job_id: str) -> int:
+        """Delivery count of a pending job, including the current one."""
+        pending = await self.client.xpending_range(self.stream, self.group, min=job_id, max=job_id, count=1)
+        return pending[0]["times_delivered"] if pending else 1
+
+    async def ack(self, job: AnalysisJob) -> None:
+        """Acknowledge the job in the consumer group."""
+        await self.client.xack(self.stream, self.group, job.job_id)
+
+    async def touch(self, job: AnalysisJob, consumer: str) -> None:
+        """Claim the job again for the same consumer, which resets its idle time without counting a delivery."""
+        await self.client.xclaim(self.stream, self.group, consumer, 0, [job.job_id], justid=True)
+
+    async def dead_letter(self, job: AnalysisJob, error: str) -> None:
+        """Copy the job to the dead-letter stream with the error, then acknowledge it."""
+        await self.client.xadd(
+            self.dead_letter_stream,
+            {**job.to_fields(), "attempts": str(job.attempts), "error": error[:1000], "failed_at": str(time.time())},
+            maxlen=settings.analysis_stream_maxlen,
+            approximate=True
+        )
+        await self.ack(job)
+        logger.error("Analysis job dead-lettered", session_id=job.session_id, attempts=job.attempts, error=error)
+
+    async def close(self) -> None:
+        """Close the Redis connections."""
+        await self.client.aclose()
+
+
+class LocalJobQueue(AnalysisJobQueue):
+    """In-process stand-in with the same delivery semantics, for tests and single-process deployments."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # job id -> (job, visibility deadline, consumer)
+        self.pending: Dict[str, Tuple[AnalysisJob, float, str]] = {}
+        self.dead: List[Tuple[AnalysisJob, str]] = []
+        self._ids = itertools.count(1)
+
+    async def enqueue(self, job: AnalysisJob) -> str:
+        """Add a job."""
+        job.job_id = str(next(self._ids))
+        self.queue.put_nowait(job)
+        logger.info("Analysis job queued", session_id=job.session_id, job_id=job.job_id, attempt=job.attempt)
+        return job.job_id
+
+    async def claim(self, consumer: str, block_seconds: float = 5.0) -> Optional[AnalysisJob]:
+        """Redeliver a job past its visibility timeout, otherwise wait for a new one."""
+        now = time.monotonic()
+        for job_id, (job, deadline, _) in list(self.pending.items()):
+            if deadline <= now:
+                redelivered = AnalysisJob(job.session_id, job.request, job.attempt, job.enqueued_at, job_id, job.deliveries + 1)
+                self.pending[job_id] = (redelivered, now + self.visibility_timeout, consumer)
+                logger.warning("Analysis job reclaimed", session_id=job.session_id, job_id=job_id, attempts=redelivered.attempts)
+                return redelivered
+
+        try:
+            job = await asyncio.wait_for(self.queue.get(), timeout=block_seconds)
+        except asyncio.TimeoutError:
+            return None
+        self.pending[job.job_id] = (job, time.monotonic() + self.visibility_timeout, consumer)
+        return job
+
+    async def ack(self, job: AnalysisJob) -> None:
+        """Forget the job."""
+        self.pending.pop(job.job_id, None)
+
+    async def touch(self, job: AnalysisJob, consumer: str) -> None:
+        """Push the job's visibility deadline out again."""
+        if job.job_id in self.pending:
+            self.pending[job.job_id] = (self.pending[job.job_id][0], time.monotonic() + self.visibility_timeout, consumer)
+
+    async def dead_letter(self, job: AnalysisJob, error: str) -> None:
+        """Keep the job and its error in memory."""
+        self.dead.append((job, error))
+        await self.ack(job)
+        logger.error("Analysis job dead-lettered", session_id=job.session_id, attempts=job.attempts, error=error)
+
+
+class AnalysisQueueFactory:
+    """Factory for the queue of the configured analysis mode."""
+
+    @staticmethod
+    def create(mode: str = None) -> Optional[AnalysisJobQueue]:
+        """Queue for the mode; None for inline analysis in the API process."""
+        mode = mode or settings.analysis_mode
+        if mode == "inline":
+            return None
+        elif mode == "redis":
+            return RedisStreamJobQueue()
+        elif mode == "local":
+            return LocalJobQueue()
+        else:
+            raise ValueError(f"Unsupported analysis mode: {mode}")
@@ -0,0 +1,218 @@
+from typing import Callable, List, Optional
+import asyncio
+import os
+import signal
+import socket
+import time
+import structlog
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import analysis_jobs_total, analysis_job_wait_seconds
+from app.core.redis_cache import redis_cache
+from app.database.connection import SessionLocal, create_tables
+from app.repositories.video_session_repository import VideoSessionRepository
+from app.repositories.detection_repository import DetectionRepository
+from app.repositories.checkpoint_repository import CheckpointRepository
+from app.routes.video import _process_video_analysis
+from app.services.analysis_queue import AnalysisJob, AnalysisJobQueue, AnalysisQueueFactory
+from app.services.analytics_service import AnalyticsService
+from app.services.checkpoint_service import resume_request
+from app.services.detection_service import DetectionService
+from app.services.live_updates import live_broker
+from app.services.model_registry import model_registry
+from app.services.session_control import session_registry, CANCELLED, INTERRUPTED
+from app.services.tracking_service import TrackingService
+from app.services.video_service import VideoService, VideoSourceFactory
+
+logger = structlog.get_logger()
+
+
+class AnalysisWorker:
+    """Consumes analysis jobs and runs the video pipeline; any number of workers can share one queue."""
+
+    def __init__(
+        self,
+        queue: AnalysisJobQueue,
+        session_factory: Callable[[], Session] = SessionLocal,
+        concurrency: int = None,
+        consumer_name: str = None,
+        poll_seconds: float = 5.0
+    ):
+        self.queue = queue
+        self.session_factory = session_factory
+        self.concurrency = concurrency or settings.analysis_worker_concurrency
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self.poll_seconds = poll_seconds
+        self._stopping = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the consumers."""
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._consume(f"{self.consumer_name}-{index}"), name=f"analysis-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        logger.info("Analysis workers started", consumer=self.consumer_name, concurrency=self.concurrency)
+
+    async def stop(self, drain_timeout: float = None) -> None:
+        """Stop claiming jobs and interrupt the running ones; they checkpoint and go back to the queue."""
+        drain_timeout = settings.analysis_drain_timeout if drain_timeout is None else drain_timeout
+        self._stopping.set()
+        session_registry.interrupt_all()
+        _, pending = await asyncio.wait(self._tasks, timeout=drain_timeout) if self._tasks else (set(), set())
+        for task in pending:
+            # Not acked: the job is redelivered after the visibility timeout
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Analysis workers stopped", consumer=self.consumer_name, abandoned=len(pending))
+
+    async def _consume(self, consumer: str) -> None:
+        """Claim and run jobs until stopped."""
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(consumer, block_seconds=self.poll_seconds)
+            except Exception as e:
+                logger.error("Failed to claim analysis job", consumer=consumer, error=str(e))
+                await asyncio.sleep(self.poll_seconds)
+                continue
+
+            if job is None:
+                continue
+            if self._stopping.is_set():
+                # Claimed while stopping: hand it to another worker right away
+                await self.queue.release(job)
+                break
+            try:
+                await self._run(job, consumer)
+            except Exception as e:
+                # Not acked: the job is redelivered after the visibility timeout
+                logger.error("Analysis worker error", consumer=consumer, session_id=job.session_id, error=str(e))
+
+    async def _heartbeat(self, job: AnalysisJob, consumer: str) -> None:
+        """Keep the job claimed while the pipeline runs."""
+        while True:
+            await asyncio.sleep(settings.analysis_heartbeat_interval)
+            try:
+                await self.queue.touch(job, consumer)
+            except Exception as e:
+                logger.warning("Analysis job heartbeat failed", session_id=job.session_id, error=str(e))
+
+    async def _run(self, job: AnalysisJob, consumer: str) -> None:
+        """Run one job; session status reaches the API through the database."""
+        db = self.session_factory()
+        heartbeat = asyncio.create_task(self._heartbeat(job, consumer))
+        try:
+            session_repo = VideoSessionRepository(db)
+            session = session_repo.get(job.session_id)
+            if not session or session.status in ("completed", "failed", CANCELLED):
+                # Deleted or cancelled meanwhile, or a duplicate delivery of a job that already finished
+                logger.info("Analysis job skipped", session_id=job.session_id, status=session.status if session else None)
+                await self.queue.ack(job)
+                return
+            if session.status == "cancelling":
+                # Cancelled while no worker was running it
+                session_repo.update(job.session_id, {"status": CANCELLED})
+                await redis_cache.bump_session_version(job.session_id)
+                await self.queue.ack(job)
+                analysis_jobs_total.labels(status=CANCELLED).inc()
+                return
+
+            if not self.queue.attempt_allowed(job.attempts):
+                # Redelivered after workers died on it as many times as it may be attempted
+                await self.queue.dead_letter(job, "worker did not finish the job")
+                await self._fail_session(session_repo, job.session_id)
+                analysis_jobs_total.labels(status="dead_lettered").inc()
+                return
+
+            checkpoint = CheckpointRepository(db).get_checkpoint(job.session_id)
+            resume = checkpoint is not None and resume_request(session, checkpoint) is not None
+            if resume:
+                # Output up to the checkpoint is committed and nothing past it: continue from there
+                session_repo.update(job.session_id, {"status": "active"})
+            elif checkpoint is not None or job.attempts > 1 or session.status != "queued":
+                # A previous attempt may have written part of the output
+                session_repo.reset_session_data(job.session_id)
+            else:
+                session_repo.update(job.session_id, {"status": "active"})
+            await redis_cache.bump_session_version(job.session_id)
+            analysis_job_wait_seconds.observe(max(time.time() - job.enqueued_at, 0.0))
+
+            request = job.analysis_request
+            try:
+                video_service = VideoService(VideoSourceFactory.create(request.source_type, request.source_path))
+            except Exception as e:
+                # The source may come back (stream restarting, file still being copied), possibly on another node
+                logger.warning("Failed to open video source", session_id=job.session_id, error=str(e))
+                if await self.queue.retry(job, str(e)):
+                    session_repo.update(job.session_id, {"status": "queued"})
+                    analysis_jobs_total.labels(status="retried").inc()
+                else:
+                    await self._fail_session(session_repo, job.session_id)
+                    analysis_jobs_total.labels(status="dead_lettered").inc()
+                return
+
+            logger.info("Analysis job started", session_id=job.session_id, consumer=consumer, attempt=job.attempts, resume=resume)
+            await _process_video_analysis(
+                job.session_id,
+                video_service,
+                DetectionService.create_person_detector(),
+                TrackingService.create_simple_tracker(),
+                None,
+                AnalyticsService(session_repo, DetectionRepository(db)),
+                session_repo,
+                request.duration,
+                request.zones,
+                request.lines,
+                resume
+            )
+            # The pipeline marks the session completed, failed or cancelled; failures are not retried
+            status = session_repo.get_status(job.session_id)
+            if status == INTERRUPTED:
+                # Stopped by a shutdown: any worker resumes it from the checkpoint
+                await self.queue.release(job)
+            else:
+                await self.queue.ack(job)
+            analysis_jobs_total.labels(status=status or "deleted").inc()
+        finally:
+            heartbeat.cancel()
+            db.close()
+
+    @staticmethod
+    async def _fail_session(session_repo: VideoSessionRepository, session_id: str) -> None:
+        """Mark a session whose job gave up as failed."""
+        session_repo.update(session_id, {"status": "failed"})
+        await redis_cache.bump_session_version(session_id)
+
+
+async def run_worker(queue: Optional[AnalysisJobQueue] = None) -> None:
+    """Worker role: preload the model and consume analysis jobs until SIGTERM or SIGINT."""
+    if settings.analysis_mode != "redis" and queue is None:
+        raise RuntimeError("The worker role needs ANALYSIS_MODE=redis to share jobs with the API")
+
+    create_tables()
+    await redis_cache.connect()
+    await live_broker.connect()
+    if settings.analysis_worker_metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(settings.analysis_worker_metrics_port)
+
+    # Pay the model load before taking jobs, not inside the first one
+    await asyncio.to_thread(model_registry.get, settings.yolo_model)
+
+    queue = queue or AnalysisQueueFactory.create("redis")
+    worker = AnalysisWorker(queue)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    await worker.start()
+    await stop.wait()
+    logger.info("Analysis worker shutting down; interrupting running jobs")
+    await worker.stop()
+    await queue.close()
+    await live_broker.close()
+    await redis_cache.close()
@@ -1,184 +1,263 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
+import json
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import structlog
-from app.models.schemas import TrackedObject, HeatmapPoint, AnalyticsData, VideoFrame
+from app.models.schemas import AnalyticsData, VideoFrame
 from app.repositories.video_session_repository import VideoSessionRepository
 from app.repositories.detection_repository import DetectionRepository
+from app.repositories.heatmap_repository import HeatmapRepository
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.zone_repository import ZoneRepository
+from app.services.heatmap_service import HeatmapRenderer, TIME_GRANULARITIES, decode_grid, resample_grid
+from app.core.config import settings
+from app.core.utils import epoch_bucket, bucket_start_time
 
 logger = structlog.get_logger()
 
 
+class MinuteRollupAccumulator:
+    """Per-minute counters filled by the pipeline and flushed as minutes close."""
+    
+    def __init__(self):
+        self.current_bucket: Optional[int] = None
+        self.current: Dict[str, int] = {}
+        self.seen_track_ids: Set[int] = set()
+        self.closed_rollups: List[Dict[str, Any]] = []
+    
+    def add_frame(self, frame: VideoFrame) -> None:
+        """Add one processed frame to its minute bucket."""
+        bucket_index = epoch_bucket(frame.timestamp, 60)
+        
+        if self.current_bucket is not None and bucket_index > self.current_bucket:
+            self._close_bucket()
+        if self.current_bucket is None:
+            self.current_bucket = bucket_index
+            self.current = {"frames": 0, "detections": 0, "people_sum": 0, "people_max": 0, "entries": 0}
+        
+        people = [obj for obj in frame.tracked_objects if obj.detection.class_name == "person"]
+        new_tracks = {obj.track_id for obj in people} - self.seen_track_ids
+        self.seen_track_ids.update(new_tracks)
+        
+        self.current["frames"] += 1
+        self.current["detections"] += len(frame.detections)
+        self.current["people_sum"] += len(people)
+        self.current["people_max"] = max(self.current["people_max"], len(people))
+        self.current["entries"] += len(new_tracks)
+    
+    def finalize(self) -> None:
+        """Close the open minute."""
+        if self.current_bucket is not None:
+            self._close_bucket()
+    
+    def pop_rollups(self) -> List[Dict[str, Any]]:
+        """Return rollups closed since the last call."""
+        rollups, self.closed_rollups = self.closed_rollups, []
+        return rollups
+    
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable state for a checkpoint; closed minutes must have been popped."""
+        return {
+            "current_bucket": self.current_bucket,
+            "current": self.current,
+            "seen_track_ids": sorted(self.seen_track_ids)
+        }
+    
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state saved by get_state."""
+        self.current_bucket = state["current_bucket"]
+        self.current = dict(state["current"])
+        self.seen_track_ids = set(state["seen_track_ids"])
+    
+    def _close_bucket(self) -> None:
+        """Move the open minute to the closed list."""
+        self.closed_rollups.append({
+            "bucket_index": self.current_bucket,
+            "minute_start": bucket_start_time(self.current_bucket, 60),
+            **self.current
+        })
+        self.current_bucket = None
+        self.current = {}
+
+
+class SessionStatsAccumulator:
+    """Running session statistics, so the pipeline does not keep every frame in memory."""
+    
+    def __init__(self):
+        self.total_frames = 0
+        self.total_detections = 0
+        self.peak_people_count = 0
+        self.tracked_objects = 0
+        self.stay_time_sum = 0.0
+        self.person_track_ids: Set[int] = set()
+    
+    def add_frame(self, frame: VideoFrame) -> None:
+        """Add one processed frame."""
+        people = [obj for obj in frame.tracked_objects if obj.detection.class_name == "person"]
+        self.total_frames += 1
+        self.total_detections += len(frame.detections)
+        self.peak_people_count = max(self.peak_people_count, len(people))
+        self.person_track_ids.update(obj.track_id for obj in people)
+        self.tracked_objects += len(frame.tracked_objects)
+        self.stay_time_sum += sum((obj.last_seen - obj.first_seen).total_seconds() for obj in frame.tracked_objects)
+    
+    @property
+    def total_people(self) -> int:
+        """Distinct person tracks seen in the session."""
+        return len(self.person_track_ids)
+    
+    @property
+    def average_stay_time(self) -> float:
+        """Average time between first and last sighting over all tracked objects."""
+        return self.stay_time_sum / self.tracked_objects if self.tracked_objects else 0.0
+    
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable state for a checkpoint."""
+        return {**vars(self), "person_track_ids": sorted(self.person_track_ids)}
+    
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state saved by get_state."""
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.person_track_ids = set(state["person_track_ids"])
+
+
 class AnalyticsService:
     """Service for video analytics operations."""
     
     def __init__(self, session_repo: VideoSessionRepository, detection_repo: DetectionRepository):
         self.session_repo = session_repo
         self.detection_repo = detection_repo
+        self.heatmap_repo = HeatmapRepository(session_repo.db)
+        self.rollup_repo = RollupRepository(session_repo.db)
+        self.zone_repo = ZoneRepository(session_repo.db)
     
-    def calculate_analytics(self, frames: List[VideoFrame], session_id: str) -> AnalyticsData:
-        """Calculate comprehensive analytics from video frames."""
+    def generate_session_heatmap(
+        self,
+        session_id: str,
+        width: int = 100,
+        height: int = 100,
+        blur_sigma: float = 0.0,
+        normalization: str = "none",
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Generate heatmap matrix for a session from its stored grid."""
         try:
-            # Extract all tracked objects from frames
-            all_tracked_objects = []
-            for frame in frames:
-                all_tracked_objects.extend(frame.tracked_objects)
-            
-            # Calculate basic statistics
-            # For now, use peak_people_count as total_people because SimpleTrackingStrategy
-            # doesn't track the same person across frames - it creates new objects for each detection
-            peak_people_count = self._calculate_peak_people_count(frames)
-            total_people = peak_people_count  # Use peak as total until we implement proper tracking
-            average_stay_time = self._calculate_average_stay_time(all_tracked_objects)
-            
-            # Calculate heatmap points
-            heatmap_points = self._calculate_heatmap_points(all_tracked_objects)
-            
-            # Calculate peak hours
-            peak_hours = self._calculate_peak_hours(frames)
-            
-            # Calculate session duration
-            if frames:
-                session_duration = (frames[-1].timestamp - frames[0].timestamp).total_seconds()
-            else:
-                session_duration = 0.0
+            session = self.session_repo.get(session_id)
+            if not session:
+                return None
             
-            analytics = AnalyticsData(
-                session_id=session_id,
-                start_time=frames[0].timestamp if frames else datetime.now(),
-                end_time=frames[-1].timestamp if frames else None,
-                total_frames=len(frames),
-                total_people=total_people,
-                peak_people_count=peak_people_count,
-                average_stay_time=average_stay_time,
-                heatmap_points=heatmap_points,
-                peak_hours=peak_hours,
-                metadata={
-                    "total_detections": sum(len(frame.detections) for frame in frames),
-                    "total_tracked_objects": len(all_tracked_objects),
-                    "session_duration": session_duration
-                }
-            )
+            grid, points_count = self._load_session_grid(session_id, start_time, end_time)
             
-            logger.info("Analytics calculated", session_id=session_id, total_people=total_people)
-            return analytics
+            if grid is not None:
+                heatmap = resample_grid(grid, width, height)
+                if blur_sigma > 0:
+                    heatmap = HeatmapRenderer.gaussian_blur(heatmap, blur_sigma)
+                heatmap = HeatmapRenderer.normalize(heatmap, normalization)
+            else:
+                # Sessions recorded before grids existed only have raw points
+                xs, ys, intensities = self.session_repo.get_heatmap_point_arrays(session_id)
+                points_count = int(xs.size)
+                renderer = HeatmapRenderer(session.frame_width, session.frame_height)
+                heatmap = renderer.render(xs, ys, intensities, width, height, blur_sigma, normalization)
+            
+            logger.debug("Heatmap data generated", session_id=session_id, shape=heatmap.shape, points=points_count)
+            return {
+                "heatmap": heatmap,
+                "points_count": points_count,
+                "frame_width": session.frame_width,
+                "frame_height": session.frame_height
+            }
             
         except Exception as e:
-            logger.error("Failed to calculate analytics", session_id=session_id, error=str(e))
+            logger.error("Failed to generate session heatmap", session_id=session_id, error=str(e))
             raise
     
-    def _calculate_peak_people_count(self, frames: List[VideoFrame]) -> int:
-        """Calculate peak number of people in any single frame."""
-        if not frames:
-            return 0
-        
-        peak_count = 0
-        for frame in frames:
-            people_count = len([obj for obj in frame.tracked_objects if obj.detection.class_name == "person"])
-            peak_count = max(peak_count, people_count)
-        
-        return peak_count
-    
-    def _calculate_average_stay_time(self, tracked_objects: List[TrackedObject]) -> float:
-        """Calculate average stay time for tracked objects."""
-        if not tracked_objects:
-            return 0.0
-        
-        # Calculate duration from first_seen to last_seen
-        total_duration = 0.0
-        for obj in tracked_objects:
-            duration = (obj.last_seen - obj.first_seen).total_seconds()
-            total_duration += duration
-        
-        return total_duration / len(tracked_objects)
-    
-    def _calculate_heatmap_points(self, tracked_objects: List[TrackedObject]) -> List[HeatmapPoint]:
-        """Calculate heatmap points from tracked objects."""
-        heatmap_points = []
-        
-        for obj in tracked_objects:
-            if obj.detection.class_name == "person":
-                # Use center of bounding box as heatmap point
-                center_x, center_y = obj.detection.bbox.center
-                
-                # Calculate intensity based on duration and confidence
-                intensity = obj.duration * obj.detection.confidence
-                
-                heatmap_point = HeatmapPoint(
-                    x=center_x,
-                    y=center_y,
-                    intensity=intensity,
-                    timestamp=obj.last_seen
-                )
-                heatmap_points.append(heatmap_point)
-        
-        return heatmap_points
-    
-    def _calculate_peak_hours(self, frames: List[VideoFrame]) -> List[str]:
-        """Calculate peak activity hours."""
-        if not frames:
-            return []
-        
-        # Group frames by hour
-        hourly_counts = {}
-        for frame in frames:
-            hour = frame.timestamp.hour
-            people_count = len([obj for obj in frame.tracked_objects if obj.detection.class_name == "person"])
-            
-            if hour not in hourly_counts:
-                hourly_counts[hour] = []
-            hourly_counts[hour].append(people_count)
-        
-        # Calculate average people count per hour
-        hourly_averages = {}
-        for hour, counts in hourly_counts.items():
-            hourly_averages[hour] = sum(counts) / len(counts)
-        
-        # Find peak hours (above average)
-        if not hourly_averages:
-            return []
-        
-        overall_average = sum(hourly_averages.values()) / len(hourly_averages)
-        peak_hours = [
-            f"{hour:02d}:00-{hour+1:02d}:00"
-            for hour, avg in hourly_averages.items()
-            if avg > overall_average
-        ]
-        
-        return sorted(peak_hours)
-    
-    def generate_heatmap_data(self, heatmap_points: List[HeatmapPoint], width: int = 100, height: int = 100) -> np.ndarray:
-        """Generate heatmap matrix from heatmap points."""
+    def get_heatmap_tile(
+        self,
+        session_id: str,
+        level: int,
+        tile_x: int,
+        tile_y: int,
+        granularity: str = "minute",
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        normalization: str = "none"
+    ) -> Optional[Dict[str, Any]]:
+        """Get a pyramid tile for a time range as the difference of two prefix sums."""
         try:
-            # Initialize heatmap matrix
-            heatmap = np.zeros((height, width))
-            
-            if not heatmap_points:
-                return heatmap
-            
-            # Normalize coordinates to heatmap dimensions
-            max_x = max(point.x for point in heatmap_points)
-            min_x = min(point.x for point in heatmap_points)
-            max_y = max(point.y for point in heatmap_points)
-            min_y = min(point.y for point in heatmap_points)
+            if not self.heatmap_repo.has_tiles(session_id, granularity):
+                return None
             
-            if max_x == min_x or max_y == min_y:
-                return heatmap
+            bucket_seconds = TIME_GRANULARITIES[granularity]
+            end_bucket = epoch_bucket(end_time, bucket_seconds) if end_time else None
             
-            for point in heatmap_points:
-                # Normalize coordinates
-                norm_x = int((point.x - min_x) / (max_x - min_x) * (width - 1))
-                norm_y = int((point.y - min_y) / (max_y - min_y) * (height - 1))
+            end_tile = self.heatmap_repo.get_cumulative_tile(
+                session_id, granularity, level, tile_x, tile_y, end_bucket
+            )
+            if end_tile is None:
+                tile_size = settings.heatmap_tile_size
+                tile = np.zeros((tile_size, tile_size), dtype=np.float32)
+            else:
+                tile = decode_grid(end_tile.data)
                 
-                # Add intensity to heatmap
-                heatmap[norm_y, norm_x] += point.intensity
+                if start_time:
+                    start_bucket = epoch_bucket(start_time, bucket_seconds)
+                    before_tile = self.heatmap_repo.get_cumulative_tile(
+                        session_id, granularity, level, tile_x, tile_y, start_bucket - 1
+                    )
+                    if before_tile is not None:
+                        tile = np.maximum(tile - decode_grid(before_tile.data), 0)
+            
+            # Tile extent in frame pixels (level 0 cells map 1:1 onto the base grid)
+            session = self.session_repo.get(session_id)
+            cells = settings.heatmap_tile_size * (2 ** level)
+            bounds = None
+            if session and session.frame_width and session.frame_height:
+                cell_width = session.frame_width / settings.heatmap_grid_width
+                cell_height = session.frame_height / settings.heatmap_grid_height
+                bounds = {
+                    "x1": min(tile_x * cells * cell_width, session.frame_width),
+                    "y1": min(tile_y * cells * cell_height, session.frame_height),
+                    "x2": min((tile_x + 1) * cells * cell_width, session.frame_width),
+                    "y2": min((tile_y + 1) * cells * cell_height, session.frame_height)
+                }
             
-            logger.debug("Heatmap data generated", shape=heatmap.shape)
-            return heatmap
+            return {
+                "tile": HeatmapRenderer.normalize(tile, normalization),
+                "total": float(tile.sum()),
+                "bounds": bounds
+            }
             
         except Exception as e:
-            logger.error("Failed to generate heatmap data", error=str(e))
-            return np.zeros((height, width))
+            logger.error("Failed to get heatmap tile", session_id=session_id, level=level, error=str(e))
+            raise
+    
+    def _load_session_grid(
+        self,
+        session_id: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Tuple[Optional[np.ndarray], int]:
+        """Load the pre-aggregated grid for a session or a time range within it."""
+        if start_time or end_time:
+            bucket_grids = self.heatmap_repo.get_bucket_grids(session_id, start_time, end_time)
+            if not bucket_grids:
+                session_grid = self.heatmap_repo.get_session_grid(session_id)
+                if session_grid is None:
+                    return None, 0
+                return np.zeros((session_grid.height, session_grid.width), dtype=np.float32), 0
+            
+            grid = decode_grid(bucket_grids[0].data)
+            for bucket_grid in bucket_grids[1:]:
+                grid += decode_grid(bucket_grid.data)
+            return grid, sum(bucket_grid.points_count for bucket_grid in bucket_grids)
+        
+        session_grid = self.heatmap_repo.get_session_grid(session_id)
+        if session_grid is None:
+            return None, 0
+        return decode_grid(session_grid.data), session_grid.points_count
     
     def get_session_analytics(self, session_id: str) -> Optional[AnalyticsData]:
         """Get analytics for a specific session."""
@@ -189,18 +268,6 @@ class AnalyticsService:
             
             session = session_data["session"]
             
-            # Convert SQLAlchemy HeatmapPoint objects to Pydantic models
-            heatmap_points_pydantic = []
-            for db_point in session_data["heatmap_points"]:
-                heatmap_points_pydantic.append(
-                    HeatmapPoint(
-                        x=db_point.x,
-                        y=db_point.y,
-                        intensity=db_point.intensity,
-                        timestamp=db_point.timestamp
-                    )
-                )
-            
             # Create analytics data from session
             analytics = AnalyticsData(
                 session_id=session_id,
@@ -210,9 +277,11 @@ class AnalyticsService:
                 total_people=session.total_people,
                 peak_people_count=session.peak_people_count,
                 average_stay_time=session.average_stay_time,
-                heatmap_points=heatmap_points_pydantic,
-                peak_hours=[],  # Would need to calculate from stored data
-                metadata={}  # No metadata field in VideoSession model
+                heatmap_points=[],  # Heatmap is served from pre-aggregated grids
+                peak_hours=self.get_peak_hours(session_id),
+                metadata={
+                    "heatmap_points_count": session_data["heatmap_points_count"]
+                }
             )
             
             logger.info("Session analytics retrieved", session_id=session_id)
@@ -222,6 +291,129 @@ class AnalyticsService:
             logger.error("Failed to get session analytics", session_id=session_id, error=str(e))
             raise
     
+    def get_session_timeline(self, session_id: str, bucket_minutes: int = 1) -> List[Dict[str, Any]]:
+        """Get occupancy timeline for a session from the minute rollups."""
+        try:
+            timeline = self.rollup_repo.get_timeline(session_id, bucket_minutes)
+            logger.info("Session timeline retrieved", session_id=session_id, buckets=len(timeline))
+            return timeline
+        except Exception as e:
+            logger.error("Failed to get session timeline", session_id=session_id, error=str(e))
+            raise
+    
+    def get_sessions_analytics(self, session_ids: List[str]) -> Dict[str, AnalyticsData]:
+        """Get analytics of many sessions with a few set-based queries."""
+        try:
+            sessions = self.session_repo.get_sessions_by_ids(session_ids)
+            found_ids = [session.id for session in sessions]
+            points_counts = self.session_repo.get_heatmap_points_counts(found_ids)
+            hourly_totals = self.rollup_repo.get_hourly_totals(found_ids)
+            
+            analytics = {
+                session.id: AnalyticsData(
+                    session_id=session.id,
+                    start_time=session.start_time,
+                    end_time=session.end_time,
+                    total_frames=session.total_frames,
+                    total_people=session.total_people,
+                    peak_people_count=session.peak_people_count,
+                    average_stay_time=session.average_stay_time,
+                    heatmap_points=[],
+                    peak_hours=self._peak_hours_from_hourly(hourly_totals.get(session.id, [])),
+                    metadata={
+                        "heatmap_points_count": points_counts.get(session.id, 0)
+                    }
+                )
+                for session in sessions
+            }
+            
+            logger.info("Sessions analytics retrieved", requested=len(session_ids), found=len(analytics))
+            return analytics
+            
+        except Exception as e:
+            logger.error("Failed to get sessions analytics", count=len(session_ids), error=str(e))
+            raise
+    
+    def get_peak_hours(self, session_id: str) -> List[str]:
+        """Calculate peak activity hours from the stored minute rollups."""
+        hourly = self.rollup_repo.get_timeline(session_id, bucket_minutes=60)
+        return self._peak_hours_from_hourly(hourly)
+    
+    def _peak_hours_from_hourly(self, hourly: List[Dict[str, Any]]) -> List[str]:
+        """Hours of day whose average occupancy is above the session average."""
+        # Same hour-of-day on different days is folded together
+        hourly_totals: Dict[int, List[int]] = {}
+        for bucket in hourly:
+            totals = hourly_totals.setdefault(bucket["start_time"].hour, [0, 0])
+            totals[0] += bucket["people_sum"]
+            totals[1] += bucket["frames"]
+        
+        hourly_averages = {
+            hour: people / frames
+            for hour, (people, frames) in hourly_totals.items()
+            if frames
+        }
+        if not hourly_averages:
+            return []
+        
+        overall_average = sum(hourly_averages.values()) / len(hourly_averages)
+        peak_hours = [
+            f"{hour:02d}:00-{hour+1:02d}:00"
+            for hour, avg in hourly_averages.items()
+            if avg > overall_average
+        ]
+        
+        return sorted(peak_hours)
+    
+    def get_zone_statistics(self, session_id: str, bucket_minutes: int = 1) -> Optional[Dict[str, Any]]:
+        """Get zone occupancy series and line in/out counts for a session."""
+        try:
+            session = self.session_repo.get(session_id)
+            if not session:
+                return None
+            
+            config = json.loads(session.zones_config) if session.zones_config else {}
+            zones: Dict[str, Dict[str, Any]] = {
+                zone["name"]: {"polygon": zone["polygon"], "peak_occupancy": 0, "timeline": []}
+                for zone in config.get("zones", [])
+            }
+            lines: Dict[str, Dict[str, Any]] = {
+                line["name"]: {"start": line["start"], "end": line["end"], "in_count": 0, "out_count": 0, "timeline": []}
+                for line in config.get("lines", [])
+            }
+            
+            for bucket in self.zone_repo.get_zone_timeline(session_id, bucket_minutes):
+                if bucket["kind"] == "zone":
+                    point = {key: bucket[key] for key in ("start_time", "frames", "occupancy_avg", "occupancy_max")}
+                    zone = zones.setdefault(bucket["name"], {"polygon": None, "peak_occupancy": 0, "timeline": []})
+                    zone["peak_occupancy"] = max(zone["peak_occupancy"], bucket["occupancy_max"])
+                    zone["timeline"].append(point)
+                else:
+                    point = {key: bucket[key] for key in ("start_time", "in_count", "out_count")}
+                    line = lines.setdefault(bucket["name"], {"start": None, "end": None, "in_count": 0, "out_count": 0, "timeline": []})
+                    line["in_count"] += bucket["in_count"]
+                    line["out_count"] += bucket["out_count"]
+                    line["timeline"].append(point)
+            
+            logger.info("Zone statistics retrieved", session_id=session_id, zones=len(zones), lines=len(lines))
+            return {"zones": zones, "lines": lines}
+            
+        except Exception as e:
+            logger.error("Failed to get zone statistics", session_id=session_id, error=str(e))
+            raise
+    
+    def build_llm_data(self, analytics: AnalyticsData) -> Dict[str, Any]:
+        """Prepare session analytics for the LLM prompt."""
+        return {
+            "total_people": analytics.total_people,
+            "peak_people_count": analytics.peak_people_count,
+            "average_stay_time": analytics.average_stay_time,
+            "total_frames": analytics.total_frames,
+            "session_duration": (analytics.end_time - analytics.start_time).total_seconds() if analytics.end_time else 0,
+            "peak_hours": analytics.peak_hours,
+            "heatmap_points_count": analytics.metadata.get("heatmap_points_count", len(analytics.heatmap_points))
+        }
+    
     def get_detection_statistics(self, session_id: str) -> Dict[str, Any]:
         """Get detection statistics for a session."""
         try:
@@ -0,0 +1,109 @@
+"""Checkpoints that let a video analysis continue after its process died.
+
+The pipeline sends its rows to the database as it goes but commits them only together with
+a checkpoint: the frame index reached and the state of the tracker and the accumulators. After
+a crash the database holds exactly the rows up to the last checkpoint, so resuming from it -
+seeking the source to the frame index and restoring the state - adds no duplicate rows.
+"""
+
+from typing import Any, Dict, Optional
+import json
+import time
+import structlog
+from app.core.config import settings
+from app.database.models import PipelineCheckpoint, VideoSession
+from app.models.schemas import VideoAnalysisRequest
+from app.repositories.bulk_writer import BulkWriter
+from app.repositories.checkpoint_repository import CheckpointRepository
+
+logger = structlog.get_logger()
+
+# Bumped whenever the state layout changes; older checkpoints are not resumed
+CHECKPOINT_VERSION = 4
+
+
+class PipelineCheckpointer:
+    """Commits pipeline output at a fixed interval, atomically with the state needed to resume from there."""
+
+    def __init__(
+        self,
+        session_id: str,
+        checkpoint_repo: CheckpointRepository,
+        bulk_writer: BulkWriter,
+        components: Dict[str, Any],
+        request: Dict[str, Any],
+        interval: float = None
+    ):
+        self.session_id = session_id
+        self.checkpoint_repo = checkpoint_repo
+        self.bulk_writer = bulk_writer
+        self.components = components  # name -> object with get_state() and load_state()
+        self.request = request  # analyze parameters the session itself does not store
+        self.interval = settings.pipeline_checkpoint_interval if interval is None else interval
+        self.rows_before = 0  # rows committed by earlier runs of the session
+        self.last_saved = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether checkpoints are taken at all."""
+        return self.interval > 0
+
+    def due(self) -> bool:
+        """Whether the interval since the last checkpoint has passed."""
+        return self.enabled and time.monotonic() - self.last_saved >= self.interval
+
+    def save(self, frame_index: int) -> None:
+        """Write buffered rows and the checkpoint in one transaction."""
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "request": self.request,
+            **{name: component.get_state() for name, component in self.components.items()}
+        }
+        self.bulk_writer.flush(commit=False)
+        self.checkpoint_repo.save_checkpoint(
+            self.session_id,
+            frame_index,
+            state,
+            rows_written=self.rows_before + self.bulk_writer.total_written
+        )
+        self.last_saved = time.monotonic()
+        logger.info("Pipeline checkpoint saved", session_id=self.session_id, frame_index=frame_index)
+
+    def restore(self, checkpoint: PipelineCheckpoint) -> int:
+        """Load the component state of a checkpoint; returns the frame index to continue from."""
+        state = load_checkpoint_state(checkpoint)
+        for name, component in self.components.items():
+            component.load_state(state[name])
+
+        self.rows_before = checkpoint.rows_written or 0
+        self.last_saved = time.monotonic()
+        logger.info(
+            "Pipeline resumed from checkpoint",
+            session_id=self.session_id,
+            frame_index=checkpoint.frame_index,
+            rows_written=self.rows_before
+        )
+        return checkpoint.frame_index
+
+
+def load_checkpoint_state(checkpoint: PipelineCheckpoint) -> Dict[str, Any]:
+    """Decoded checkpoint state; ValueError for a layout this version cannot resume."""
+    state = json.loads(checkpoint.state)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {state.get('version')}")
+    return state
+
+
+def resume_request(session: VideoSession, checkpoint: PipelineCheckpoint) -> Optional[VideoAnalysisRequest]:
+    """The analyze request a checkpointed session was started with; None if the checkpoint cannot be resumed."""
+    try:
+        state = load_checkpoint_state(checkpoint)
+    except ValueError as e:
+        logger.warning("Checkpoint cannot be resumed", session_id=session.id, error=str(e))
+        return None
+
+    return VideoAnalysisRequest(
+        source_type=session.source_type,
+        source_path=session.source_path,
+        **state["request"]
+    )
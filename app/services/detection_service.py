@@ -1,11 +1,10 @@
-from ultralytics import YOLO
 from abc import ABC, abstractmethod
 from typing import List, Optional, Dict, Any
-import cv2
 import numpy as np
 import structlog
 from app.core.config import settings
 from app.models.schemas import Detection, BoundingBox, DetectionType
+from app.services.model_registry import model_registry
 
 logger = structlog.get_logger()
 
@@ -13,6 +12,9 @@ logger = structlog.get_logger()
 class DetectionStrategy(ABC):
     """Abstract base class for detection strategies."""
     
+    # Stage times of the last detect() call in milliseconds, when the model reports them
+    last_speed: Dict[str, float] = {}
+    
     @abstractmethod
     def detect(self, frame: np.ndarray) -> List[Detection]:
         """Detect objects in frame."""
@@ -26,12 +28,6 @@ class YOLODetectionStrategy(DetectionStrategy):
         self.model_name = model_name or settings.yolo_model
         self.confidence_threshold = confidence_threshold or settings.confidence_threshold
         
-        try:
-            self.model = YOLO(self.model_name)
-        except Exception as e:
-            logger.warning("Failed to load YOLO model, using mock detection", error=str(e))
-            self.model = None
-        
         # COCO class names (YOLO uses COCO dataset)
         self.class_names = [
             'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
@@ -48,14 +44,23 @@ class YOLODetectionStrategy(DetectionStrategy):
         
         logger.info("YOLO detection strategy initialized", model=self.model_name, confidence=self.confidence_threshold)
     
+    @property
+    def model(self):
+        """Shared model from the registry, loaded on the first frame rather than in the request handler."""
+        return model_registry.get(self.model_name)
+    
     def detect(self, frame: np.ndarray) -> List[Detection]:
         """Detect objects using YOLO."""
+        self.last_speed = {}
         try:
             if self.model is None:
                 # Mock detection for testing
                 return self._mock_detection(frame)
             
             results = self.model(frame, conf=self.confidence_threshold)
+            if results:
+                # preprocess, inference and postprocess milliseconds
+                self.last_speed = dict(results[0].speed)
             detections = []
             
             for result in results:
@@ -120,6 +125,11 @@ class PersonDetectionStrategy(DetectionStrategy):
     def __init__(self, base_strategy: DetectionStrategy):
         self.base_strategy = base_strategy
     
+    @property
+    def last_speed(self) -> Dict[str, float]:
+        """Stage times of the wrapped strategy."""
+        return self.base_strategy.last_speed
+    
     def detect(self, frame: np.ndarray) -> List[Detection]:
         """Detect only people."""
         all_detections = self.base_strategy.detect(frame)
@@ -165,6 +175,11 @@ class DetectionService:
             logger.error("Object detection failed", error=str(e))
             raise
     
+    @property
+    def last_speed(self) -> Dict[str, float]:
+        """Stage times in milliseconds of the last detection, empty if the model does not report them."""
+        return self.strategy.last_speed
+    
     def detect_people(self, frame: np.ndarray) -> List[Detection]:
         """Detect people in frame (backward compatibility)."""
         detections = self.detect_objects(frame)
@@ -0,0 +1,410 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import base64
+import io
+import zlib
+import numpy as np
+import structlog
+from app.core.config import settings
+from app.core.utils import epoch_bucket, bucket_start_time
+
+logger = structlog.get_logger()
+
+# Time granularities supported by the tile pyramid (bucket size in seconds)
+TIME_GRANULARITIES = {
+    "minute": 60,
+    "hour": 3600
+}
+
+
+class HeatmapRenderer:
+    """Vectorized heatmap rasterization in real frame coordinates."""
+
+    NORMALIZATIONS = ("none", "max", "log", "percentile")
+
+    def __init__(self, frame_width: Optional[float] = None, frame_height: Optional[float] = None):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+
+    def render(
+        self,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        intensities: np.ndarray,
+        width: int = 100,
+        height: int = 100,
+        blur_sigma: float = 0.0,
+        normalization: str = "none",
+        percentile: float = 99.0
+    ) -> np.ndarray:
+        """Rasterize points, then optionally blur and normalize the grid."""
+        heatmap = self.rasterize(xs, ys, intensities, width, height)
+        if blur_sigma > 0:
+            heatmap = self.gaussian_blur(heatmap, blur_sigma)
+        return self.normalize(heatmap, normalization, percentile)
+
+    def rasterize(
+        self,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        intensities: np.ndarray,
+        width: int = 100,
+        height: int = 100
+    ) -> np.ndarray:
+        """Bin points into a height x width grid using frame coordinates."""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        intensities = np.asarray(intensities, dtype=np.float64)
+
+        # Drop NaN/inf rows before they reach the frame size or poison the whole grid
+        valid = np.isfinite(xs) & np.isfinite(ys) & np.isfinite(intensities)
+        if not valid.all():
+            xs, ys, intensities = xs[valid], ys[valid], intensities[valid]
+
+        if xs.size == 0:
+            return np.zeros((height, width), dtype=np.float32)
+
+        frame_width, frame_height = self._resolve_frame_size(xs, ys)
+
+        ix = np.clip((xs * (width / frame_width)).astype(np.int64), 0, width - 1)
+        iy = np.clip((ys * (height / frame_height)).astype(np.int64), 0, height - 1)
+
+        # bincount over flat indices is the fastest scatter-add numpy offers
+        flat = np.bincount(iy * width + ix, weights=intensities, minlength=width * height)
+        return flat.reshape(height, width).astype(np.float32)
+
+    @staticmethod
+    def gaussian_blur(heatmap: np.ndarray, sigma: float) -> np.ndarray:
+        """Apply a separable Gaussian blur (rows, then columns)."""
+        radius = max(1, int(np.ceil(3 * sigma)))
+        offsets = np.arange(-radius, radius + 1)
+        kernel = np.exp(-(offsets ** 2) / (2 * sigma ** 2))
+        kernel /= kernel.sum()
+
+        blurred = heatmap.astype(np.float32)
+        for axis in (1, 0):
+            pad = [(0, 0), (0, 0)]
+            pad[axis] = (radius, radius)
+            padded = np.pad(blurred, pad, mode="constant")
+            size = blurred.shape[axis]
+            result = np.zeros_like(blurred)
+            for offset, weight in enumerate(kernel):
+                if axis == 1:
+                    result += weight * padded[:, offset:offset + size]
+                else:
+                    result += weight * padded[offset:offset + size, :]
+            blurred = result
+
+        return blurred
+
+    @staticmethod
+    def normalize(heatmap: np.ndarray, normalization: str = "none", percentile: float = 99.0) -> np.ndarray:
+        """Normalize grid values to [0, 1] (or leave raw for "none")."""
+        if normalization == "none":
+            return heatmap
+        if normalization not in HeatmapRenderer.NORMALIZATIONS:
+            raise ValueError(f"Unsupported heatmap normalization: {normalization}")
+
+        if normalization == "log":
+            heatmap = np.log1p(np.maximum(heatmap, 0))
+            peak = float(heatmap.max()) if heatmap.size else 0.0
+        elif normalization == "percentile":
+            nonzero = heatmap[heatmap > 0]
+            peak = float(np.percentile(nonzero, percentile)) if nonzero.size else 0.0
+        else:
+            peak = float(heatmap.max()) if heatmap.size else 0.0
+
+        if peak <= 0:
+            return np.zeros_like(heatmap)
+
+        return np.clip(heatmap / peak, 0, 1).astype(np.float32)
+
+    def _resolve_frame_size(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[float, float]:
+        """Get frame size, falling back to the extent of the finite data for legacy sessions."""
+        frame_width = self.frame_width
+        frame_height = self.frame_height
+
+        if not frame_width or not frame_height:
+            # Sessions recorded before frame size was stored: anchor at the origin,
+            # not at min(x)/min(y), so at least the offset inside the frame is kept
+            frame_width = max(float(xs.max()) + 1.0, 1.0) if xs.size else 1.0
+            frame_height = max(float(ys.max()) + 1.0, 1.0) if ys.size else 1.0
+            logger.debug("Frame size unknown, using data extent", width=frame_width, height=frame_height)
+
+        return float(frame_width), float(frame_height)
+
+
+def encode_grid(grid: np.ndarray) -> bytes:
+    """Serialize a grid as zlib-compressed float32 .npy bytes."""
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(grid, dtype=np.float32), allow_pickle=False)
+    return zlib.compress(buffer.getvalue(), 6)
+
+
+def decode_grid(data: bytes) -> np.ndarray:
+    """Deserialize a grid produced by encode_grid."""
+    return np.load(io.BytesIO(zlib.decompress(data)), allow_pickle=False)
+
+
+def grid_to_state(grid: np.ndarray) -> str:
+    """Encode a grid for a JSON checkpoint."""
+    return base64.b64encode(encode_grid(grid)).decode("ascii")
+
+
+def grid_from_state(data: str) -> np.ndarray:
+    """Decode a grid produced by grid_to_state."""
+    return decode_grid(base64.b64decode(data))
+
+
+def resample_grid(grid: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Resample a grid to height x width, preserving the total mass."""
+    source_height, source_width = grid.shape
+    if (source_height, source_width) == (height, width):
+        return grid.astype(np.float32)
+
+    rows = _overlap_matrix(source_height, height)
+    cols = _overlap_matrix(source_width, width)
+    return (rows @ grid.astype(np.float64) @ cols.T).astype(np.float32)
+
+
+def _overlap_matrix(source_size: int, target_size: int) -> np.ndarray:
+    """Fraction of each source cell that falls into each target cell (target x source)."""
+    source_edges = np.arange(source_size + 1) / source_size
+    target_edges = np.arange(target_size + 1) / target_size
+
+    low = np.maximum(target_edges[:-1, None], source_edges[None, :-1])
+    high = np.minimum(target_edges[1:, None], source_edges[None, 1:])
+    return np.clip(high - low, 0, None) * source_size
+
+
+class HeatmapAccumulator:
+    """Fixed-resolution heatmap grids accumulated while a session is processed."""
+
+    def __init__(
+        self,
+        grid_width: int = None,
+        grid_height: int = None,
+        bucket_seconds: int = None
+    ):
+        self.grid_width = grid_width or settings.heatmap_grid_width
+        self.grid_height = grid_height or settings.heatmap_grid_height
+        self.bucket_seconds = settings.heatmap_bucket_seconds if bucket_seconds is None else bucket_seconds
+        self.renderer = HeatmapRenderer()
+        self.total = np.zeros((self.grid_height, self.grid_width), dtype=np.float32)
+        self.buckets: Dict[datetime, np.ndarray] = {}
+        self.bucket_counts: Dict[datetime, int] = {}
+        self.open_bucket: Optional[datetime] = None
+        self.points_count = 0
+        self.pyramid = (
+            HeatmapPyramidBuilder(self.grid_width, self.grid_height)
+            if settings.heatmap_tile_granularities else None
+        )
+
+    def set_frame_size(self, frame_width: int, frame_height: int) -> None:
+        """Set the frame size used to map pixel coordinates to grid cells."""
+        self.renderer = HeatmapRenderer(frame_width, frame_height)
+
+    def add(self, xs: np.ndarray, ys: np.ndarray, intensities: np.ndarray, timestamp: datetime) -> None:
+        """Add one frame's points to the session grid and its time bucket."""
+        if len(xs) == 0:
+            return
+
+        grid = self.renderer.rasterize(xs, ys, intensities, self.grid_width, self.grid_height)
+        self.total += grid
+        self.points_count += len(xs)
+
+        if self.bucket_seconds:
+            bucket_start = self.bucket_start(timestamp)
+            self.open_bucket = bucket_start
+            if bucket_start in self.buckets:
+                self.buckets[bucket_start] += grid
+            else:
+                self.buckets[bucket_start] = grid
+            self.bucket_counts[bucket_start] = self.bucket_counts.get(bucket_start, 0) + len(xs)
+
+        if self.pyramid:
+            self.pyramid.add(grid, timestamp)
+
+    def bucket_start(self, timestamp: datetime) -> datetime:
+        """Get the start of the time bucket a timestamp falls into."""
+        return bucket_start_time(epoch_bucket(timestamp, self.bucket_seconds), self.bucket_seconds)
+
+    def pop_grids(self, final: bool = False) -> List[Dict[str, Any]]:
+        """HeatmapGrid rows of the time buckets closed since the last call; final adds the open bucket and the session grid."""
+        grids = []
+        for bucket_start in sorted(self.buckets):
+            if bucket_start == self.open_bucket and not final:
+                continue
+            grids.append({
+                "bucket_start": bucket_start,
+                "bucket_seconds": self.bucket_seconds,
+                "width": self.grid_width,
+                "height": self.grid_height,
+                "points_count": self.bucket_counts.pop(bucket_start),
+                "data": encode_grid(self.buckets.pop(bucket_start))
+            })
+
+        if final and self.points_count:
+            grids.insert(0, {
+                "bucket_start": None,
+                "bucket_seconds": 0,
+                "width": self.grid_width,
+                "height": self.grid_height,
+                "points_count": self.points_count,
+                "data": encode_grid(self.total)
+            })
+        return grids
+
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable state for a checkpoint; closed buckets must have been popped."""
+        return {
+            "total": grid_to_state(self.total),
+            "points_count": self.points_count,
+            "buckets": [
+                [bucket_start.isoformat(), self.bucket_counts[bucket_start], grid_to_state(grid)]
+                for bucket_start, grid in self.buckets.items()
+            ],
+            "open_bucket": self.open_bucket.isoformat() if self.open_bucket else None,
+            "pyramid": self.pyramid.get_state() if self.pyramid else None
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state saved by get_state."""
+        self.total = grid_from_state(state["total"])
+        self.points_count = state["points_count"]
+        self.buckets = {}
+        self.bucket_counts = {}
+        for bucket_start, points_count, grid in state["buckets"]:
+            bucket_start = datetime.fromisoformat(bucket_start)
+            self.buckets[bucket_start] = grid_from_state(grid)
+            self.bucket_counts[bucket_start] = points_count
+        self.open_bucket = datetime.fromisoformat(state["open_bucket"]) if state["open_bucket"] else None
+        if self.pyramid and state["pyramid"]:
+            self.pyramid.load_state(state["pyramid"])
+
+
+def downsample_grid(grid: np.ndarray) -> np.ndarray:
+    """Halve grid resolution by summing 2x2 blocks (odd edges are zero-padded)."""
+    height, width = grid.shape
+    padded = np.pad(grid, ((0, height % 2), (0, width % 2)), mode="constant")
+    return padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).sum(axis=(1, 3))
+
+
+def pyramid_levels(grid_width: int, grid_height: int, tile_size: int) -> int:
+    """Number of 2x levels until the whole grid fits into a single tile."""
+    levels = 1
+    while grid_width > tile_size or grid_height > tile_size:
+        grid_width = (grid_width + 1) // 2
+        grid_height = (grid_height + 1) // 2
+        levels += 1
+    return levels
+
+
+class HeatmapPyramidBuilder:
+    """Incrementally builds cumulative heatmap tile pyramids per time granularity.
+
+    Each closed time bucket emits, for every pyramid level, the tiles whose
+    content changed in that bucket. A tile row holds the cumulative sum up to
+    its bucket, so any time range is the difference of two prefix sums.
+    """
+
+    def __init__(
+        self,
+        grid_width: int,
+        grid_height: int,
+        tile_size: int = None,
+        granularities: Optional[List[str]] = None
+    ):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.tile_size = tile_size or settings.heatmap_tile_size
+        self.levels = pyramid_levels(grid_width, grid_height, self.tile_size)
+        self.granularities = granularities or settings.heatmap_tile_granularities
+
+        for granularity in self.granularities:
+            if granularity not in TIME_GRANULARITIES:
+                raise ValueError(f"Unsupported time granularity: {granularity}")
+
+        shape = (grid_height, grid_width)
+        self.cumulative = {g: np.zeros(shape, dtype=np.float32) for g in self.granularities}
+        self.pending = {g: np.zeros(shape, dtype=np.float32) for g in self.granularities}
+        self.open_bucket: Dict[str, Optional[int]] = {g: None for g in self.granularities}
+        self.closed_tiles: List[Dict] = []
+
+    def add(self, grid: np.ndarray, timestamp: datetime) -> None:
+        """Add a base-resolution grid observed at the given time."""
+        for granularity in self.granularities:
+            bucket_index = epoch_bucket(timestamp, TIME_GRANULARITIES[granularity])
+            open_bucket = self.open_bucket[granularity]
+
+            if open_bucket is not None and bucket_index > open_bucket:
+                self._close_bucket(granularity)
+            elif open_bucket is not None:
+                # Never reopen an older bucket: prefix sums must stay monotonic
+                bucket_index = open_bucket
+
+            self.open_bucket[granularity] = bucket_index
+            self.pending[granularity] += grid
+
+    def finalize(self) -> None:
+        """Close all open buckets."""
+        for granularity in self.granularities:
+            if self.open_bucket[granularity] is not None:
+                self._close_bucket(granularity)
+
+    def pop_tiles(self) -> List[Dict]:
+        """Return tiles emitted since the last call."""
+        tiles, self.closed_tiles = self.closed_tiles, []
+        return tiles
+
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable state for a checkpoint; emitted tiles must have been popped."""
+        return {
+            granularity: {
+                "cumulative": grid_to_state(self.cumulative[granularity]),
+                "pending": grid_to_state(self.pending[granularity]),
+                "open_bucket": self.open_bucket[granularity]
+            }
+            for granularity in self.granularities
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state saved by get_state; granularities added since then start empty."""
+        for granularity, values in state.items():
+            if granularity not in self.granularities:
+                continue
+            self.cumulative[granularity] = grid_from_state(values["cumulative"])
+            self.pending[granularity] = grid_from_state(values["pending"])
+            self.open_bucket[granularity] = values["open_bucket"]
+
+    def _close_bucket(self, granularity: str) -> None:
+        """Fold the open bucket into the prefix sum and emit its changed tiles."""
+        delta = self.pending[granularity]
+        self.cumulative[granularity] += delta
+        cumulative = self.cumulative[granularity]
+        bucket_index = self.open_bucket[granularity]
+
+        for level in range(self.levels):
+            if level:
+                delta = downsample_grid(delta)
+                cumulative = downsample_grid(cumulative)
+
+            level_height, level_width = cumulative.shape
+            for tile_y in range(0, (level_height + self.tile_size - 1) // self.tile_size):
+                for tile_x in range(0, (level_width + self.tile_size - 1) // self.tile_size):
+                    rows = slice(tile_y * self.tile_size, (tile_y + 1) * self.tile_size)
+                    cols = slice(tile_x * self.tile_size, (tile_x + 1) * self.tile_size)
+                    if not delta[rows, cols].any():
+                        continue
+
+                    self.closed_tiles.append({
+                        "granularity": granularity,
+                        "bucket_index": bucket_index,
+                        "level": level,
+                        "tile_x": tile_x,
+                        "tile_y": tile_y,
+                        "data": encode_grid(cumulative[rows, cols])
+                    })
+
+        self.pending[granularity] = np.zeros_like(self.pending[granularity])
+        self.open_bucket[granularity] = None
@@ -0,0 +1,325 @@
+"""Live detection and occupancy state of running analyses for WebSocket viewers.
+
+The pipeline publishes a small full-state update of its session at most once per
+`live_update_interval`; viewers never touch the database. Each viewer has a latest-wins slot,
+so a slow viewer skips intermediate updates instead of queueing them, and it receives deltas
+against the last update it was actually sent.
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+import asyncio
+import json
+import time
+import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+import structlog
+from app.core.config import settings
+from app.core.metrics import live_updates_dropped_total
+from app.core.redis_cache import LRUCache, RedisCircuitBreaker
+from app.models.schemas import TrackedObject
+
+logger = structlog.get_logger()
+
+# Update types: full state of a frame, and the last update of a finished analysis
+FRAME = "frame"
+END = "end"
+
+
+def frame_update(frame_number: int, tracked_objects: List[TrackedObject], occupancy: Dict[str, int]) -> Dict[str, Any]:
+    """Full live state of one frame: people count, person track boxes and zone occupancy."""
+    tracks = {}
+    for tracked_obj in tracked_objects:
+        if tracked_obj.detection.class_name != "person":
+            continue
+        bbox = tracked_obj.detection.bbox
+        tracks[str(tracked_obj.track_id)] = [round(bbox.x1), round(bbox.y1), round(bbox.x2), round(bbox.y2)]
+    return {
+        "t": FRAME,
+        "frame": frame_number,
+        "ts": round(time.time(), 3),
+        "count": len(tracks),
+        "tracks": tracks,
+        "zones": dict(occupancy)
+    }
+
+
+def end_update(status: str) -> Dict[str, Any]:
+    """Last update of a session: the analysis stopped with this status."""
+    return {"t": END, "status": status, "ts": round(time.time(), 3)}
+
+
+def encode_delta(previous: Optional[Dict[str, Any]], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Message for a viewer that was last sent `previous`: the changed fields only, or a snapshot."""
+    if update["t"] != FRAME:
+        return update
+    if previous is None or previous["t"] != FRAME:
+        return {**update, "t": "snapshot"}
+
+    message = {"t": "delta", "frame": update["frame"], "ts": update["ts"]}
+    if update["count"] != previous["count"]:
+        message["count"] = update["count"]
+
+    tracks, previous_tracks = update["tracks"], previous["tracks"]
+    changed = {track_id: box for track_id, box in tracks.items() if previous_tracks.get(track_id) != box}
+    if changed:
+        message["tracks"] = changed
+    gone = [track_id for track_id in previous_tracks if track_id not in tracks]
+    if gone:
+        message["gone"] = gone
+
+    zones = {name: count for name, count in update["zones"].items() if previous["zones"].get(name) != count}
+    if zones:
+        message["zones"] = zones
+    return message
+
+
+class LiveSubscription:
+    """Latest-wins slot of one viewer."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.dropped = 0
+        self._latest: Optional[Dict[str, Any]] = None
+        self._ready = asyncio.Event()
+
+    def put(self, update: Dict[str, Any]) -> None:
+        """Replace the pending update; the one it replaces is never sent."""
+        if self._latest is not None:
+            self.dropped += 1
+            live_updates_dropped_total.inc()
+        self._latest = update
+        self._ready.set()
+
+    def put_initial(self, update: Optional[Dict[str, Any]]) -> None:
+        """Seed a new viewer with the last known state unless a newer update already arrived."""
+        if update is not None and self._latest is None:
+            self.put(update)
+
+    async def get(self) -> Dict[str, Any]:
+        """Wait for the next update to send."""
+        await self._ready.wait()
+        self._ready.clear()
+        update, self._latest = self._latest, None
+        return update
+
+
+class LiveUpdateBroker(ABC):
+    """Fans the live updates of each session out to the viewers connected to this process."""
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[LiveSubscription]] = {}
+
+    @abstractmethod
+    async def publish(self, session_id: str, update: Dict[str, Any]) -> None:
+        """Send an update to every viewer of the session; never raises into the pipeline."""
+
+    @abstractmethod
+    async def last(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Latest update of a session, for viewers that connect mid-analysis or just after it."""
+
+    async def _first_subscriber(self, session_id: str) -> None:
+        """Hook: the process got its first viewer of a session."""
+        pass
+
+    async def _last_unsubscribed(self, session_id: str) -> None:
+        """Hook: the process lost its last viewer of a session."""
+        pass
+
+    @asynccontextmanager
+    async def subscribe(self, session_id: str) -> AsyncIterator[LiveSubscription]:
+        """Register a viewer for the duration of the context."""
+        subscription = LiveSubscription(session_id)
+        subscriptions = self._subscriptions.setdefault(session_id, set())
+        subscriptions.add(subscription)
+        try:
+            if len(subscriptions) == 1:
+                await self._first_subscriber(session_id)
+            subscription.put_initial(await self.last(session_id))
+            yield subscription
+        finally:
+            subscriptions.discard(subscription)
+            if not subscriptions and self._subscriptions.get(session_id) is subscriptions:
+                del self._subscriptions[session_id]
+                await self._last_unsubscribed(session_id)
+
+    def viewers(self, session_id: str) -> int:
+        """Viewers of a session connected to this process."""
+        return len(self._subscriptions.get(session_id, ()))
+
+    def _dispatch(self, session_id: str, update: Dict[str, Any]) -> None:
+        """Hand an update to the local viewers of its session."""
+        for subscription in self._subscriptions.get(session_id, ()):
+            subscription.put(update)
+
+    async def connect(self) -> None:
+        """Prepare connections on startup."""
+        pass
+
+    async def close(self) -> None:
+        """Release connections."""
+        pass
+
+
+class LocalLiveBroker(LiveUpdateBroker):
+    """In-process broker for analyses that run in the API process (inline and local modes)."""
+
+    def __init__(self, last_update_ttl: int = None):
+        super().__init__()
+        self._last = LRUCache(max_size=1024, default_ttl=last_update_ttl or settings.live_last_update_ttl)
+
+    async def publish(self, session_id: str, update: Dict[str, Any]) -> None:
+        """Store and dispatch the update."""
+        self._last.set(session_id, update)
+        self._dispatch(session_id, update)
+
+    async def last(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Latest update kept in memory."""
+        _, update = self._last.get(session_id)
+        return update
+
+
+class RedisLiveBroker(LiveUpdateBroker):
+    """Redis pub/sub broker: workers publish, each API process holds one subscription per watched session."""
+
+    def __init__(self, client: redis.Redis = None, channel_prefix: str = None, last_update_ttl: int = None):
+        super().__init__()
+        # A client of its own: the pub/sub connection blocks on reads. Live updates are best-effort,
+        # so a failed publish is skipped rather than retried while the pipeline waits
+        self.client = client or redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            decode_responses=True,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            retry=Retry(NoBackoff(), 0)
+        )
+        self.channel_prefix = channel_prefix or settings.live_channel_prefix
+        self.last_update_ttl = last_update_ttl or settings.live_last_update_ttl
+        # While Redis is down the pipeline skips publishing instead of waiting on every frame
+        self.breaker = RedisCircuitBreaker()
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        # The pub/sub connection is opened by the first subscribe; concurrent ones would open several
+        self._subscribe_lock = asyncio.Lock()
+
+    def _channel(self, session_id: str) -> str:
+        return f"{self.channel_prefix}{session_id}"
+
+    def _last_key(self, session_id: str) -> str:
+        return f"{self.channel_prefix}{session_id}:last"
+
+    async def publish(self, session_id: str, update: Dict[str, Any]) -> None:
+        """Publish the update and keep it as the session's latest."""
+        if not self.breaker.allow_request():
+            return
+        payload = json.dumps(update, separators=(",", ":"))
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.publish(self._channel(session_id), payload)
+                pipe.set(self._last_key(session_id), payload, ex=self.last_update_ttl)
+                await pipe.execute()
+            self.breaker.record_success()
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.warning("Failed to publish live update", session_id=session_id, error=str(e))
+
+    async def last(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Latest update kept in Redis."""
+        try:
+            payload = await self.client.get(self._last_key(session_id))
+        except Exception as e:
+            logger.warning("Failed to get last live update", session_id=session_id, error=str(e))
+            return None
+        return json.loads(payload) if payload else None
+
+    async def _first_subscriber(self, session_id: str) -> None:
+        """Subscribe to the session channel and start the reader on first use."""
+        async with self._subscribe_lock:
+            if self._pubsub is None:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(self._channel(session_id))
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read(), name="live-updates-reader")
+
+    async def _last_unsubscribed(self, session_id: str) -> None:
+        """Drop the session channel."""
+        try:
+            async with self._subscribe_lock:
+                await self._pubsub.unsubscribe(self._channel(session_id))
+        except Exception as e:
+            logger.warning("Failed to unsubscribe live updates", session_id=session_id, error=str(e))
+
+    async def _read(self) -> None:
+        """Dispatch published updates to the local viewers; one reader per process."""
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The pub/sub connection resubscribes its channels when it reconnects
+                logger.warning("Live updates subscription failed", error=str(e))
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            session_id = message["channel"][len(self.channel_prefix):]
+            self._dispatch(session_id, json.loads(message["data"]))
+
+    async def connect(self) -> None:
+        """Start the recovery probe of the circuit breaker."""
+        self.breaker.start_probe(self.client.ping)
+
+    async def close(self) -> None:
+        """Stop the reader and close the connections."""
+        await self.breaker.stop_probe()
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self.client.aclose()
+
+
+class LiveBrokerFactory:
+    """Factory for the broker matching where analyses run."""
+
+    @staticmethod
+    def create(mode: str = None) -> LiveUpdateBroker:
+        """Redis pub/sub when workers run analyses in other processes, in-process otherwise."""
+        mode = mode or settings.analysis_mode
+        if mode == "redis":
+            return RedisLiveBroker()
+        elif mode in ("inline", "local"):
+            return LocalLiveBroker()
+        else:
+            raise ValueError(f"Unsupported analysis mode: {mode}")
+
+
+class LivePublisher:
+    """Publishes the live state of one running analysis at most once per interval."""
+
+    def __init__(self, session_id: str, broker: LiveUpdateBroker = None, interval: float = None):
+        self.session_id = session_id
+        self.broker = broker or live_broker
+        self.interval = settings.live_update_interval if interval is None else interval
+        self._next_publish = 0.0
+
+    async def frame(self, frame_number: int, tracked_objects: List[TrackedObject], occupancy: Dict[str, int]) -> None:
+        """Publish the state of a processed frame unless the previous one is too recent."""
+        now = time.monotonic()
+        if now < self._next_publish:
+            return
+        self._next_publish = now + self.interval
+        await self.broker.publish(self.session_id, frame_update(frame_number, tracked_objects, occupancy))
+
+    async def end(self, status: str) -> None:
+        """Tell the viewers the analysis stopped."""
+        await self.broker.publish(self.session_id, end_update(status))
+
+
+# Global live update broker instance
+live_broker = LiveBrokerFactory.create()
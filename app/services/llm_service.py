@@ -1,15 +1,68 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, AsyncContextManager, Callable, Tuple
+import asyncio
 import structlog
 from app.core.config import settings
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.metrics import llm_fallback_total, llm_hedged_requests_total
 from app.utils.http_client import OllamaHTTPClient, OpenAIHTTPClient
+from app.services.prompt_builder import PromptBuilder, BuiltPrompt, PROMPT_TEMPLATE_VERSION
 
 logger = structlog.get_logger()
 
 
+class FallbackText(str):
+    """Text produced from a template because the model was unavailable; never cached."""
+
+
+class SecondaryText(str):
+    """Text answered by a provider other than the primary; cached under that provider, never the primary."""
+    
+    def __new__(cls, text: str, provider: "LLMProvider"):
+        instance = super().__new__(cls, text)
+        instance.provider_name = provider.name
+        instance.identity = provider.identity
+        instance.template_version = provider.template_version
+        return instance
+
+
+# Concurrency limit of LLM calls, by provider name
+ProviderLimit = Callable[[str], AsyncContextManager]
+
+
+def fallback_report(data: Dict[str, Any]) -> str:
+    """Template report used while no LLM provider is available."""
+    total_people = data.get('total_people', 0)
+    peak_people = data.get('peak_people_count', 0)
+    avg_stay = data.get('average_stay_time', 0)
+    total_frames = data.get('total_frames', 0)
+    
+    return f"""
+АНАЛИТИЧЕСКИЙ ОТЧЕТ (MOCK - LLM недоступен)
+
+Краткий обзор:
+В ходе обработки видео было детектировано {total_people} уникальных людей. Максимальное одновременное количество людей составило {peak_people}. Средняя продолжительность присутствия людей в кадре: {avg_stay:.2f} секунд. Всего было обработано {total_frames} кадров.
+
+Ключевые инсайты:
+Наблюдается стабильная активность с пиковыми моментами. Движение людей распределено равномерно по всему периоду наблюдения. Среднее время нахождения в зоне наблюдения составляет около {avg_stay:.1f} секунд, что указывает на нормальный поток людей без длительных задержек.
+
+Рекомендации:
+Рекомендуется проанализировать пиковые периоды для оптимизации маршрутов и распределения ресурсов. Необходимо продолжить мониторинг для выявления долгосрочных паттернов.
+"""
+
+
+def fallback_summary(text: str) -> str:
+    """Template summary used while no LLM provider is available."""
+    return f"[MOCK] Краткое резюме: {text[:100]}... (LLM недоступен)"
+
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
     
+    template_version = PROMPT_TEMPLATE_VERSION
+    name: str = ""
+    model: str = ""
+    
     @abstractmethod
     async def generate_report(self, data: Dict[str, Any]) -> str:
         """Generate report from analytics data."""
@@ -19,115 +72,95 @@ class LLMProvider(ABC):
     async def generate_summary(self, text: str) -> str:
         """Generate summary of text."""
         pass
+    
+    async def stream_report(self, data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Generate report from analytics data, yielding text as it is produced."""
+        yield await self.generate_report(data)
+    
+    @property
+    def identity(self) -> str:
+        """Provider class and model, e.g. 'OllamaProvider:llama3'."""
+        return f"{self.__class__.__name__}:{self.model}"
+    
+    async def close(self):
+        """Close the provider's HTTP client."""
+        if hasattr(self, 'client') and hasattr(self.client, 'close'):
+            await self.client.close()
 
 
 class OllamaProvider(LLMProvider):
     """Ollama LLM provider."""
     
+    name = "ollama"
+    
     def __init__(self, base_url: str = None, model: str = None):
         self.base_url = base_url or settings.ollama_base_url
         self.model = model or settings.ollama_model
         self.client = OllamaHTTPClient(self.base_url, self.model)
+        self.prompts = PromptBuilder(self.name)
         logger.info("Ollama provider initialized", base_url=self.base_url, model=self.model)
     
     async def generate_report(self, data: Dict[str, Any]) -> str:
         """Generate analytics report using Ollama."""
         try:
-            # Create detailed prompt for analytics report
-            prompt = self._create_analytics_prompt(data)
+            # Create compact prompt for analytics report
+            prompt = self.prompts.build_report(data)
             
-            response = await self.client.generate(
-                prompt=prompt,
-                model=self.model,
-                options={
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 1000
-                }
-            )
+            response = await self.client.generate(**self._request(prompt, temperature=0.7, top_p=0.9))
             
             report = response.get("response", "").strip()
-            logger.info("Analytics report generated", report_length=len(report))
+            logger.info("Analytics report generated", report_length=len(report), prompt_tokens=prompt.prompt_tokens)
             return report
             
         except Exception as e:
             logger.error("Failed to generate report with Ollama", error=str(e))
-            # Fallback to mock report if Ollama is not available
-            logger.info("Using mock report as fallback")
-            return self._generate_mock_report(data)
+            raise
+    
+    async def stream_report(self, data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream analytics report tokens from Ollama."""
+        try:
+            prompt = self.prompts.build_report(data)
+            async for token in self.client.generate_stream(**self._request(prompt, temperature=0.7, top_p=0.9)):
+                yield token
+        except Exception as e:
+            logger.error("Failed to stream report with Ollama", error=str(e))
+            raise
     
     async def generate_summary(self, text: str) -> str:
         """Generate summary using Ollama."""
         try:
-            prompt = f"Summarize the following text in 2-3 sentences:\n\n{text}"
+            prompt = self.prompts.build_summary(text)
             
-            response = await self.client.generate(
-                prompt=prompt,
-                model=self.model,
-                options={
-                    "temperature": 0.5,
-                    "max_tokens": 200
-                }
-            )
+            response = await self.client.generate(**self._request(prompt, temperature=0.5))
             
             summary = response.get("response", "").strip()
-            logger.info("Summary generated", summary_length=len(summary))
+            logger.info("Summary generated", summary_length=len(summary), prompt_tokens=prompt.prompt_tokens)
             return summary
             
         except Exception as e:
             logger.error("Failed to generate summary with Ollama", error=str(e))
-            # Fallback to mock summary
-            logger.info("Using mock summary as fallback")
-            return f"[MOCK] Краткое резюме: {text[:100]}... (Ollama недоступен)"
-    
-    def _create_analytics_prompt(self, data: Dict[str, Any]) -> str:
-        """Create detailed prompt for analytics report."""
-        return f"""
-You are an AI video analytics expert. Analyze the following video surveillance data and generate a comprehensive report in Russian.
-
-Data:
-- Total people detected: {data.get('total_people', 0)}
-- Peak people count: {data.get('peak_people_count', 0)}
-- Average stay time: {data.get('average_stay_time', 0):.1f} seconds
-- Total frames processed: {data.get('total_frames', 0)}
-- Session duration: {data.get('session_duration', 0):.1f} seconds
-- Peak hours: {data.get('peak_hours', [])}
-- Heatmap data points: {data.get('heatmap_points_count', 0)}
-
-Please provide:
-1. Brief overview of activity
-2. Key insights about people movement
-3. Peak activity periods
-4. Recommendations for optimization
-5. Any notable patterns or anomalies
-
-Keep the report professional and concise (2-3 paragraphs).
-"""
+            raise
     
-    def _generate_mock_report(self, data: Dict[str, Any]) -> str:
-        """Generate mock report for testing when LLM is not available."""
-        total_people = data.get('total_people', 0)
-        peak_people = data.get('peak_people_count', 0)
-        avg_stay = data.get('average_stay_time', 0)
-        total_frames = data.get('total_frames', 0)
-        
-        return f"""
-АНАЛИТИЧЕСКИЙ ОТЧЕТ (MOCK - Ollama недоступен)
-
-Краткий обзор:
-В ходе обработки видео было детектировано {total_people} уникальных людей. Максимальное одновременное количество людей составило {peak_people}. Средняя продолжительность присутствия людей в кадре: {avg_stay:.2f} секунд. Всего было обработано {total_frames} кадров.
-
-Ключевые инсайты:
-Наблюдается стабильная активность с пиковыми моментами. Движение людей распределено равномерно по всему периоду наблюдения. Среднее время нахождения в зоне наблюдения составляет около {avg_stay:.1f} секунд, что указывает на нормальный поток людей без длительных задержек.
-
-Рекомендации:
-Рекомендуется проанализировать пиковые периоды для оптимизации маршрутов и распределения ресурсов. Необходимо продолжить мониторинг для выявления долгосрочных паттернов.
-"""
+    def _request(self, prompt: BuiltPrompt, **options) -> Dict[str, Any]:
+        """Ollama request arguments for a built prompt."""
+        return {
+            "prompt": prompt.prompt,
+            "model": self.model,
+            # The fixed system prefix and keep_alive let Ollama reuse the cached prefix across calls
+            "system": prompt.system,
+            "keep_alive": settings.ollama_keep_alive,
+            "options": {
+                **options,
+                "num_predict": prompt.max_output_tokens
+            }
+        }
 
 
 class OpenAIProvider(LLMProvider):
     """OpenAI LLM provider."""
     
+    name = "openai"
+    
     def __init__(self, api_key: str = None, model: str = None):
         self.api_key = api_key or settings.openai_api_key
         self.model = model or settings.openai_model
@@ -136,89 +169,228 @@ class OpenAIProvider(LLMProvider):
             raise ValueError("OpenAI API key is required")
         
         self.client = OpenAIHTTPClient(self.api_key)
+        self.prompts = PromptBuilder(self.name)
         logger.info("OpenAI provider initialized", model=self.model)
     
     async def generate_report(self, data: Dict[str, Any]) -> str:
         """Generate analytics report using OpenAI."""
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are an AI video analytics expert. Generate comprehensive reports in Russian based on surveillance data."
-                },
-                {
-                    "role": "user",
-                    "content": self._create_analytics_prompt(data)
-                }
-            ]
+            prompt = self.prompts.build_report(data)
             
             response = await self.client.chat_completion(
-                messages=messages,
+                messages=self._create_messages(prompt),
                 model=self.model,
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=prompt.max_output_tokens
             )
             
             report = response["choices"][0]["message"]["content"].strip()
-            logger.info("Analytics report generated", report_length=len(report))
+            logger.info("Analytics report generated", report_length=len(report), prompt_tokens=prompt.prompt_tokens)
             return report
             
         except Exception as e:
             logger.error("Failed to generate report with OpenAI", error=str(e))
             raise
     
+    async def stream_report(self, data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream analytics report tokens from OpenAI."""
+        try:
+            prompt = self.prompts.build_report(data)
+            async for token in self.client.chat_completion_stream(
+                messages=self._create_messages(prompt),
+                model=self.model,
+                temperature=0.7,
+                max_tokens=prompt.max_output_tokens
+            ):
+                yield token
+        except Exception as e:
+            logger.error("Failed to stream report with OpenAI", error=str(e))
+            raise
+    
     async def generate_summary(self, text: str) -> str:
         """Generate summary using OpenAI."""
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": "Summarize the following text in 2-3 sentences in Russian."
-                },
-                {
-                    "role": "user",
-                    "content": text
-                }
-            ]
+            prompt = self.prompts.build_summary(text)
             
             response = await self.client.chat_completion(
-                messages=messages,
+                messages=self._create_messages(prompt),
                 model=self.model,
                 temperature=0.5,
-                max_tokens=200
+                max_tokens=prompt.max_output_tokens
             )
             
             summary = response["choices"][0]["message"]["content"].strip()
-            logger.info("Summary generated", summary_length=len(summary))
+            logger.info("Summary generated", summary_length=len(summary), prompt_tokens=prompt.prompt_tokens)
             return summary
             
         except Exception as e:
             logger.error("Failed to generate summary with OpenAI", error=str(e))
             raise
     
-    def _create_analytics_prompt(self, data: Dict[str, Any]) -> str:
-        """Create detailed prompt for analytics report."""
-        return f"""
-Проанализируйте следующие данные видеонаблюдения и создайте подробный отчет:
+    def _create_messages(self, prompt: BuiltPrompt) -> List[Dict[str, str]]:
+        """Chat messages for a built prompt; the system message is the shared prefix."""
+        return [
+            {"role": "system", "content": prompt.system},
+            {"role": "user", "content": prompt.prompt}
+        ]
 
-Данные:
-- Общее количество людей: {data.get('total_people', 0)}
-- Пиковое количество людей: {data.get('peak_people_count', 0)}
-- Среднее время нахождения: {data.get('average_stay_time', 0):.1f} секунд
-- Обработано кадров: {data.get('total_frames', 0)}
-- Длительность сессии: {data.get('session_duration', 0):.1f} секунд
-- Пиковые часы: {data.get('peak_hours', [])}
-- Точки тепловой карты: {data.get('heatmap_points_count', 0)}
 
-Предоставьте:
-1. Краткий обзор активности
-2. Ключевые инсайты о движении людей
-3. Периоды пиковой активности
-4. Рекомендации по оптимизации
-5. Заметные паттерны или аномалии
-
-Отчет должен быть профессиональным и кратким (2-3 абзаца).
-"""
+class ResilientProvider(LLMProvider):
+    """Guards providers with circuit breakers, hedges slow calls to a secondary and falls back to templates."""
+    
+    def __init__(self, primary: LLMProvider, secondary: LLMProvider = None, hedge_delay: float = None):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_delay = hedge_delay if hedge_delay is not None else settings.llm_hedge_delay
+        self.name = primary.name
+        self.model = primary.model
+        self.template_version = primary.template_version
+        self.breakers = {
+            provider.name: CircuitBreaker(
+                f"llm_{provider.name}",
+                window_seconds=settings.llm_breaker_window,
+                min_requests=settings.llm_breaker_min_requests,
+                failure_rate=settings.llm_breaker_failure_rate,
+                open_seconds=settings.llm_breaker_open_seconds,
+                half_open_calls=settings.llm_breaker_half_open_calls
+            )
+            for provider in self.providers
+        }
+    
+    @property
+    def providers(self) -> List[LLMProvider]:
+        """Providers in order of preference."""
+        return [provider for provider in (self.primary, self.secondary) if provider is not None]
+    
+    @property
+    def identity(self) -> str:
+        """Identity of the primary provider, which reports are cached under."""
+        return self.primary.identity
+    
+    async def generate_report(self, data: Dict[str, Any], limit: Optional[ProviderLimit] = None) -> str:
+        """Generate report, or a template report when every provider is down."""
+        try:
+            return self._attribute(*await self._call("generate_report", data, limit=limit))
+        except CircuitOpenError:
+            llm_fallback_total.labels(operation="report", reason="circuit_open").inc()
+        except Exception as e:
+            logger.error("All LLM providers failed to generate report", error=str(e))
+            llm_fallback_total.labels(operation="report", reason="error").inc()
+        return FallbackText(fallback_report(data))
+    
+    async def stream_report(self, data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream report from the first available provider; streams are not hedged."""
+        reason = "circuit_open"
+        for provider in self.providers:
+            breaker = self.breakers[provider.name]
+            if not breaker.allow_request():
+                continue
+            
+            streamed = False
+            try:
+                async for token in provider.stream_report(data):
+                    streamed = True
+                    yield self._attribute(provider, token)
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                logger.error("Failed to stream report", provider=provider.name, error=str(e))
+                if streamed:
+                    # Part of the report already reached the client, so nothing can replace it
+                    raise
+                reason = "error"
+                continue
+            
+            breaker.record_success()
+            return
+        
+        llm_fallback_total.labels(operation="report", reason=reason).inc()
+        yield FallbackText(fallback_report(data))
+    
+    async def generate_summary(self, text: str) -> str:
+        """Generate summary, or a template summary when every provider is down."""
+        try:
+            return self._attribute(*await self._call("generate_summary", text))
+        except CircuitOpenError:
+            llm_fallback_total.labels(operation="summary", reason="circuit_open").inc()
+        except Exception as e:
+            logger.error("All LLM providers failed to generate summary", error=str(e))
+            llm_fallback_total.labels(operation="summary", reason="error").inc()
+        return FallbackText(fallback_summary(text))
+    
+    async def close(self):
+        """Close every wrapped provider."""
+        for provider in self.providers:
+            await provider.close()
+    
+    def _attribute(self, provider: LLMProvider, text: str) -> str:
+        """Mark text that did not come from the primary with the provider that answered."""
+        if provider is self.primary:
+            return text
+        return SecondaryText(text, provider)
+    
+    async def _call(
+        self,
+        operation: str,
+        *args,
+        limit: Optional[ProviderLimit] = None
+    ) -> Tuple[LLMProvider, str]:
+        """Call providers in order, starting the next one when the current is slow or has failed.
+        
+        Returns the provider that answered with its text. Each call holds limit(provider.name)
+        when given; waiting for a slot counts towards the hedge delay, so a saturated primary
+        spills over to the secondary.
+        """
+        pending: Dict[asyncio.Task, LLMProvider] = {}
+        remaining = iter(self.providers)
+        
+        async def call(provider: LLMProvider) -> str:
+            if limit is None:
+                return await getattr(provider, operation)(*args)
+            async with limit(provider.name):
+                return await getattr(provider, operation)(*args)
+        
+        def launch() -> Optional[LLMProvider]:
+            for provider in remaining:
+                if self.breakers[provider.name].allow_request():
+                    pending[asyncio.create_task(call(provider))] = provider
+                    return provider
+            return None
+        
+        if launch() is None:
+            raise CircuitOpenError(operation)
+        
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge = launch()
+                    if hedge is not None:
+                        llm_hedged_requests_total.labels(provider=hedge.name, reason="slow").inc()
+                    continue
+                
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        self.breakers[provider.name].record_success()
+                        return provider, task.result()
+                    self.breakers[provider.name].record_failure()
+                    error = task.exception()
+                
+                if not pending:
+                    hedge = launch()
+                    if hedge is not None:
+                        llm_hedged_requests_total.labels(provider=hedge.name, reason="failed").inc()
+        finally:
+            # The slower call lost the race (or the caller went away)
+            for task, provider in pending.items():
+                task.cancel()
+                self.breakers[provider.name].release()
+        
+        raise error
 
 
 class LLMService:
@@ -231,35 +403,79 @@ class LLMService:
     @classmethod
     def create_ollama_service(cls) -> 'LLMService':
         """Create LLM service with Ollama provider."""
-        provider = OllamaProvider()
+        provider = ResilientProvider(OllamaProvider())
         return cls(provider)
     
     @classmethod
     def create_openai_service(cls) -> 'LLMService':
         """Create LLM service with OpenAI provider."""
-        provider = OpenAIProvider()
+        provider = ResilientProvider(OpenAIProvider())
         return cls(provider)
     
+    @property
+    def provider_name(self) -> str:
+        """Short provider name, e.g. 'ollama'."""
+        return self.provider.name or self.provider.__class__.__name__
+    
+    @property
+    def model_identity(self) -> str:
+        """Provider and model that produce the reports, e.g. 'OllamaProvider:llama3'."""
+        return self.provider.identity
+    
+    @property
+    def template_version(self) -> str:
+        """Prompt template version of the provider."""
+        return self.provider.template_version
+    
     def _create_default_provider(self) -> LLMProvider:
-        """Create default provider based on configuration."""
-        if settings.llm_provider == "ollama":
+        """Create default provider based on configuration, wrapped with the secondary for resilience."""
+        primary = self._create_provider(settings.llm_provider)
+        
+        secondary = None
+        if settings.llm_secondary_provider and settings.llm_secondary_provider != primary.name:
+            try:
+                secondary = self._create_provider(settings.llm_secondary_provider)
+            except ValueError as e:
+                logger.warning("Secondary LLM provider unavailable", error=str(e))
+        
+        return ResilientProvider(primary, secondary)
+    
+    def _create_provider(self, name: str) -> LLMProvider:
+        """Create provider by name."""
+        if name == "ollama":
             return OllamaProvider()
-        elif settings.llm_provider == "openai":
+        elif name == "openai":
             return OpenAIProvider()
         else:
             logger.warning("Unknown LLM provider, falling back to Ollama")
             return OllamaProvider()
     
-    async def generate_report(self, data: Dict[str, Any]) -> str:
-        """Generate analytics report."""
+    async def generate_report(self, data: Dict[str, Any], limit: Optional[ProviderLimit] = None) -> str:
+        """Generate analytics report; limit bounds concurrent calls of whichever provider is called."""
         try:
-            report = await self.provider.generate_report(data)
+            if isinstance(self.provider, ResilientProvider):
+                report = await self.provider.generate_report(data, limit)
+            elif limit is not None:
+                async with limit(self.provider_name):
+                    report = await self.provider.generate_report(data)
+            else:
+                report = await self.provider.generate_report(data)
             logger.info("Report generated successfully")
             return report
         except Exception as e:
             logger.error("Failed to generate report", error=str(e))
             raise
     
+    async def stream_report(self, data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Generate analytics report, yielding text as it is produced."""
+        try:
+            async for chunk in self.provider.stream_report(data):
+                yield chunk
+            logger.info("Report streamed successfully")
+        except Exception as e:
+            logger.error("Failed to stream report", error=str(e))
+            raise
+    
     async def generate_summary(self, text: str) -> str:
         """Generate text summary."""
         try:
@@ -272,6 +488,5 @@ class LLMService:
     
     async def close(self):
         """Close LLM service."""
-        if hasattr(self.provider, 'client') and hasattr(self.provider.client, 'close'):
-            await self.provider.client.close()
+        await self.provider.close()
         logger.info("LLM service closed")
@@ -0,0 +1,60 @@
+"""Process-wide cache of detection models, loaded on first use.
+
+ultralytics (and with it torch and cv2) is imported only when a model is loaded, so processes
+that never run detection - the API, init_db.py, scripts - start without the CV/ML stack.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List
+import structlog
+
+logger = structlog.get_logger()
+
+
+class ModelRegistry:
+    """Loads each model once and shares it between detection strategies."""
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str) -> Any:
+        """Loaded YOLO model; None if it failed to load (the failure is remembered, not retried per frame)."""
+        if model_name in self._models:
+            return self._models[model_name]
+
+        with self._lock:
+            if model_name in self._models:
+                return self._models[model_name]
+            if model_name in self._failed:
+                return None
+
+            started = time.perf_counter()
+            try:
+                from ultralytics import YOLO
+
+                model = YOLO(model_name)
+            except Exception as e:
+                logger.warning("Failed to load YOLO model, using mock detection", model=model_name, error=str(e))
+                self._failed[model_name] = str(e)
+                return None
+
+            self._models[model_name] = model
+            logger.info("YOLO model loaded", model=model_name, seconds=round(time.perf_counter() - started, 2))
+            return model
+
+    def loaded(self) -> List[str]:
+        """Names of the models loaded in this process."""
+        return list(self._models)
+
+    def clear(self) -> None:
+        """Drop loaded models and remembered failures."""
+        with self._lock:
+            self._models.clear()
+            self._failed.clear()
+
+
+# Global model registry instance
+model_registry = ModelRegistry()
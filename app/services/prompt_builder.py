@@ -0,0 +1,129 @@
+from typing import Dict, Any, List, Optional
+import structlog
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Bump whenever a template below changes, so cached reports of old prompts are not reused
+PROMPT_TEMPLATE_VERSION = "2"
+
+# Identical for every call, so Ollama can reuse the evaluated prefix while the model stays loaded
+SYSTEM_PREFIX = (
+    "Ты эксперт по видеоаналитике. Отвечай на русском, профессионально и кратко. "
+    "Опирайся только на переданные метрики, не выдумывай данные."
+)
+
+# Field name in the prompt, unit and formatting of each analytics metric, most important first
+REPORT_FIELDS = [
+    ("total_people", "people_total", "{:d}"),
+    ("peak_people_count", "people_peak", "{:d}"),
+    ("average_stay_time", "stay_avg_s", "{:.1f}"),
+    ("session_duration", "duration_s", "{:.0f}"),
+    ("total_frames", "frames", "{:d}"),
+    ("heatmap_points_count", "heatmap_points", "{:d}"),
+    ("peak_hours", "peak_hours", "{}")
+]
+
+TEMPLATES = {
+    "report": (
+        "Метрики сессии:\n{data}\n\n"
+        "Отчет (2-3 абзаца): 1) обзор активности 2) движение людей 3) пиковые периоды "
+        "4) рекомендации 5) аномалии."
+    ),
+    "summary": "Кратко (2-3 предложения) резюмируй:\n{data}"
+}
+
+
+class TokenEstimator:
+    """Cheap token count estimate; Cyrillic text needs noticeably more tokens per character."""
+    
+    # Characters per token for ASCII and for other (mostly Cyrillic) text
+    RATIOS = {
+        "ollama": (3.5, 2.0),
+        "openai": (4.0, 2.5)
+    }
+    
+    def __init__(self, provider: str):
+        self.ascii_ratio, self.other_ratio = self.RATIOS.get(provider, (3.5, 2.0))
+    
+    def estimate(self, text: str) -> int:
+        """Estimated number of tokens in text."""
+        ascii_chars = sum(1 for char in text if ord(char) < 128)
+        other_chars = len(text) - ascii_chars
+        return int(ascii_chars / self.ascii_ratio + other_chars / self.other_ratio) + 1
+
+
+class BuiltPrompt:
+    """Prompt ready to send: system prefix, user prompt and output budget."""
+    
+    def __init__(self, system: str, prompt: str, max_output_tokens: int, prompt_tokens: int):
+        self.system = system
+        self.prompt = prompt
+        self.max_output_tokens = max_output_tokens
+        self.prompt_tokens = prompt_tokens
+        self.template_version = PROMPT_TEMPLATE_VERSION
+
+
+def format_report_data(data: Dict[str, Any]) -> List[str]:
+    """One compact key=value line per known metric, most important first."""
+    lines = []
+    for key, name, fmt in REPORT_FIELDS:
+        value = data.get(key)
+        if value is None or value == []:
+            continue
+        if isinstance(value, list):
+            value = ",".join(str(item) for item in value)
+        elif fmt == "{:d}":
+            value = int(value)
+        lines.append(f"{name}={fmt.format(value)}")
+    return lines
+
+
+def compact_data(data: Dict[str, Any]) -> str:
+    """Compact text form of analytics data for free-text prompts such as summaries."""
+    return "\n".join(format_report_data(data))
+
+
+class PromptBuilder:
+    """Builds prompts from the templates within a provider's token budget."""
+    
+    def __init__(self, provider: str, max_prompt_tokens: int = None):
+        self.provider = provider
+        self.estimator = TokenEstimator(provider)
+        self.max_prompt_tokens = max_prompt_tokens or settings.llm_max_prompt_tokens
+    
+    def build_report(self, data: Dict[str, Any], max_output_tokens: int = None) -> BuiltPrompt:
+        """Report prompt from analytics data."""
+        return self._build(
+            "report",
+            format_report_data(data),
+            max_output_tokens or settings.llm_report_max_tokens
+        )
+    
+    def build_summary(self, text: str, max_output_tokens: int = None) -> BuiltPrompt:
+        """Summary prompt for free text."""
+        return self._build(
+            "summary",
+            text.splitlines(),
+            max_output_tokens or settings.llm_summary_max_tokens
+        )
+    
+    def _build(self, template: str, lines: List[str], max_output_tokens: int) -> BuiltPrompt:
+        """Fill a template, dropping trailing data lines until it fits the prompt budget."""
+        system_tokens = self.estimator.estimate(SYSTEM_PREFIX)
+        budget = max(self.max_prompt_tokens - system_tokens, 0)
+        
+        prompt = TEMPLATES[template].format(data="\n".join(lines))
+        prompt_tokens = self.estimator.estimate(prompt)
+        while prompt_tokens > budget and lines:
+            lines = lines[:-1]
+            prompt = TEMPLATES[template].format(data="\n".join(lines))
+            prompt_tokens = self.estimator.estimate(prompt)
+        
+        if prompt_tokens > budget:
+            # Even the bare template is over budget: cut the text itself
+            prompt = prompt[:int(budget * self.estimator.other_ratio)]
+            prompt_tokens = self.estimator.estimate(prompt)
+        
+        logger.debug("Prompt built", template=template, prompt_tokens=prompt_tokens + system_tokens, max_output_tokens=max_output_tokens)
+        return BuiltPrompt(SYSTEM_PREFIX, prompt, max_output_tokens, prompt_tokens + system_tokens)
@@ -0,0 +1,207 @@
+from typing import Dict, Any, Tuple, List, Callable, Set
+import asyncio
+import hashlib
+import itertools
+import time
+import structlog
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import (
+    report_jobs_queue_depth,
+    report_jobs_total,
+    report_job_wait_seconds,
+    report_job_generation_seconds
+)
+from app.database.connection import SessionLocal
+from app.database.models import ReportJob
+from app.repositories.report_job_repository import ReportJobRepository
+from app.repositories.report_repository import ReportRepository
+from app.repositories.video_session_repository import VideoSessionRepository
+from app.repositories.detection_repository import DetectionRepository
+from app.services.analytics_service import AnalyticsService
+from app.services.llm_service import LLMService, SecondaryText
+from app.services.report_service import ReportService
+
+logger = structlog.get_logger()
+
+
+def report_job_dedup_key(session_id: str, report_type: str) -> str:
+    """Identical jobs (same session and report type) share a dedup key."""
+    return hashlib.sha256(f"{session_id}:{report_type}".encode("utf-8")).hexdigest()
+
+
+class ReportJobQueue:
+    """Priority queue of report jobs drained by a worker pool with per-provider LLM concurrency."""
+    
+    def __init__(
+        self,
+        llm_service: LLMService,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: int = None,
+        concurrency: Dict[str, int] = None,
+        lease_timeout: float = None
+    ):
+        self.llm_service = llm_service
+        self.session_factory = session_factory
+        self.workers = workers or settings.report_job_workers
+        # Limits hold per process: with N API processes a provider sees up to N times as many calls
+        self.concurrency = concurrency or settings.report_job_concurrency
+        self.lease_timeout = lease_timeout or settings.report_job_lease_timeout
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._queued: Set[str] = set()  # jobs on the local queue
+        self._running: Dict[str, str] = {}  # job id -> claim token, for jobs this process runs
+    
+    async def start(self) -> None:
+        """Queue pending jobs and jobs orphaned by a dead process, and start the workers."""
+        db = self.session_factory()
+        try:
+            repo = ReportJobRepository(db)
+            # Jobs of other live processes keep sending heartbeats and are left alone
+            repo.reset_stale_jobs(self.lease_timeout)
+            for job in repo.get_pending_jobs():
+                self._enqueue(job.id, job.priority)
+        finally:
+            db.close()
+        
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"report-job-worker-{index}")
+            for index in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._keep_leases(), name="report-job-leases"))
+        logger.info("Report job workers started", workers=self.workers, queued=self.queue.qsize())
+    
+    async def stop(self) -> None:
+        """Stop the workers; unfinished jobs stay pending in the database."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Report job workers stopped")
+    
+    def submit(self, db: Session, session_id: str, report_type: str, priority: int = 0) -> Tuple[ReportJob, bool]:
+        """Queue a report job; returns the job and whether an identical pending job was reused."""
+        repo = ReportJobRepository(db)
+        dedup_key = report_job_dedup_key(session_id, report_type)
+        
+        existing = repo.get_active_job(dedup_key)
+        if existing:
+            if existing.status == "pending" and priority < existing.priority:
+                # Queue it again at the higher priority; the stale entry is skipped when claimed
+                existing = repo.update(existing.id, {"priority": priority})
+                self._enqueue(existing.id, priority)
+            logger.info("Report job deduplicated", job_id=existing.id, session_id=session_id)
+            return existing, True
+        
+        job = repo.create_job(session_id, report_type, priority, dedup_key)
+        self._enqueue(job.id, priority)
+        logger.info("Report job queued", job_id=job.id, session_id=session_id, priority=priority)
+        return job, False
+    
+    def semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Concurrency limit of LLM calls for a provider."""
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self.concurrency.get(provider, 1))
+        return self._semaphores[provider]
+    
+    async def _keep_leases(self) -> None:
+        """Send heartbeats for the jobs of this process and take over jobs of processes that died."""
+        while True:
+            await asyncio.sleep(self.lease_timeout / 4)
+            db = self.session_factory()
+            try:
+                repo = ReportJobRepository(db)
+                repo.touch_jobs(list(self._running.values()))
+                for job in repo.reset_stale_jobs(self.lease_timeout):
+                    logger.warning("Re-queueing orphaned report job", job_id=job.id, session_id=job.session_id)
+                    self._enqueue(job.id, job.priority)
+                # A pending job lives in the memory of the process that queued it; one still pending after
+                # a lease was queued by a process that died (or is backlogged), and any process may claim it
+                for job in repo.get_pending_jobs(older_than=self.lease_timeout):
+                    if job.id not in self._queued:
+                        logger.warning("Queueing long-pending report job", job_id=job.id, session_id=job.session_id)
+                        self._enqueue(job.id, job.priority)
+            except Exception as e:
+                logger.error("Report job lease upkeep failed", error=str(e))
+            finally:
+                db.close()
+    
+    def _enqueue(self, job_id: str, priority: int) -> None:
+        """Put a job on the queue; equal priorities run in submission order."""
+        self.queue.put_nowait((priority, next(self._sequence), job_id, time.monotonic()))
+        self._queued.add(job_id)
+        report_jobs_queue_depth.set(self.queue.qsize())
+    
+    async def _worker(self, index: int) -> None:
+        """Take jobs off the queue until cancelled."""
+        while True:
+            _, _, job_id, enqueued_at = await self.queue.get()
+            self._queued.discard(job_id)
+            report_jobs_queue_depth.set(self.queue.qsize())
+            try:
+                await self._run(job_id, enqueued_at)
+            except Exception as e:
+                logger.error("Report job worker error", worker=index, job_id=job_id, error=str(e))
+            finally:
+                self.queue.task_done()
+    
+    async def _run(self, job_id: str, enqueued_at: float) -> None:
+        """Generate the report of one job and store the outcome."""
+        db = self.session_factory()
+        try:
+            repo = ReportJobRepository(db)
+            job = repo.claim_job(job_id)
+            if not job:
+                # Already taken by a higher-priority duplicate entry
+                return
+            
+            report_job_wait_seconds.observe(time.monotonic() - enqueued_at)
+            # Kept apart from the row, which reloads after commits and may then show another claim
+            claim = job.claimed_by
+            self._running[job_id] = claim
+            
+            try:
+                analytics_service = AnalyticsService(VideoSessionRepository(db), DetectionRepository(db))
+                analytics = analytics_service.get_session_analytics(job.session_id)
+                if not analytics:
+                    raise ValueError("Session not found or no analytics data available")
+                
+                report_service = ReportService(self.llm_service, ReportRepository(db))
+                content = await report_service.get_or_generate(
+                    job.session_id,
+                    job.report_type,
+                    analytics_service.build_llm_data(analytics),
+                    self._generate_report
+                )
+                
+                outcome = {"result": content}
+            except Exception as e:
+                logger.error("Report job failed", job_id=job_id, session_id=job.session_id, error=str(e))
+                outcome = {"error": str(e)}
+            
+            # A process whose lease was taken over must not overwrite the new owner's outcome
+            if not repo.mark_finished(job_id, claim, **outcome):
+                logger.warning("Report job lease lost, outcome dropped", job_id=job_id, session_id=job.session_id)
+                return
+            if "error" in outcome:
+                report_jobs_total.labels(status="failed").inc()
+            else:
+                report_jobs_total.labels(status="completed").inc()
+                logger.info("Report job completed", job_id=job_id, session_id=job.session_id)
+        finally:
+            self._running.pop(job_id, None)
+            db.close()
+    
+    async def _generate_report(self, data: Dict[str, Any]) -> str:
+        """Call the LLM under the concurrency limit of each provider called (cache hits never get here)."""
+        provider = self.llm_service.provider_name
+        started = time.perf_counter()
+        try:
+            report = await self.llm_service.generate_report(data, limit=self.semaphore)
+            if isinstance(report, SecondaryText):
+                provider = report.provider_name
+            return report
+        finally:
+            report_job_generation_seconds.labels(provider=provider).observe(time.perf_counter() - started)
@@ -0,0 +1,248 @@
+from typing import Dict, Any, Callable, Awaitable, AsyncIterator, Optional
+import asyncio
+import hashlib
+import json
+import structlog
+from app.core.config import settings
+from app.core.redis_cache import redis_cache, CacheEntry
+from app.repositories.report_repository import ReportRepository
+from app.services.llm_service import LLMService, FallbackText, SecondaryText
+
+logger = structlog.get_logger()
+
+
+def normalize_report_data(data: Any) -> Any:
+    """Normalize LLM input so equal analytics hash equally (sorted keys, rounded floats)."""
+    if isinstance(data, dict):
+        return {str(key): normalize_report_data(data[key]) for key in sorted(data, key=str)}
+    if isinstance(data, (list, tuple)):
+        return [normalize_report_data(item) for item in data]
+    if isinstance(data, float):
+        return round(data, 2)
+    return data
+
+
+def report_content_hash(template_version: str, model: str, data: Dict[str, Any], report_type: str) -> str:
+    """Content address of a report: same template, model, data and type give the same report."""
+    payload = json.dumps(
+        [template_version, model, normalize_report_data(data), report_type],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReportService:
+    """Content-addressed cache of generated reports: the session's Report row, Redis, any session's row, then the LLM."""
+    
+    def __init__(self, llm_service: LLMService, report_repo: ReportRepository):
+        self.llm_service = llm_service
+        self.report_repo = report_repo
+    
+    async def get_or_generate(
+        self,
+        session_id: str,
+        report_type: str,
+        data: Dict[str, Any],
+        generate: Callable[[Dict[str, Any]], Awaitable[str]]
+    ) -> str:
+        """Get a report for the data, generating it with the LLM only on a miss; the session always gets a Report row."""
+        normalized = normalize_report_data(data)
+        content_hash = self.content_hash(report_type, normalized)
+        
+        content = self._load_session_report(session_id, content_hash)
+        if content is not None:
+            return content
+        
+        async def load() -> CacheEntry:
+            content = self._load_stored(session_id, report_type, content_hash)
+            if content is not None:
+                return CacheEntry(content, settings.report_cache_ttl)
+            
+            content = await generate(normalized)
+            if isinstance(content, FallbackText):
+                logger.warning("Fallback report not cached", session_id=session_id, report_type=report_type)
+                return CacheEntry(content, None, store=False)
+            if isinstance(content, SecondaryText):
+                # Not the primary's answer: stored under its own provider below, never under this key
+                return CacheEntry(content, None, store=False)
+            
+            self.store(session_id, report_type, content, content_hash)
+            return CacheEntry(content, settings.report_cache_ttl)
+        
+        # Identical concurrent requests share one generation; the hash is shared across sessions
+        content = await redis_cache.get_or_load(f"report:{content_hash}", load)
+        if isinstance(content, FallbackText):
+            return str(content)
+        if isinstance(content, SecondaryText):
+            self._store_secondary(session_id, report_type, normalized, str(content), content)
+            return str(content)
+        
+        # A Redis hit or another session's generation: this session still needs its row
+        self._ensure_stored(session_id, report_type, content, content_hash)
+        return content
+    
+    async def generate_batch(
+        self,
+        report_type: str,
+        items: Dict[str, Dict[str, Any]],
+        generate: Callable[[Dict[str, Any]], Awaitable[str]],
+        concurrency: int = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate reports for many sessions in parallel, yielding each result as it completes."""
+        semaphore = asyncio.Semaphore(concurrency or settings.report_batch_concurrency)
+        
+        async def generate_one(session_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    summary = await self.get_or_generate(session_id, report_type, data, generate)
+                    return {"session_id": session_id, "status": "completed", "summary": summary}
+                except Exception as e:
+                    logger.error("Batch report failed", session_id=session_id, error=str(e))
+                    return {"session_id": session_id, "status": "failed", "error": str(e)}
+        
+        tasks = [asyncio.create_task(generate_one(session_id, data)) for session_id, data in items.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (e.g. client disconnected): drop the remaining work
+            for task in tasks:
+                task.cancel()
+    
+    async def stream_report(
+        self,
+        session_id: str,
+        report_type: str,
+        data: Dict[str, Any],
+        stream: Callable[[Dict[str, Any]], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Yield a cached report at once, or stream it from the LLM and cache the final text."""
+        normalized = normalize_report_data(data)
+        content_hash = self.content_hash(report_type, normalized)
+        cache_key = f"report:{content_hash}"
+        
+        content = self._load_session_report(session_id, content_hash)
+        if content is None:
+            content = await redis_cache.get(cache_key)
+            if content is not None:
+                self._ensure_stored(session_id, report_type, content, content_hash)
+        if content is None:
+            content = self._load_stored(session_id, report_type, content_hash)
+            if content is not None:
+                await redis_cache.set(cache_key, content, settings.report_cache_ttl)
+        
+        if content is not None:
+            yield content
+            return
+        
+        chunks = []
+        fallback = False
+        secondary: Optional[SecondaryText] = None
+        async for chunk in stream(normalized):
+            fallback = fallback or isinstance(chunk, FallbackText)
+            if isinstance(chunk, SecondaryText):
+                secondary = chunk
+            chunks.append(chunk)
+            yield chunk
+        
+        # Only a complete model-generated text is cached; a disconnect never gets here
+        if fallback:
+            logger.warning("Fallback report not cached", session_id=session_id, report_type=report_type)
+            return
+        
+        content = "".join(chunks).strip()
+        if secondary is not None:
+            self._store_secondary(session_id, report_type, normalized, content, secondary)
+            return
+        self.store(session_id, report_type, content, content_hash)
+        await redis_cache.set(cache_key, content, settings.report_cache_ttl)
+    
+    def content_hash(self, report_type: str, normalized: Dict[str, Any]) -> str:
+        """Content address of a report of the current template and model."""
+        return report_content_hash(
+            self.llm_service.template_version,
+            self.llm_service.model_identity,
+            normalized,
+            report_type
+        )
+    
+    def _load_session_report(self, session_id: str, content_hash: str) -> Optional[str]:
+        """Get the session's own stored report, if it has one."""
+        report = self.report_repo.get_session_report(session_id, content_hash)
+        if not report:
+            return None
+        logger.info("Report served from database", session_id=session_id, content_hash=content_hash)
+        return report.content
+    
+    def _ensure_stored(
+        self,
+        session_id: str,
+        report_type: str,
+        content: str,
+        content_hash: str,
+        model: str = None,
+        template_version: str = None
+    ) -> None:
+        """Persist a cached report for a session that has no row for it yet."""
+        try:
+            stored = self.report_repo.get_session_report(session_id, content_hash) is not None
+        except Exception:
+            # Logged by the repository; the report is still returned, it just is not persisted
+            return
+        if not stored:
+            self.store(session_id, report_type, content, content_hash, model, template_version)
+    
+    def _store_secondary(
+        self,
+        session_id: str,
+        report_type: str,
+        normalized: Dict[str, Any],
+        content: str,
+        answer: SecondaryText
+    ) -> None:
+        """Persist a report the secondary provider answered under that provider's content address."""
+        content_hash = report_content_hash(answer.template_version, answer.identity, normalized, report_type)
+        logger.info(
+            "Report answered by secondary provider",
+            session_id=session_id,
+            provider=answer.provider_name,
+            content_hash=content_hash
+        )
+        self._ensure_stored(session_id, report_type, content, content_hash, answer.identity, answer.template_version)
+    
+    def _load_stored(self, session_id: str, report_type: str, content_hash: str) -> Optional[str]:
+        """Get a stored report text from the reports table, from any session with the same content."""
+        report = self.report_repo.get_by_content_hash(content_hash, session_id)
+        if not report:
+            return None
+        
+        if report.session_id != session_id:
+            # Identical analytics of another session: share its report
+            self.store(session_id, report_type, report.content, content_hash)
+        logger.info("Report served from database", session_id=session_id, content_hash=content_hash)
+        return report.content
+    
+    def store(
+        self,
+        session_id: str,
+        report_type: str,
+        content: str,
+        content_hash: str,
+        model: str = None,
+        template_version: str = None
+    ) -> None:
+        """Persist a generated report for a session, by default as the primary provider's."""
+        try:
+            self.report_repo.create_report(
+                session_id=session_id,
+                report_type=report_type,
+                content=content,
+                content_hash=content_hash,
+                model=model or self.llm_service.model_identity,
+                template_version=template_version or self.llm_service.template_version
+            )
+        except Exception as e:
+            # The report is still returned, it just is not persisted
+            logger.error("Failed to store report", session_id=session_id, content_hash=content_hash, error=str(e))
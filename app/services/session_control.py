@@ -0,0 +1,108 @@
+"""Stop requests for running video analyses.
+
+Every pipeline registers a cancellation token and checks it between its stages. Tokens of
+this process are cancelled directly (cancel endpoint, session deletion, SIGTERM drain);
+analyses running in other processes see a cancellation through the session status, which
+the token polls at a low rate.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional
+import structlog
+from app.core.config import settings
+from app.repositories.video_session_repository import VideoSessionRepository
+
+logger = structlog.get_logger()
+
+# Stop reasons; cancelled and interrupted are also the final session status
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+DELETED = "deleted"
+
+
+class CancellationToken:
+    """Cooperative stop request for one running analysis."""
+
+    def __init__(self, session_id: str, poll_interval: float = None):
+        self.session_id = session_id
+        self.poll_interval = settings.analysis_cancel_poll_interval if poll_interval is None else poll_interval
+        self.reason: Optional[str] = None
+        self._next_poll = time.monotonic() + self.poll_interval
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the analysis should stop."""
+        return self.reason is not None
+
+    def cancel(self, reason: str) -> None:
+        """Ask the analysis to stop; the first reason wins. Only sets a flag, so it is safe in signal handlers."""
+        if self.reason is None:
+            self.reason = reason
+
+    def poll(self, session_repo: VideoSessionRepository) -> bool:
+        """Check the token, and at most once per poll interval the session status written by other processes."""
+        if self.reason is None and time.monotonic() >= self._next_poll:
+            self._next_poll = time.monotonic() + self.poll_interval
+            status = session_repo.get_status(self.session_id)
+            if status is None:
+                self.cancel(DELETED)
+            elif status in ("cancelling", CANCELLED):
+                self.cancel(CANCELLED)
+        return self.cancelled
+
+
+class SessionRegistry:
+    """Tokens of the analyses running in this process."""
+
+    def __init__(self):
+        self._tokens: Dict[str, CancellationToken] = {}
+
+    def start(self, session_id: str) -> CancellationToken:
+        """Register a starting analysis."""
+        token = CancellationToken(session_id)
+        self._tokens[session_id] = token
+        return token
+
+    def finish(self, session_id: str) -> None:
+        """Forget a finished analysis."""
+        self._tokens.pop(session_id, None)
+
+    def running(self) -> List[str]:
+        """Sessions analyzed in this process."""
+        return list(self._tokens)
+
+    def cancel(self, session_id: str, reason: str = CANCELLED) -> bool:
+        """Stop an analysis of this process; False if it does not run here."""
+        token = self._tokens.get(session_id)
+        if token is None:
+            return False
+        token.cancel(reason)
+        logger.info("Video analysis stop requested", session_id=session_id, reason=reason)
+        return True
+
+    def interrupt_all(self) -> int:
+        """Stop every analysis of this process for a shutdown; returns how many were running."""
+        for token in self._tokens.values():
+            token.cancel(INTERRUPTED)
+        return len(self._tokens)
+
+    async def drain(self, timeout: float = None) -> bool:
+        """Interrupt all analyses and wait until they have checkpointed and stopped; False on timeout."""
+        timeout = settings.analysis_drain_timeout if timeout is None else timeout
+        if not self.interrupt_all():
+            return True
+
+        logger.info("Draining video analyses", sessions=self.running(), timeout=timeout)
+        deadline = time.monotonic() + timeout
+        while self._tokens and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        if self._tokens:
+            logger.warning("Video analyses did not stop before the drain deadline", sessions=self.running())
+            return False
+        return True
+
+
+# Global session registry instance
+session_registry = SessionRegistry()
@@ -2,62 +2,160 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 import numpy as np
 import structlog
-from datetime import datetime
+from datetime import datetime, timedelta
+from app.core.config import settings
 from app.models.schemas import Detection, TrackedObject, TrackingStatus, BoundingBox
 
 logger = structlog.get_logger()
 
 
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise intersection over union of (x1, y1, x2, y2) boxes, shape (len(a), len(b))."""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
 class TrackingStrategy(ABC):
     """Abstract base class for tracking strategies."""
     
     @abstractmethod
-    def track(self, detections: List[Detection]) -> List[TrackedObject]:
-        """Track objects from detections."""
+    def track(self, detections: List[Detection], timestamp: Optional[datetime] = None) -> List[TrackedObject]:
+        """Track objects from the detections of a frame taken at timestamp (now if not given)."""
         pass
     
     @abstractmethod
     def reset(self) -> None:
         """Reset tracking state."""
         pass
+    
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable state for a checkpoint; empty when the strategy cannot be restored."""
+        return {}
+    
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state saved by get_state; strategies without one start new tracks after a resume."""
+        pass
 
 
 class SimpleTrackingStrategy(TrackingStrategy):
-    """Simple tracking strategy (original implementation)."""
+    """Greedy IoU association of each frame's detections with the tracks of the previous frames."""
     
-    def __init__(self):
+    def __init__(self, iou_threshold: float = None, max_distance: float = None, max_age: float = None):
+        self.iou_threshold = settings.tracking_iou_threshold if iou_threshold is None else iou_threshold
+        self.max_distance = settings.tracking_max_distance if max_distance is None else max_distance
+        self.max_age = settings.tracking_max_age if max_age is None else max_age
         self.next_id = 0
         self.tracked_objects: Dict[int, TrackedObject] = {}
     
-    def track(self, detections: List[Detection]) -> List[TrackedObject]:
-        """Simple tracking implementation."""
+    def track(self, detections: List[Detection], timestamp: Optional[datetime] = None) -> List[TrackedObject]:
+        """Continue the best-overlapping track of the same class, or start a new one."""
+        track_ids = list(self.tracked_objects)
+        matches = self._match(track_ids, detections)
+        now = timestamp or datetime.utcnow()
         tracked = []
         
-        for detection in detections:
-            tracked_obj = TrackedObject(
-                id=f"simple_{self.next_id}",
-                track_id=self.next_id,
-                detection=detection,
-                status=TrackingStatus.ACTIVE,
-                first_seen=datetime.now(),
-                last_seen=datetime.now(),
-                total_detections=1,
-                duration=0.0,
-                is_active=True
-            )
-            
-            self.tracked_objects[self.next_id] = tracked_obj
+        for index, detection in enumerate(detections):
+            track_id = matches.get(index)
+            if track_id is not None:
+                tracked_obj = self.tracked_objects[track_id]
+                tracked_obj.detection = detection
+                tracked_obj.last_seen = now
+                tracked_obj.total_detections += 1
+                tracked_obj.duration = (now - tracked_obj.first_seen).total_seconds()
+            else:
+                track_id = self.next_id
+                self.next_id += 1
+                tracked_obj = TrackedObject(
+                    id=f"simple_{track_id}",
+                    track_id=track_id,
+                    detection=detection,
+                    status=TrackingStatus.ACTIVE,
+                    first_seen=now,
+                    last_seen=now,
+                    total_detections=1,
+                    duration=0.0,
+                    is_active=True
+                )
+                self.tracked_objects[track_id] = tracked_obj
             tracked.append(tracked_obj)
-            self.next_id += 1
         
-        logger.debug("Simple tracking completed", tracked_count=len(tracked))
+        # Tracks survive missed detections for a while in video time, so a flicker does not split them
+        expired_before = now - timedelta(seconds=self.max_age)
+        for track_id in track_ids:
+            if self.tracked_objects[track_id].last_seen < expired_before:
+                del self.tracked_objects[track_id]
+        
+        logger.debug("Simple tracking completed", tracked_count=len(tracked), tracks=len(self.tracked_objects))
         return tracked
     
+    def _match(self, track_ids: List[int], detections: List[Detection]) -> Dict[int, int]:
+        """Detection index -> track id, highest overlap first."""
+        if not track_ids or not detections:
+            return {}
+        
+        track_boxes = np.array([self._box(self.tracked_objects[track_id].detection) for track_id in track_ids])
+        detection_boxes = np.array([self._box(detection) for detection in detections])
+        # Tracks never change class
+        track_classes = np.array([self.tracked_objects[track_id].detection.class_name for track_id in track_ids])
+        detection_classes = np.array([detection.class_name for detection in detections])
+        other_class = track_classes[:, None] != detection_classes[None, :]
+        
+        iou = box_iou(track_boxes, detection_boxes)
+        iou[other_class] = 0.0
+        
+        # Boxes that stopped overlapping (fast movement, missed detections) fall back to centroid
+        # distance, measured in diagonals of the track's box
+        track_centers = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        detection_centers = (detection_boxes[:, :2] + detection_boxes[:, 2:]) / 2
+        diagonals = np.maximum(np.hypot(*(track_boxes[:, 2:] - track_boxes[:, :2]).T), 1.0)
+        distance = np.linalg.norm(track_centers[:, None, :] - detection_centers[None, :, :], axis=2) / diagonals[:, None]
+        distance[other_class] = np.inf
+        
+        matches: Dict[int, int] = {}
+        used_tracks = set()
+        for costs, limit in ((-iou, -self.iou_threshold), (distance, self.max_distance)):
+            for flat_index in np.argsort(costs, axis=None):
+                track_index, detection_index = np.unravel_index(flat_index, costs.shape)
+                if costs[track_index, detection_index] > limit:
+                    break
+                if track_index in used_tracks or detection_index in matches:
+                    continue
+                used_tracks.add(track_index)
+                matches[int(detection_index)] = track_ids[track_index]
+        return matches
+    
+    @staticmethod
+    def _box(detection: Detection) -> List[float]:
+        bbox = detection.bbox
+        return [bbox.x1, bbox.y1, bbox.x2, bbox.y2]
+    
     def reset(self) -> None:
         """Reset tracking state."""
         self.next_id = 0
         self.tracked_objects.clear()
         logger.info("Simple tracking reset")
+    
+    def get_state(self) -> Dict[str, Any]:
+        """Open tracks and the next id, so a resume continues the same tracks."""
+        return {
+            "next_id": self.next_id,
+            "tracks": [tracked_obj.model_dump(mode="json") for tracked_obj in self.tracked_objects.values()]
+        }
+    
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the open tracks and the next track id."""
+        self.next_id = state.get("next_id", 0)
+        self.tracked_objects.clear()
+        for data in state.get("tracks", []):
+            tracked_obj = TrackedObject.model_validate(data)
+            self.tracked_objects[tracked_obj.track_id] = tracked_obj
 
 
 class DeepSORTTrackingStrategy(TrackingStrategy):
@@ -77,11 +175,12 @@ class DeepSORTTrackingStrategy(TrackingStrategy):
             self.tracker = None
             self.tracked_objects: Dict[int, TrackedObject] = {}
     
-    def track(self, detections: List[Detection]) -> List[TrackedObject]:
+    def track(self, detections: List[Detection], timestamp: Optional[datetime] = None) -> List[TrackedObject]:
         """Track objects using DeepSORT."""
+        now = timestamp or datetime.utcnow()
         if not self.tracker:
             # Fallback to simple tracking
-            return self._simple_track(detections)
+            return self._simple_track(detections, now)
         
         try:
             # Convert detections to DeepSORT format
@@ -127,7 +226,7 @@ class DeepSORTTrackingStrategy(TrackingStrategy):
                 if track_id in self.tracked_objects:
                     tracked_obj = self.tracked_objects[track_id]
                     tracked_obj.detection = detection
-                    tracked_obj.last_seen = datetime.now()
+                    tracked_obj.last_seen = now
                     tracked_obj.total_detections += 1
                     tracked_obj.duration = (tracked_obj.last_seen - tracked_obj.first_seen).total_seconds()
                 else:
@@ -136,8 +235,8 @@ class DeepSORTTrackingStrategy(TrackingStrategy):
                         track_id=track_id,
                         detection=detection,
                         status=TrackingStatus.ACTIVE,
-                        first_seen=datetime.now(),
-                        last_seen=datetime.now(),
+                        first_seen=now,
+                        last_seen=now,
                         total_detections=1,
                         duration=0.0,
                         is_active=True
@@ -151,9 +250,9 @@ class DeepSORTTrackingStrategy(TrackingStrategy):
             
         except Exception as e:
             logger.error("DeepSORT tracking failed", error=str(e))
-            return self._simple_track(detections)
+            return self._simple_track(detections, now)
     
-    def _simple_track(self, detections: List[Detection]) -> List[TrackedObject]:
+    def _simple_track(self, detections: List[Detection], now: datetime) -> List[TrackedObject]:
         """Fallback simple tracking."""
         tracked = []
         for i, detection in enumerate(detections):
@@ -162,8 +261,8 @@ class DeepSORTTrackingStrategy(TrackingStrategy):
                 track_id=i,
                 detection=detection,
                 status=TrackingStatus.ACTIVE,
-                first_seen=datetime.now(),
-                last_seen=datetime.now(),
+                first_seen=now,
+                last_seen=now,
                 total_detections=1,
                 duration=0.0,
                 is_active=True
@@ -198,10 +297,10 @@ class TrackingService:
         strategy = DeepSORTTrackingStrategy()
         return cls(strategy)
     
-    def track_objects(self, detections: List[Detection]) -> List[TrackedObject]:
-        """Track objects from detections."""
+    def track_objects(self, detections: List[Detection], timestamp: Optional[datetime] = None) -> List[TrackedObject]:
+        """Track objects from detections; timestamp is the frame's time in the video (wall clock if not given)."""
         try:
-            tracked = self.strategy.track(detections)
+            tracked = self.strategy.track(detections, timestamp)
             self.total_tracked += len(tracked)
             
             logger.debug("Object tracking completed", tracked_count=len(tracked))
@@ -218,6 +317,22 @@ class TrackingService:
             "strategy": self.strategy.__class__.__name__
         }
     
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable state for a checkpoint."""
+        return {
+            "strategy": self.strategy.__class__.__name__,
+            "total_tracked": self.total_tracked,
+            "tracker": self.strategy.get_state()
+        }
+    
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state saved by get_state; tracker state of another strategy is ignored."""
+        self.total_tracked = state["total_tracked"]
+        if state["strategy"] == self.strategy.__class__.__name__:
+            self.strategy.load_state(state["tracker"])
+        else:
+            logger.warning("Checkpoint of another tracking strategy, starting new tracks", strategy=state["strategy"])
+    
     def reset(self) -> None:
         """Reset tracking state."""
         self.strategy.reset()
@@ -1,6 +1,7 @@
-import cv2
 from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
 from typing import Generator, Optional, Tuple
+import numpy as np
 import structlog
 from app.core.config import settings
 from app.models.schemas import VideoSourceType
@@ -12,7 +13,7 @@ class VideoSource(ABC):
     """Abstract base class for video sources."""
     
     @abstractmethod
-    def get_frames(self) -> Generator[Tuple[bool, cv2.Mat], None, None]:
+    def get_frames(self) -> Generator[Tuple[bool, np.ndarray], None, None]:
         """Get video frames generator."""
         pass
     
@@ -25,12 +26,21 @@ class VideoSource(ABC):
     def is_opened(self) -> bool:
         """Check if video source is opened."""
         pass
+    
+    def seek(self, frame_index: int) -> bool:
+        """Position the source so that frame_index is read next; live sources cannot seek and return False."""
+        return False
+    
+    def frame_offset(self, frame_index: int) -> Optional[float]:
+        """Seconds from the start of the video to a frame; None for live sources, whose frames happen now."""
+        return None
 
 
 class WebcamVideoSource(VideoSource):
     """Webcam video source."""
     
     def __init__(self, device_id: int = 0):
+        import cv2  # imported on first use; API-only processes never load OpenCV
         self.device_id = device_id
         self.cap = cv2.VideoCapture(device_id)
         
@@ -39,7 +49,7 @@ class WebcamVideoSource(VideoSource):
         
         logger.info("Webcam source initialized", device_id=device_id)
     
-    def get_frames(self) -> Generator[Tuple[bool, cv2.Mat], None, None]:
+    def get_frames(self) -> Generator[Tuple[bool, np.ndarray], None, None]:
         """Get webcam frames."""
         while True:
             ret, frame = self.cap.read()
@@ -63,6 +73,7 @@ class RTSPVideoSource(VideoSource):
     """RTSP video source."""
     
     def __init__(self, rtsp_url: str):
+        import cv2
         self.rtsp_url = rtsp_url
         self.cap = cv2.VideoCapture(rtsp_url)
         
@@ -71,7 +82,7 @@ class RTSPVideoSource(VideoSource):
         
         logger.info("RTSP source initialized", url=rtsp_url)
     
-    def get_frames(self) -> Generator[Tuple[bool, cv2.Mat], None, None]:
+    def get_frames(self) -> Generator[Tuple[bool, np.ndarray], None, None]:
         """Get RTSP frames."""
         while True:
             ret, frame = self.cap.read()
@@ -95,6 +106,7 @@ class FileVideoSource(VideoSource):
     """Video file source."""
     
     def __init__(self, file_path: str):
+        import cv2
         self.file_path = file_path
         self.cap = cv2.VideoCapture(file_path)
         
@@ -106,8 +118,37 @@ class FileVideoSource(VideoSource):
         self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
         logger.info("File source initialized", file_path=file_path, fps=self.fps, frame_count=self.frame_count)
+        if not self.fps or self.fps <= 0:
+            logger.warning("Video file has no frame rate, frames get wall-clock timestamps", file_path=file_path)
+    
+    def frame_offset(self, frame_index: int) -> Optional[float]:
+        """Position of a frame in the file, from its frame rate."""
+        if not self.fps or self.fps <= 0:
+            return None
+        return frame_index / self.fps
     
-    def get_frames(self) -> Generator[Tuple[bool, cv2.Mat], None, None]:
+    def seek(self, frame_index: int) -> bool:
+        """Position the file at frame_index, decoding forward if the container cannot seek exactly."""
+        import cv2
+        if frame_index <= 0:
+            return True
+        
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if position != frame_index:
+            # Some containers only seek to keyframes: reopen and skip frames without decoding them
+            logger.warning("Inexact seek, skipping frames instead", file_path=self.file_path, frame_index=frame_index, position=position)
+            self.cap.release()
+            self.cap = cv2.VideoCapture(self.file_path)
+            for position in range(frame_index):
+                if not self.cap.grab():
+                    logger.warning("Video file ended before the seek position", file_path=self.file_path, frame_index=frame_index, frames=position)
+                    return False
+        
+        logger.info("Video file positioned", file_path=self.file_path, frame_index=frame_index)
+        return True
+    
+    def get_frames(self) -> Generator[Tuple[bool, np.ndarray], None, None]:
         """Get video file frames."""
         while True:
             ret, frame = self.cap.read()
@@ -186,12 +227,26 @@ class VideoService:
         video_source = VideoSourceFactory.create(source_type, source_path)
         return cls(video_source)
     
-    def get_frames(self) -> Generator[Tuple[bool, cv2.Mat], None, None]:
+    def get_frames(self) -> Generator[Tuple[bool, np.ndarray], None, None]:
         """Get video frames with frame counting."""
         for ret, frame in self.source.get_frames():
             self.frame_count += 1
             yield ret, frame
     
+    def seek(self, frame_index: int) -> bool:
+        """Continue from frame_index; False if the source cannot seek."""
+        if not self.source.seek(frame_index):
+            return False
+        self.frame_count = frame_index
+        return True
+    
+    def frame_timestamp(self, frame_index: int, video_start: datetime) -> datetime:
+        """Time of a zero-based frame: video_start plus its position for files, wall-clock time for live sources."""
+        offset = self.source.frame_offset(frame_index)
+        if offset is None:
+            return datetime.utcnow()
+        return video_start + timedelta(seconds=offset)
+    
     def release(self) -> None:
         """Release video source."""
         self.source.release()
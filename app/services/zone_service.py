@@ -0,0 +1,232 @@
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import numpy as np
+import structlog
+from app.core.config import settings
+from app.core.utils import epoch_bucket, bucket_start_time
+from app.models.schemas import ZoneDefinition, LineDefinition, TrackedObject
+
+logger = structlog.get_logger()
+
+
+def points_in_polygon(xs: np.ndarray, ys: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Vectorized even-odd ray casting test for many points against one polygon."""
+    inside = np.zeros(xs.shape, dtype=bool)
+    x_prev, y_prev = polygon[-1]
+
+    for x_cur, y_cur in polygon:
+        crosses = (y_cur > ys) != (y_prev > ys)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at_y = (x_prev - x_cur) * (ys - y_cur) / (y_prev - y_cur) + x_cur
+        inside ^= crosses & (xs < x_at_y)
+        x_prev, y_prev = x_cur, y_cur
+
+    return inside
+
+
+def segment_crossings(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    line_start: np.ndarray,
+    line_end: np.ndarray
+) -> np.ndarray:
+    """Crossing direction of movement segments over a directed line.
+
+    Returns +1 for segments crossing from the right of the line (looking from
+    start to end) to its left, -1 for the opposite direction and 0 otherwise.
+    """
+    direction = line_end - line_start
+    movement = ends - starts
+
+    side_before = direction[0] * (starts[:, 1] - line_start[1]) - direction[1] * (starts[:, 0] - line_start[0])
+    side_after = direction[0] * (ends[:, 1] - line_start[1]) - direction[1] * (ends[:, 0] - line_start[0])
+    line_start_side = movement[:, 0] * (line_start[1] - starts[:, 1]) - movement[:, 1] * (line_start[0] - starts[:, 0])
+    line_end_side = movement[:, 0] * (line_end[1] - starts[:, 1]) - movement[:, 1] * (line_end[0] - starts[:, 0])
+
+    # Half-open sides (a point exactly on the line counts as the left side), so a
+    # track stepping onto the line and then off it is counted exactly once
+    crossed = ((side_before < 0) != (side_after < 0)) & (line_start_side * line_end_side <= 0)
+    return np.where(crossed, np.where(side_after >= 0, 1, -1), 0).astype(np.int8)
+
+
+class ZoneCounter:
+    """Pipeline stage counting zone occupancy and line crossings of tracked people."""
+
+    def __init__(
+        self,
+        zones: List[ZoneDefinition],
+        lines: List[LineDefinition],
+        mask_scale: float = None,
+        track_ttl_frames: int = None
+    ):
+        self.zones = zones
+        self.lines = lines
+        self.mask_scale = mask_scale or settings.zone_mask_scale
+        self.track_ttl_frames = settings.zone_track_ttl_frames if track_ttl_frames is None else track_ttl_frames
+        self.masks: Dict[str, np.ndarray] = {}
+        self.frame_size: Optional[Tuple[int, int]] = None
+        self.frame_index = 0
+        self.last_positions: Dict[int, Tuple[float, float, int]] = {}  # track id -> (x, y, frame index last seen)
+        self.current_bucket: Optional[int] = None
+        self.current: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.closed_rollups: List[Dict[str, Any]] = []
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any zones or lines are configured."""
+        return bool(self.zones or self.lines)
+
+    def set_frame_size(self, frame_width: int, frame_height: int) -> None:
+        """Rasterize zone polygons into lookup masks for the given frame size."""
+        self.frame_size = (frame_width, frame_height)
+        mask_width = max(1, int(frame_width * self.mask_scale))
+        mask_height = max(1, int(frame_height * self.mask_scale))
+
+        # Cell centers in frame coordinates
+        cell_xs = (np.arange(mask_width) + 0.5) / self.mask_scale
+        cell_ys = (np.arange(mask_height) + 0.5) / self.mask_scale
+        grid_xs, grid_ys = np.meshgrid(cell_xs, cell_ys)
+
+        for zone in self.zones:
+            polygon = np.asarray(zone.polygon, dtype=np.float64)
+            self.masks[zone.name] = points_in_polygon(grid_xs, grid_ys, polygon)
+
+        logger.info("Zone masks rasterized", zones=len(self.masks), mask_width=mask_width, mask_height=mask_height)
+
+    def process(self, tracked_objects: List[TrackedObject], timestamp: datetime) -> Dict[str, Any]:
+        """Count people per zone and line crossings for one frame."""
+        people = [obj for obj in tracked_objects if obj.detection.class_name == "person"]
+        bucket_index = epoch_bucket(timestamp, 60)
+        self.frame_index += 1
+
+        if self.current_bucket is not None and bucket_index > self.current_bucket:
+            self._close_bucket()
+        if self.current_bucket is None:
+            self.current_bucket = bucket_index
+
+        if people:
+            centroids = np.array([obj.detection.bbox.center for obj in people], dtype=np.float64)
+        else:
+            centroids = np.empty((0, 2), dtype=np.float64)
+
+        occupancy = self._count_occupancy(centroids)
+        crossings = self._count_crossings(people, centroids)
+
+        for name, count in occupancy.items():
+            counters = self._counters("zone", name)
+            counters["frames"] += 1
+            counters["occupancy_sum"] += count
+            counters["occupancy_max"] = max(counters["occupancy_max"], count)
+
+        for name, (in_count, out_count) in crossings.items():
+            counters = self._counters("line", name)
+            counters["frames"] += 1
+            counters["in_count"] += in_count
+            counters["out_count"] += out_count
+
+        return {"occupancy": occupancy, "crossings": crossings}
+
+    def finalize(self) -> None:
+        """Close the open minute."""
+        if self.current_bucket is not None:
+            self._close_bucket()
+
+    def pop_rollups(self) -> List[Dict[str, Any]]:
+        """Return zone rollups closed since the last call."""
+        rollups, self.closed_rollups = self.closed_rollups, []
+        return rollups
+
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable state for a checkpoint; closed minutes must have been popped."""
+        return {
+            "frame_index": self.frame_index,
+            "last_positions": [[track_id, x, y, seen] for track_id, (x, y, seen) in self.last_positions.items()],
+            "current_bucket": self.current_bucket,
+            "current": [[kind, name, counters] for (kind, name), counters in self.current.items()]
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state saved by get_state."""
+        self.frame_index = state.get("frame_index", 0)
+        self.last_positions = {track_id: (x, y, seen) for track_id, x, y, seen in state["last_positions"]}
+        self.current_bucket = state["current_bucket"]
+        self.current = {(kind, name): dict(counters) for kind, name, counters in state["current"]}
+
+    def _count_occupancy(self, centroids: np.ndarray) -> Dict[str, int]:
+        """O(1) mask lookup per centroid."""
+        if not self.masks:
+            return {}
+
+        if not len(centroids):
+            return {name: 0 for name in self.masks}
+
+        any_mask = next(iter(self.masks.values()))
+        mask_height, mask_width = any_mask.shape
+        ix = (centroids[:, 0] * self.mask_scale).astype(np.int64)
+        iy = (centroids[:, 1] * self.mask_scale).astype(np.int64)
+        in_frame = (ix >= 0) & (ix < mask_width) & (iy >= 0) & (iy < mask_height)
+        ix, iy = ix[in_frame], iy[in_frame]
+
+        return {name: int(mask[iy, ix].sum()) for name, mask in self.masks.items()}
+
+    def _count_crossings(self, people: List[TrackedObject], centroids: np.ndarray) -> Dict[str, Tuple[int, int]]:
+        """Segment-intersection test of each track's last step against every line."""
+        previous = [self.last_positions.get(obj.track_id) for obj in people]
+        for obj, centroid in zip(people, centroids):
+            self.last_positions[obj.track_id] = (float(centroid[0]), float(centroid[1]), self.frame_index)
+        # A track missing for a few frames keeps its position, so a crossing during the gap still counts;
+        # positions older than the TTL are dropped, so the map never outgrows the scene
+        expired = self.frame_index - self.track_ttl_frames
+        self.last_positions = {
+            track_id: position for track_id, position in self.last_positions.items() if position[2] >= expired
+        }
+
+        if not self.lines:
+            return {}
+
+        moved = [i for i, position in enumerate(previous) if position is not None]
+        if not moved:
+            return {line.name: (0, 0) for line in self.lines}
+
+        starts = np.array([previous[i][:2] for i in moved], dtype=np.float64)
+        ends = centroids[moved]
+
+        crossings = {}
+        for line in self.lines:
+            directions = segment_crossings(
+                starts,
+                ends,
+                np.asarray(line.start, dtype=np.float64),
+                np.asarray(line.end, dtype=np.float64)
+            )
+            crossings[line.name] = (int((directions > 0).sum()), int((directions < 0).sum()))
+
+        return crossings
+
+    def _counters(self, kind: str, name: str) -> Dict[str, int]:
+        """Get counters of the open minute for a zone or line."""
+        key = (kind, name)
+        if key not in self.current:
+            self.current[key] = {
+                "frames": 0,
+                "occupancy_sum": 0,
+                "occupancy_max": 0,
+                "in_count": 0,
+                "out_count": 0
+            }
+        return self.current[key]
+
+    def _close_bucket(self) -> None:
+        """Move the open minute to the closed list."""
+        minute_start = bucket_start_time(self.current_bucket, 60)
+        for (kind, name), counters in self.current.items():
+            self.closed_rollups.append({
+                "kind": kind,
+                "name": name,
+                "bucket_index": self.current_bucket,
+                "minute_start": minute_start,
+                **counters
+            })
+
+        self.current_bucket = None
+        self.current = {}
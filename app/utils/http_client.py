@@ -1,11 +1,41 @@
+import importlib.util
+import json as jsonlib
+import time
 import httpx
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Optional, Union, AsyncIterator
 from urllib.parse import urljoin
 import structlog
 from app.core.config import settings
+from app.core.metrics import (
+    llm_http_requests_in_flight,
+    llm_http_request_duration_seconds,
+    llm_http_pool_connections
+)
 
 logger = structlog.get_logger()
 
+# HTTP/2 needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def default_timeout() -> httpx.Timeout:
+    """Connect/read/write/pool timeouts for LLM calls."""
+    return httpx.Timeout(
+        connect=settings.llm_connect_timeout,
+        read=settings.llm_read_timeout,
+        write=settings.llm_write_timeout,
+        pool=settings.llm_pool_timeout
+    )
+
+
+def default_limits() -> httpx.Limits:
+    """Keep-alive pool limits for LLM calls."""
+    return httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive_connections,
+        keepalive_expiry=settings.llm_keepalive_expiry
+    )
+
 
 class BaseHTTPClient:
     """Base HTTP client with common functionality."""
@@ -13,20 +43,89 @@ class BaseHTTPClient:
     def __init__(
         self,
         base_url: str,
-        timeout: int = 30,
-        headers: Optional[Dict[str, str]] = None
+        timeout: Optional[Union[float, httpx.Timeout]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        limits: Optional[httpx.Limits] = None,
+        http2: Optional[bool] = None
     ):
         self.base_url = base_url.rstrip('/')
-        self.timeout = timeout
+        self.timeout = timeout or default_timeout()
         self.default_headers = headers or {}
+        self.http2 = (settings.llm_http2 if http2 is None else http2) and HTTP2_AVAILABLE
+        self.name = self.__class__.__name__
         
-        # Create httpx client with default configuration
+        # One pooled client per instance; connections are reused across requests
         self.client = httpx.AsyncClient(
             base_url=self.base_url,
-            timeout=timeout,
-            headers=self.default_headers
+            timeout=self.timeout,
+            headers=self.default_headers,
+            limits=limits or default_limits(),
+            http2=self.http2
         )
     
+    def pool_stats(self) -> Dict[str, int]:
+        """Number of active and idle connections in the pool."""
+        # httpx does not expose its pool, so read it from the httpcore transport when present
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"active": len(connections) - idle, "idle": idle}
+    
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, recording latency, in-flight and pool metrics."""
+        status = "error"
+        started = time.perf_counter()
+        llm_http_requests_in_flight.labels(client=self.name).inc()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            llm_http_requests_in_flight.labels(client=self.name).dec()
+            llm_http_request_duration_seconds.labels(
+                client=self.name,
+                method=method,
+                status=status
+            ).observe(time.perf_counter() - started)
+            for state, count in self.pool_stats().items():
+                llm_http_pool_connections.labels(client=self.name, state=state).set(count)
+    
+    async def stream_lines(
+        self,
+        method: str,
+        endpoint: str,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """Send a request and yield the response body line by line as it arrives."""
+        url = urljoin(self.base_url, endpoint.lstrip('/'))
+        request_headers = self._get_headers(headers)
+        
+        logger.debug("Making streaming request", method=method, url=url)
+        
+        status = "error"
+        started = time.perf_counter()
+        llm_http_requests_in_flight.labels(client=self.name).inc()
+        try:
+            async with self.client.stream(method, url, json=json, headers=request_headers) as response:
+                status = str(response.status_code)
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield line
+        except httpx.RequestError as e:
+            logger.error("Streaming request failed", url=url, error=str(e))
+            raise
+        finally:
+            llm_http_requests_in_flight.labels(client=self.name).dec()
+            llm_http_request_duration_seconds.labels(
+                client=self.name,
+                method=method,
+                status=status
+            ).observe(time.perf_counter() - started)
+    
     def _get_headers(self, extra_headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """Get headers with extra headers merged in."""
         headers = self.default_headers.copy()
@@ -47,7 +146,8 @@ class BaseHTTPClient:
         logger.debug("Making GET request", url=url, params=params)
         
         try:
-            response = await self.client.get(
+            response = await self._send(
+                "GET",
                 url,
                 params=params,
                 headers=request_headers
@@ -72,7 +172,8 @@ class BaseHTTPClient:
         logger.debug("Making POST request", url=url, data=data, json=json)
         
         try:
-            response = await self.client.post(
+            response = await self._send(
+                "POST",
                 url,
                 data=data,
                 json=json,
@@ -98,7 +199,8 @@ class BaseHTTPClient:
         logger.debug("Making PUT request", url=url, data=data, json=json)
         
         try:
-            response = await self.client.put(
+            response = await self._send(
+                "PUT",
                 url,
                 data=data,
                 json=json,
@@ -122,7 +224,7 @@ class BaseHTTPClient:
         logger.debug("Making DELETE request", url=url)
         
         try:
-            response = await self.client.delete(url, headers=request_headers)
+            response = await self._send("DELETE", url, headers=request_headers)
             logger.debug("DELETE response", status_code=response.status_code, url=url)
             return response
         except httpx.RequestError as e:
@@ -176,6 +278,29 @@ class OllamaHTTPClient(BaseHTTPClient):
         response.raise_for_status()
         return response.json()
     
+    async def generate_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Generate text using Ollama, yielding tokens from its ndjson stream."""
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": True,
+            **kwargs
+        }
+        
+        async for line in self.stream_lines("POST", "/api/generate", json=payload):
+            chunk = jsonlib.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                break
+    
     async def chat(
         self,
         messages: list,
@@ -233,6 +358,33 @@ class OpenAIHTTPClient(BaseHTTPClient):
         response.raise_for_status()
         return response.json()
     
+    async def chat_completion_stream(
+        self,
+        messages: list,
+        model: str = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Create chat completion, yielding content deltas from the SSE stream."""
+        payload = {
+            "model": model or settings.openai_model,
+            "messages": messages,
+            "stream": True,
+            **kwargs
+        }
+        
+        async for line in self.stream_lines("POST", "/chat/completions", json=payload):
+            if not line.startswith("data:"):
+                continue
+            
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            
+            choices = jsonlib.loads(data).get("choices") or [{}]
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+    
     async def completion(
         self,
         prompt: str,
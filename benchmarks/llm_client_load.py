@@ -0,0 +1,95 @@
+"""Load test: a new LLM client per request vs one pooled client per process.
+
+Usage:
+    python -m benchmarks.llm_client_load --requests 2000 --concurrency 50 --latency-ms 20
+
+Runs against a local stub Ollama server, so no model is needed.
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import structlog
+
+from benchmarks.stub_ollama import StubOllamaServer
+from app.utils.http_client import OllamaHTTPClient
+
+
+def summarize(samples: List[float], elapsed: float) -> Dict[str, float]:
+    """Latency percentiles in milliseconds and throughput."""
+    samples = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 2)
+
+    return {
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "rps": round(len(samples) / elapsed, 1)
+    }
+
+
+async def run(get_client: Callable[[], OllamaHTTPClient], requests: int, concurrency: int) -> Dict[str, float]:
+    """Fire requests with bounded concurrency and collect latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            client = get_client()
+            await client.generate(prompt="benchmark", model="stub")
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return summarize(samples, time.perf_counter() - started)
+
+
+async def main(requests: int, concurrency: int, latency_ms: float) -> None:
+    server = StubOllamaServer(latency_ms=latency_ms)
+    await server.start()
+
+    # Old behaviour: every request builds a client (and pool) that is never closed
+    leaked: List[OllamaHTTPClient] = []
+
+    def new_client() -> OllamaHTTPClient:
+        client = OllamaHTTPClient(server.base_url, "stub")
+        leaked.append(client)
+        return client
+
+    connections_before = server.connections
+    per_request = await run(new_client, requests, concurrency)
+    per_request["connections"] = server.connections - connections_before
+
+    shared = OllamaHTTPClient(server.base_url, "stub")
+    connections_before = server.connections
+    pooled = await run(lambda: shared, requests, concurrency)
+    pooled["connections"] = server.connections - connections_before
+    pooled["pool"] = shared.pool_stats()
+
+    print(f"per-request client: {per_request}")
+    print(f"shared client:      {pooled}")
+
+    await shared.close()
+    for client in leaked:
+        await client.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    # Per-request debug logging would dominate the measurement
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    asyncio.run(main(args.requests, args.concurrency, args.latency_ms))
@@ -0,0 +1,72 @@
+"""Time-to-first-byte of a report: blocking generate vs ndjson streaming.
+
+Usage:
+    python -m benchmarks.llm_streaming_ttfb --requests 20 --token-delay-ms 10
+
+Runs against a local stub Ollama server that emits one token per delay.
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Dict, List
+
+import structlog
+
+from benchmarks.stub_ollama import StubOllamaServer
+from app.utils.http_client import OllamaHTTPClient
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Median and max in milliseconds."""
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1)
+    }
+
+
+async def main(requests: int, latency_ms: float, token_delay_ms: float) -> None:
+    server = StubOllamaServer(latency_ms=latency_ms, token_delay_ms=token_delay_ms)
+    await server.start()
+    client = OllamaHTTPClient(server.base_url, "stub")
+
+    blocking_first: List[float] = []
+    blocking_total: List[float] = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await client.generate(prompt="benchmark", model="stub")
+        # Nothing reaches the caller before the whole completion
+        blocking_first.append(time.perf_counter() - started)
+        blocking_total.append(time.perf_counter() - started)
+
+    streaming_first: List[float] = []
+    streaming_total: List[float] = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        first = None
+        async for _token in client.generate_stream(prompt="benchmark", model="stub"):
+            if first is None:
+                first = time.perf_counter() - started
+        streaming_first.append(first)
+        streaming_total.append(time.perf_counter() - started)
+
+    print(f"tokens per report: {len(server.tokens())}")
+    print(f"blocking  first byte={summarize(blocking_first)} total={summarize(blocking_total)}")
+    print(f"streaming first byte={summarize(streaming_first)} total={summarize(streaming_total)}")
+
+    await client.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--token-delay-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    # Per-request debug logging would dominate the measurement
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    asyncio.run(main(args.requests, args.latency_ms, args.token_delay_ms))
@@ -0,0 +1,205 @@
+"""End-to-end video pipeline benchmark on a synthetic video, offline against SQLite.
+
+Usage:
+    python -m benchmarks.pipeline_e2e --frames 900 --people 12 --output benchmarks/results/pipeline.json
+    python -m benchmarks.pipeline_e2e --baseline benchmarks/results/pipeline-main.json
+
+Decodes a generated MP4 with the real FileVideoSource, replaces YOLO with a detector that
+returns the ground-truth boxes, and runs tracking, zone counting, analytics and persistence
+through _process_video_analysis. Reports end-to-end and per-stage frames/sec (from the
+session's timing summary), DB rows/sec and peak RSS as JSON, so runs of different commits
+can be compared with --baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+import structlog
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def current_commit() -> str:
+    """Short hash of HEAD, or 'unknown' outside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    """Generate the video, run the pipeline once and collect the results."""
+    # Imported here: the engine reads DATABASE_URL at import time
+    from benchmarks.synthetic_video import SyntheticScene, GroundTruthDetectionStrategy
+    from app.core.redis_cache import redis_cache
+    from app.database.connection import SessionLocal, create_tables
+    from app.database.models import Detection, TrackedObject, HeatmapGrid, HeatmapTile, MinuteRollup, ZoneRollup
+    from app.models.schemas import ZoneDefinition, LineDefinition
+    from app.repositories.video_session_repository import VideoSessionRepository
+    from app.repositories.detection_repository import DetectionRepository
+    from app.routes.video import _process_video_analysis
+    from app.services.analytics_service import AnalyticsService
+    from app.services.detection_service import DetectionService
+    from app.services.tracking_service import TrackingService
+    from app.services.video_service import VideoService, FileVideoSource
+
+    scene = SyntheticScene(args.width, args.height, args.fps, args.frames, args.people, args.seed)
+    video_path = os.path.join(workdir, "synthetic.mp4")
+    started = time.perf_counter()
+    scene.write(video_path)
+    generate_seconds = time.perf_counter() - started
+
+    # Offline: cache invalidation is not part of the measurement
+    redis_cache.enabled = False
+    create_tables()
+    db = SessionLocal()
+    session_repo = VideoSessionRepository(db)
+    session_id = f"bench-{int(time.time())}"
+    session_repo.create_session(session_id=session_id, source_type="file", source_path=video_path)
+
+    zones, lines = [], []
+    if not args.no_zones:
+        zones = [ZoneDefinition(name="left", polygon=[(0, 0), (args.width / 2, 0), (args.width / 2, args.height), (0, args.height)])]
+        lines = [LineDefinition(name="middle", start=(args.width / 2, 0), end=(args.width / 2, args.height))]
+
+    started = time.perf_counter()
+    asyncio.run(_process_video_analysis(
+        session_id,
+        VideoService(FileVideoSource(video_path)),
+        DetectionService(GroundTruthDetectionStrategy(scene)),
+        TrackingService.create_simple_tracker(),
+        None,
+        AnalyticsService(session_repo, DetectionRepository(db)),
+        session_repo,
+        math.ceil(args.frames / 30) + 1,  # the pipeline stops after duration * 30 frames
+        zones,
+        lines
+    ))
+    wall_seconds = time.perf_counter() - started
+
+    session = session_repo.get(session_id)
+    if session.status != "completed":
+        raise RuntimeError(f"Pipeline finished with status {session.status}")
+    timing = json.loads(session.timing_summary)
+
+    rows = {
+        model.__tablename__: db.query(model).filter(model.session_id == session_id).count()
+        for model in (Detection, TrackedObject, HeatmapGrid, HeatmapTile, MinuteRollup, ZoneRollup)
+    }
+    rows_total = sum(rows.values())
+    flush_seconds = timing["stages"].get("db_flush", {}).get("total_seconds", 0.0)
+    db.close()
+
+    return {
+        "benchmark": "pipeline_e2e",
+        "commit": current_commit(),
+        "created_at": datetime.utcnow().isoformat(),
+        "params": {
+            "frames": args.frames,
+            "people": args.people,
+            "width": args.width,
+            "height": args.height,
+            "seed": args.seed,
+            "zones": not args.no_zones
+        },
+        "generate_seconds": round(generate_seconds, 3),
+        "end_to_end": {
+            "frames": timing["frames"],
+            "seconds": round(wall_seconds, 3),
+            "fps": round(timing["frames"] / wall_seconds, 2) if wall_seconds else 0.0
+        },
+        "stages": {
+            name: {
+                "mean_ms": stage["mean_ms"],
+                "total_seconds": stage["total_seconds"],
+                "fps": round(1000 / stage["mean_ms"], 1) if stage["mean_ms"] and name != "db_flush" else None
+            }
+            for name, stage in timing["stages"].items()
+            if stage["count"]
+        },
+        "db": {
+            "rows": rows,
+            "rows_total": rows_total,
+            "flush_seconds": flush_seconds,
+            "rows_per_second": round(rows_total / flush_seconds, 1) if flush_seconds else None
+        },
+        "rss_peak_mb": peak_rss_mb(),
+        "people": {"expected": scene.people, "counted": session.total_people}
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of the headline numbers against a previous run."""
+    def change(name: str, new, old, higher_is_better: bool) -> None:
+        if not new or not old:
+            print(f"{name:32s} {old!s:>10} -> {new!s:>10}")
+            return
+        delta = (new - old) / old * 100
+        if abs(delta) < 1:
+            verdict = "same"
+        else:
+            verdict = "better" if (delta > 0) == higher_is_better else "worse"
+        print(f"{name:32s} {old:>10} -> {new:>10} ({delta:+.1f}%, {verdict})")
+
+    print(f"baseline {baseline.get('commit')} vs {result['commit']}")
+    change("end_to_end.fps", result["end_to_end"]["fps"], baseline["end_to_end"]["fps"], True)
+    for name, stage in result["stages"].items():
+        old = baseline["stages"].get(name, {}).get("mean_ms")
+        change(f"stages.{name}.mean_ms", stage["mean_ms"], old, False)
+    change("db.rows_per_second", result["db"]["rows_per_second"], baseline["db"]["rows_per_second"], True)
+    change("rss_peak_mb", result["rss_peak_mb"], baseline["rss_peak_mb"], False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--people", type=int, default=12)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-zones", action="store_true", help="skip zone and line counting")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # Per-frame debug logging would dominate the measurement
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with tempfile.TemporaryDirectory(prefix="pipeline-bench-") as workdir:
+        # A fresh SQLite file per run; must be set before any app module is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        result = run(args, workdir)
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if baseline:
+        compare(result, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Report prompt size and generation latency: legacy verbose prompt vs the budgeted builder.
+
+Usage:
+    python -m benchmarks.prompt_budget --requests 10 --token-delay-ms 2 --prompt-token-delay-ms 1
+
+Runs against a local stub Ollama server that charges a delay per evaluated prompt
+token (a system prefix it has seen is free while keep_alive holds the model) and per
+generated token. The legacy request sent max_tokens, which Ollama ignores, so its
+output length is unbounded; the stub then returns its whole response text.
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Any, Dict, List
+
+import structlog
+
+from benchmarks.stub_ollama import StubOllamaServer
+from app.services.llm_service import OllamaProvider
+from app.services.prompt_builder import TokenEstimator
+
+SAMPLE_DATA = {
+    "total_people": 137,
+    "peak_people_count": 12,
+    "average_stay_time": 48.26,
+    "total_frames": 54000,
+    "session_duration": 1800.0,
+    "peak_hours": [9, 13, 18],
+    "heatmap_points_count": 20431
+}
+
+
+def legacy_request(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate request as sent before prompt budgeting."""
+    prompt = f"""
+You are an AI video analytics expert. Analyze the following video surveillance data and generate a comprehensive report in Russian.
+
+Data:
+- Total people detected: {data.get('total_people', 0)}
+- Peak people count: {data.get('peak_people_count', 0)}
+- Average stay time: {data.get('average_stay_time', 0):.1f} seconds
+- Total frames processed: {data.get('total_frames', 0)}
+- Session duration: {data.get('session_duration', 0):.1f} seconds
+- Peak hours: {data.get('peak_hours', [])}
+- Heatmap data points: {data.get('heatmap_points_count', 0)}
+
+Please provide:
+1. Brief overview of activity
+2. Key insights about people movement
+3. Peak activity periods
+4. Recommendations for optimization
+5. Any notable patterns or anomalies
+
+Keep the report professional and concise (2-3 paragraphs).
+"""
+    return {"prompt": prompt, "model": "stub", "options": {"temperature": 0.7, "top_p": 0.9, "max_tokens": 1000}}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Median and max in milliseconds."""
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1)
+    }
+
+
+async def run(server: StubOllamaServer, provider: OllamaProvider, request: Dict[str, Any], requests: int) -> Dict[str, Any]:
+    """Send the same generate request repeatedly and collect latencies and token counts."""
+    server.prompt_tokens = 0
+    server.generated_tokens = 0
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await provider.client.generate(**request)
+        samples.append(time.perf_counter() - started)
+    return {
+        **summarize(samples),
+        "prompt_tokens_evaluated": server.prompt_tokens // requests,
+        "generated_tokens": server.generated_tokens // requests
+    }
+
+
+async def main(requests: int, latency_ms: float, token_delay_ms: float, prompt_token_delay_ms: float) -> None:
+    server = StubOllamaServer(
+        latency_ms=latency_ms,
+        response_text="Отчет. " * 1000,
+        token_delay_ms=token_delay_ms,
+        prompt_token_delay_ms=prompt_token_delay_ms
+    )
+    await server.start()
+    provider = OllamaProvider(base_url=server.base_url, model="stub")
+    estimator = TokenEstimator("ollama")
+
+    legacy = legacy_request(SAMPLE_DATA)
+    built = provider.prompts.build_report(SAMPLE_DATA)
+    budgeted = provider._request(built, temperature=0.7, top_p=0.9)
+
+    print(f"legacy   estimated prompt tokens: {estimator.estimate(legacy['prompt'])}")
+    print(f"budgeted estimated prompt tokens: {built.prompt_tokens} (output cap {built.max_output_tokens})")
+    print(f"legacy   {await run(server, provider, legacy, requests)}")
+    print(f"budgeted {await run(server, provider, budgeted, requests)}")
+
+    await provider.client.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--token-delay-ms", type=float, default=2.0)
+    parser.add_argument("--prompt-token-delay-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Per-request debug logging would dominate the measurement
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    asyncio.run(main(args.requests, args.latency_ms, args.token_delay_ms, args.prompt_token_delay_ms))
@@ -0,0 +1,158 @@
+"""Latency benchmark: synchronous JSON cache calls vs async pipelined cache calls.
+
+Usage:
+    python -m benchmarks.redis_cache_latency --sessions 50 --iterations 200
+
+The codec comparison runs without Redis; the round-trip comparison needs a
+reachable Redis at REDIS_HOST/REDIS_PORT.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_cache import RedisCache, encode_value, decode_value
+
+
+def sample_analytics(session_id: str) -> Dict:
+    """Analytics payload shaped like /sessions/{id}/analytics."""
+    return {
+        "session_id": session_id,
+        "start_time": "2024-01-01T10:00:00",
+        "end_time": "2024-01-01T11:00:00",
+        "total_people_detected": 1234,
+        "max_people_in_frame": 17,
+        "average_people_per_frame": 4.2,
+        "total_entries": 321,
+        "total_exits": 300,
+        "peak_hours": list(range(24)),
+        "heatmap_points": [],
+        "metadata": {"heatmap_points_count": 98765},
+        "timeline": [
+            {"start_time": f"2024-01-01T10:{minute:02d}:00", "frames": 1800, "people_avg": 4.1, "people_max": 9}
+            for minute in range(60)
+        ]
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95 of samples in milliseconds."""
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3)
+    }
+
+
+def time_sync(fn: Callable[[], None], iterations: int) -> Dict[str, float]:
+    """Time a synchronous call."""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+async def time_async(fn: Callable, iterations: int) -> Dict[str, float]:
+    """Time an async call."""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def bench_codecs(iterations: int) -> None:
+    """Compare json.dumps(default=str) with the cache codec."""
+    value = sample_analytics("codec")
+    legacy = json.dumps(value, default=str)
+    encoded = encode_value(value)
+
+    print("codec")
+    print("  json      bytes=%-6d encode=%s decode=%s" % (
+        len(legacy),
+        time_sync(lambda: json.dumps(value, default=str), iterations),
+        time_sync(lambda: json.loads(legacy), iterations)
+    ))
+    print("  cache     bytes=%-6d encode=%s decode=%s" % (
+        len(encoded),
+        time_sync(lambda: encode_value(value), iterations),
+        time_sync(lambda: decode_value(encoded), iterations)
+    ))
+
+
+async def bench_round_trips(sessions: int, iterations: int) -> None:
+    """Compare per-key sync calls with pipelined async calls."""
+    session_ids = [f"bench-{i}" for i in range(sessions)]
+    keys = [f"analytics:{session_id}" for session_id in session_ids]
+    values = {key: sample_analytics(key) for key in keys}
+
+    sync_client = redis.Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        decode_responses=True
+    )
+    cache = RedisCache()
+    if not await cache.connect():
+        print("redis unavailable, skipping round-trip benchmark")
+        return
+
+    # Keep L1 out of the measurement so every call goes to Redis
+    cache.l1.max_size = 0
+
+    def sync_set_all():
+        for key, value in values.items():
+            sync_client.setex(key, 3600, json.dumps(value, default=str))
+
+    def sync_get_all():
+        for key in keys:
+            raw = sync_client.get(key)
+            if raw:
+                json.loads(raw)
+
+    def sync_clear():
+        for session_id in session_ids[:1]:
+            sync_client.delete(f"analytics:{session_id}")
+            sync_client.delete(f"heatmap:{session_id}")
+            sync_client.delete(f"stats:{session_id}")
+
+    print("round trips (%d sessions)" % sessions)
+    print("  set   sync=%s async mset=%s" % (
+        time_sync(sync_set_all, iterations),
+        await time_async(lambda: cache.mset(values), iterations)
+    ))
+    print("  get   sync=%s async mget=%s" % (
+        time_sync(sync_get_all, iterations),
+        await time_async(lambda: cache.mget(keys), iterations)
+    ))
+    print("  clear sync=%s async pipeline=%s" % (
+        time_sync(sync_clear, iterations),
+        await time_async(lambda: cache.clear_session_cache(session_ids[0]), iterations)
+    ))
+
+    sync_client.delete(*keys)
+    sync_client.close()
+    await cache.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    bench_codecs(args.iterations)
+    asyncio.run(bench_round_trips(args.sessions, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Import time and memory of the service's entry points, measured with python -X importtime.
+
+Usage:
+    python -m benchmarks.startup_time --repeat 5 --output benchmarks/results/startup.json
+    python -m benchmarks.startup_time --module main --module init_db --baseline benchmarks/results/startup-main.json
+
+Every run imports the module in a fresh interpreter and reports the cumulative import time
+of the module, the wall time of the whole process, its peak RSS, the slowest top-level
+packages and whether the CV/ML stack (torch, ultralytics, cv2) was loaded.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.pipeline_e2e import current_commit
+
+HEAVY_MODULES = ("torch", "torchvision", "ultralytics", "cv2", "deep_sort_realtime")
+
+PROBE = """
+import json, resource, sys
+import {module}
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "rss_peak_mb": round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1),
+    "heavy_modules": sorted(name for name in {heavy!r} if name in sys.modules)
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, nesting depth) of every importtime line."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def measure(module: str) -> Dict[str, Any]:
+    """Import the module once in a fresh interpreter."""
+    env = dict(os.environ)
+    # Creating the engine must not need a database server
+    env.setdefault("DATABASE_URL", "sqlite://")
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        env=env
+    )
+    wall_seconds = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+
+    entries = parse_importtime(process.stderr)
+    # Self time grouped by top-level package: which dependencies the startup is spent in
+    packages: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        packages[name.split(".")[0]] += self_us
+
+    return {
+        "import_ms": next(cumulative for name, _, cumulative, depth in reversed(entries) if name == module and depth == 0) / 1000,
+        "wall_ms": wall_seconds * 1000,
+        "modules": len(entries),
+        "packages": packages,
+        **json.loads(process.stdout.strip().splitlines()[-1])
+    }
+
+
+def run(module: str, repeat: int, top: int) -> Dict[str, Any]:
+    """Median of several imports; the first one also warms the filesystem and bytecode caches."""
+    measure(module)
+    runs = [measure(module) for _ in range(repeat)]
+    packages: Dict[str, List[int]] = defaultdict(list)
+    for result in runs:
+        for name, self_us in result["packages"].items():
+            packages[name].append(self_us)
+
+    slowest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:top]
+    return {
+        "import_ms": round(statistics.median(result["import_ms"] for result in runs), 1),
+        "wall_ms": round(statistics.median(result["wall_ms"] for result in runs), 1),
+        "rss_peak_mb": round(statistics.median(result["rss_peak_mb"] for result in runs), 1),
+        "modules": runs[-1]["modules"],
+        "heavy_modules": runs[-1]["heavy_modules"],
+        "slowest_packages_ms": {name: round(statistics.median(samples) / 1000, 1) for name, samples in slowest}
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of every module's import time and memory against a previous run."""
+    print(f"baseline {baseline.get('commit')} vs {result['commit']}")
+    for module, current in result["modules"].items():
+        old = baseline.get("modules", {}).get(module)
+        if not old:
+            continue
+        for metric in ("import_ms", "wall_ms", "rss_peak_mb"):
+            delta = (current[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(f"{module + '.' + metric:40s} {old[metric]:>10} -> {current[metric]:>10} ({delta:+.1f}%)")
+        if old["heavy_modules"] != current["heavy_modules"]:
+            print(f"{module + '.heavy_modules':40s} {old['heavy_modules']} -> {current['heavy_modules']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", action="append", help="module to import; repeatable (default: main, init_db)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    result = {
+        "benchmark": "startup_time",
+        "commit": current_commit(),
+        "created_at": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "modules": {module: run(module, args.repeat, args.top) for module in args.module or ["main", "init_db"]}
+    }
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if baseline:
+        compare(result, baseline)
+
+
+if __name__ == "__main__":
+    main()
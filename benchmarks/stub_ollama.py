@@ -0,0 +1,180 @@
+"""Minimal HTTP/1.1 keep-alive server imitating the Ollama API for benchmarks.
+
+Usage:
+    python -m benchmarks.stub_ollama --port 11435 --latency-ms 20 --token-delay-ms 0
+
+Requests with "stream": true get a chunked ndjson stream, one token per line.
+options.num_predict caps the generated tokens; prompt evaluation costs a delay per
+prompt token, except for a system prefix already seen (Ollama's prompt cache).
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Optional
+
+
+class StubOllamaServer:
+    """Answers /api/generate and /api/chat after a fixed delay plus a delay per prompt and generated token."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 20.0,
+        response_text: str = None,
+        token_delay_ms: float = 0.0,
+        prompt_token_delay_ms: float = 0.0
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.token_delay = token_delay_ms / 1000
+        self.prompt_token_delay = prompt_token_delay_ms / 1000
+        self.response_text = response_text or "Stub report. " * 20
+        self.connections = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self._cached_prefixes = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        """URL to point OLLAMA_BASE_URL at."""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        """Start listening; port 0 picks a free port."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it."""
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+
+                request = json.loads(body) if body else {}
+                await asyncio.sleep(self.prompt_token_delay * self._evaluated_tokens(request))
+                if request.get("stream") and path == "/api/generate":
+                    await self._stream(writer, request)
+                    continue
+
+                # Non-streaming callers wait for the whole generation
+                generated = len(self.tokens(request))
+                self.generated_tokens += generated
+                await asyncio.sleep(self.token_delay * generated)
+                status, payload = self._respond(method, path, request)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def tokens(self, request: dict = None):
+        """Response text split into tokens, capped by options.num_predict."""
+        tokens = [word + " " for word in self.response_text.split(" ") if word]
+        limit = ((request or {}).get("options") or {}).get("num_predict")
+        if limit is not None and limit >= 0:
+            tokens = tokens[:limit]
+        return tokens
+
+    def _evaluated_tokens(self, request: dict) -> int:
+        """Prompt tokens that need evaluating; a cached system prefix is free while the model is kept alive."""
+        system = request.get("system") or ""
+        prompt = request.get("prompt") or "".join(
+            message.get("content", "") for message in request.get("messages", [])
+        )
+        tokens = len(prompt) // 4
+        if system not in self._cached_prefixes:
+            tokens += len(system) // 4
+            if system and request.get("keep_alive") not in (None, 0, "0"):
+                self._cached_prefixes.add(system)
+        self.prompt_tokens += tokens
+        return tokens
+
+    async def _stream(self, writer: asyncio.StreamWriter, request: dict) -> None:
+        """Send the response as chunked ndjson, one token per chunk."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n"
+        )
+        chunks = [{"model": request.get("model"), "response": token, "done": False} for token in self.tokens(request)]
+        self.generated_tokens += len(chunks)
+        chunks.append({"model": request.get("model"), "response": "", "done": True})
+
+        for chunk in chunks:
+            line = json.dumps(chunk).encode() + b"\n"
+            writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            await writer.drain()
+            if not chunk["done"]:
+                await asyncio.sleep(self.token_delay)
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _respond(self, method: str, path: str, request: dict):
+        """Build an Ollama-shaped response."""
+        text = "".join(self.tokens(request)).strip()
+        if method == "POST" and path == "/api/generate":
+            return "200 OK", {"model": request.get("model"), "response": text, "done": True}
+        if method == "POST" and path == "/api/chat":
+            return "200 OK", {
+                "model": request.get("model"),
+                "message": {"role": "assistant", "content": text},
+                "done": True
+            }
+        return "404 Not Found", {"error": "not found"}
+
+
+async def serve(port: int, latency_ms: float, token_delay_ms: float, prompt_token_delay_ms: float) -> None:
+    """Run the stub until interrupted."""
+    server = StubOllamaServer(
+        port=port,
+        latency_ms=latency_ms,
+        token_delay_ms=token_delay_ms,
+        prompt_token_delay_ms=prompt_token_delay_ms
+    )
+    await server.start()
+    print(f"stub ollama listening on {server.base_url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0)
+    parser.add_argument("--prompt-token-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.latency_ms, args.token_delay_ms, args.prompt_token_delay_ms))
@@ -0,0 +1,152 @@
+"""Synthetic test videos of moving people-sized boxes with known ground-truth tracks.
+
+Usage:
+    python -m benchmarks.synthetic_video --output videos/synthetic.mp4 --frames 900 --people 12
+
+Writes the MP4 and a <name>.tracks.json file with the boxes of every frame. The same seed
+always produces the same scene, so benchmark runs on different commits see identical input.
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.models.schemas import Detection, BoundingBox
+from app.services.detection_service import DetectionStrategy
+
+# track_id, x1, y1, x2, y2
+Box = Tuple[int, float, float, float, float]
+
+
+class SyntheticScene:
+    """People entering, walking with constant velocity, bouncing off the edges and leaving."""
+
+    def __init__(
+        self,
+        width: int = 640,
+        height: int = 480,
+        fps: int = 30,
+        frames: int = 900,
+        people: int = 12,
+        seed: int = 42
+    ):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        self.people = people
+        self.seed = seed
+        self.boxes: List[List[Box]] = self._simulate()
+
+    def _simulate(self) -> List[List[Box]]:
+        """Ground-truth boxes of every frame."""
+        rng = np.random.RandomState(self.seed)
+        boxes: List[List[Box]] = [[] for _ in range(self.frames)]
+
+        for track_id in range(self.people):
+            box_width = rng.randint(30, 60)
+            box_height = int(box_width * rng.uniform(2.0, 2.8))
+            x = rng.uniform(0, self.width - box_width)
+            y = rng.uniform(0, self.height - box_height)
+            vx, vy = rng.uniform(-4, 4), rng.uniform(-3, 3)
+            enter = rng.randint(0, max(self.frames // 2, 1))
+            leave = min(self.frames, enter + rng.randint(self.fps * 3, max(self.frames, self.fps * 3 + 1)))
+
+            for frame_index in range(enter, leave):
+                x += vx
+                y += vy
+                if x < 0 or x + box_width > self.width:
+                    vx = -vx
+                    x = min(max(x, 0), self.width - box_width)
+                if y < 0 or y + box_height > self.height:
+                    vy = -vy
+                    y = min(max(y, 0), self.height - box_height)
+                boxes[frame_index].append((track_id, x, y, x + box_width, y + box_height))
+
+        return boxes
+
+    def render(self, frame_index: int) -> np.ndarray:
+        """BGR frame with one filled box (head and body) per visible person."""
+        import cv2
+
+        frame = np.full((self.height, self.width, 3), 40, dtype=np.uint8)
+        for track_id, x1, y1, x2, y2 in self.boxes[frame_index]:
+            color = (50 + track_id * 37 % 200, 80 + track_id * 53 % 170, 120 + track_id * 71 % 130)
+            head = int((x2 - x1) / 2.5)
+            cv2.rectangle(frame, (int(x1), int(y1) + head * 2), (int(x2), int(y2)), color, -1)
+            cv2.circle(frame, (int((x1 + x2) / 2), int(y1) + head), head, color, -1)
+        return frame
+
+    def tracks(self) -> Dict:
+        """Ground truth as JSON-serializable data."""
+        return {
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+            "seed": self.seed,
+            "people": self.people,
+            "frames": [
+                [[track_id, round(x1, 2), round(y1, 2), round(x2, 2), round(y2, 2)] for track_id, x1, y1, x2, y2 in boxes]
+                for boxes in self.boxes
+            ]
+        }
+
+    def write(self, path: str) -> str:
+        """Write the MP4 and its ground-truth file; returns the ground-truth path."""
+        import cv2
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (self.width, self.height))
+        if not writer.isOpened():
+            raise IOError(f"Failed to open video writer: {path}")
+        try:
+            for frame_index in range(self.frames):
+                writer.write(self.render(frame_index))
+        finally:
+            writer.release()
+
+        tracks_path = os.path.splitext(path)[0] + ".tracks.json"
+        with open(tracks_path, "w") as f:
+            json.dump(self.tracks(), f)
+        return tracks_path
+
+
+class GroundTruthDetectionStrategy(DetectionStrategy):
+    """Stub detector returning the scene's ground-truth boxes, one frame per detect() call."""
+
+    def __init__(self, scene: SyntheticScene):
+        self.scene = scene
+        self.frame_index = 0
+
+    def detect(self, frame: np.ndarray) -> List[Detection]:
+        """Boxes of the next frame."""
+        boxes = self.scene.boxes[self.frame_index] if self.frame_index < self.scene.frames else []
+        self.frame_index += 1
+        return [
+            Detection(
+                class_id=0,
+                class_name="person",
+                confidence=0.9,
+                bbox=BoundingBox(x1=x1, y1=y1, x2=x2, y2=y2)
+            )
+            for _, x1, y1, x2, y2 in boxes
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="videos/synthetic.mp4")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--people", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    scene = SyntheticScene(args.width, args.height, args.fps, args.frames, args.people, args.seed)
+    tracks_path = scene.write(args.output)
+    print(f"wrote {args.output} and {tracks_path}")
@@ -20,16 +20,22 @@ def init_database():
         print("🚀 Инициализация базы данных...")
         print(f"📊 Подключение к: {settings.database_url}")
         
-        # Создать таблицы
+        # Создать таблицы и добавить новые колонки в существующие
         create_tables()
         
-        print("✅ Таблицы созданы успешно!")
+        print("✅ Таблицы созданы и обновлены успешно!")
         print("📋 Созданные таблицы:")
         print("   - video_sessions")
         print("   - detections") 
         print("   - tracked_objects")
         print("   - heatmap_points")
+        print("   - heatmap_grids")
+        print("   - heatmap_tiles")
+        print("   - session_minute_rollups")
+        print("   - zone_minute_rollups")
         print("   - reports")
+        print("   - report_jobs")
+        print("   - pipeline_checkpoints")
         
         print("\n🎉 База данных готова к использованию!")
         
@@ -0,0 +1,7 @@
+"""HTTP load testing of the service against local stand-ins or a deployed instance.
+
+Usage:
+    python -m loadtest --scenario loadtest/scenarios/mixed.json
+    python -m loadtest --scenario loadtest/scenarios/smoke.json --baseline loadtest-main.json
+    python -m loadtest --scenario loadtest/scenarios/mixed.json --target http://staging:8000 --api-key KEY
+"""
@@ -0,0 +1,82 @@
+"""Run a load-test scenario and check it against its thresholds and an optional baseline.
+
+Exits with status 1 when a threshold or the regression check fails, so it can gate CI.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+import structlog
+
+from loadtest.generator import LoadGenerator
+from loadtest.report import build_report, check_thresholds, check_regression, format_table
+from loadtest.scenario import load_scenario
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", default="loadtest/scenarios/mixed.json")
+    parser.add_argument("--target", help="base URL of a running service; default starts the local stack")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY"), help="API key for --target")
+    parser.add_argument("--rate", type=float, help="override the scenario's arrival rate (req/s)")
+    parser.add_argument("--duration", type=float, help="override the scenario's duration (s)")
+    parser.add_argument("--ollama-latency-ms", type=float, default=200.0, help="latency of the stub Ollama")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95/p99 growth vs the baseline")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    if args.rate:
+        scenario.arrival_rate = args.rate
+    if args.duration:
+        scenario.duration_seconds = args.duration
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # Request logging of the in-process server would compete with the generator for the CPU
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    logging.getLogger().setLevel(logging.WARNING)
+
+    stack = None
+    if args.target:
+        base_url, context = args.target, json.loads(os.environ.get("LOADTEST_CONTEXT", "{}"))
+        api_key = args.api_key
+    else:
+        from loadtest.standins import LocalStack
+
+        stack = LocalStack(seed_sessions=scenario.seed_sessions, ollama_latency_ms=args.ollama_latency_ms).start()
+        base_url, context, api_key = stack.base_url, stack.context, stack.api_key
+
+    try:
+        generator = LoadGenerator(base_url, scenario, context, {"X-API-KEY": api_key or ""}, args.seed)
+        samples = asyncio.run(generator.run())
+    finally:
+        if stack:
+            stack.stop()
+
+    report = build_report(scenario, samples, generator.elapsed)
+    print(format_table(report))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    violations = check_thresholds(report, scenario)
+    if baseline:
+        violations += check_regression(report, baseline, args.max_regression)
+    for violation in violations:
+        print(f"FAIL {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
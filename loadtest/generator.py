@@ -0,0 +1,101 @@
+"""Open-loop load generator: requests start on a Poisson schedule, independent of earlier responses."""
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from loadtest.scenario import Scenario, RequestSpec, fill
+
+DROPPED = "dropped"
+
+
+class Sample:
+    """Outcome of one scheduled request."""
+
+    __slots__ = ("name", "scheduled_at", "latency", "status", "error")
+
+    def __init__(self, name: str, scheduled_at: float, latency: float, status: int, error: Optional[str] = None):
+        self.name = name
+        self.scheduled_at = scheduled_at  # seconds since the start of the run
+        self.latency = latency
+        self.status = status
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status < 400
+
+
+class LoadGenerator:
+    """Drives a scenario against a base URL at a fixed arrival rate.
+
+    Open loop: a slow response does not delay the next arrival, and latency is measured from
+    the scheduled start rather than from the moment the request was sent, so a saturated
+    server shows up as growing latency instead of a silently lower request rate.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        scenario: Scenario,
+        context: Dict[str, Any] = None,
+        headers: Dict[str, str] = None,
+        seed: int = 42
+    ):
+        self.base_url = base_url
+        self.scenario = scenario
+        self.context = context or {}
+        self.headers = headers or {}
+        self.rng = random.Random(seed)
+        self.samples: List[Sample] = []
+        self.elapsed = 0.0
+
+    async def run(self) -> List[Sample]:
+        """Send requests for the scenario's duration and wait for the stragglers."""
+        scenario = self.scenario
+        limits = httpx.Limits(max_connections=scenario.max_in_flight, max_keepalive_connections=scenario.max_in_flight)
+        in_flight = set()
+
+        async with httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=scenario.timeout_seconds,
+            limits=limits
+        ) as client:
+            start = time.perf_counter()
+            offset = self.rng.expovariate(scenario.arrival_rate)
+            while offset < scenario.duration_seconds:
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                spec = scenario.pick(self.rng)
+                if len(in_flight) >= scenario.max_in_flight:
+                    self.samples.append(Sample(spec.name, offset, 0.0, 0, DROPPED))
+                else:
+                    task = asyncio.create_task(self._send(client, spec, start, offset))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                offset += self.rng.expovariate(scenario.arrival_rate)
+
+            if in_flight:
+                await asyncio.gather(*in_flight)
+            self.elapsed = time.perf_counter() - start
+
+        return self.samples
+
+    async def _send(self, client: httpx.AsyncClient, spec: RequestSpec, start: float, offset: float) -> None:
+        """One request; transport errors are recorded, not raised."""
+        path = fill(spec.path, self.context, self.rng)
+        body = fill(spec.json_body, self.context, self.rng) if spec.json_body is not None else None
+        status, error = 0, None
+        try:
+            response = await client.request(spec.method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        latency = time.perf_counter() - (start + offset)
+        self.samples.append(Sample(spec.name, offset, latency, status, error))
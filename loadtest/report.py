@@ -0,0 +1,101 @@
+"""Latency percentiles, error rates and pass/fail checks of a load-test run."""
+
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from loadtest.generator import Sample
+from loadtest.scenario import Scenario
+
+ALL = "__all__"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize_samples(samples: List[Sample]) -> Dict[str, Any]:
+    """Count, error rate and latency percentiles (ms) of a group of samples."""
+    latencies = sorted(sample.latency for sample in samples if sample.error is None)
+    errors = sum(1 for sample in samples if not sample.ok)
+    statuses: Dict[str, int] = defaultdict(int)
+    for sample in samples:
+        statuses[sample.error or str(sample.status)] += 1
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0
+    }
+
+
+def build_report(scenario: Scenario, samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    """Per-endpoint and overall results; arrivals inside the warmup window are left out."""
+    measured = [sample for sample in samples if sample.scheduled_at >= scenario.warmup_seconds]
+    by_name: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in measured:
+        by_name[sample.name].append(sample)
+
+    measured_seconds = max(elapsed - scenario.warmup_seconds, 1e-9)
+    return {
+        "scenario": scenario.name,
+        "arrival_rate": scenario.arrival_rate,
+        "duration_seconds": scenario.duration_seconds,
+        "warmup_seconds": scenario.warmup_seconds,
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(measured) / measured_seconds, 2),
+        "endpoints": {
+            ALL: summarize_samples(measured),
+            **{name: summarize_samples(group) for name, group in sorted(by_name.items())}
+        }
+    }
+
+
+def check_thresholds(report: Dict[str, Any], scenario: Scenario) -> List[str]:
+    """Violations of the scenario's absolute limits, for the whole mix and every endpoint."""
+    violations = []
+    limits = scenario.thresholds.model_dump(exclude_none=True)
+    for name, result in report["endpoints"].items():
+        for metric, limit in limits.items():
+            if result[metric] > limit:
+                violations.append(f"{name}: {metric} {result[metric]} > {limit}")
+    return violations
+
+
+def check_regression(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Endpoints whose p95/p99 grew by more than max_regression (a fraction) or whose error rate rose."""
+    violations = []
+    for name, result in report["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if not old:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if old[metric] and result[metric] > old[metric] * (1 + max_regression):
+                change = (result[metric] - old[metric]) / old[metric] * 100
+                violations.append(f"{name}: {metric} {old[metric]} -> {result[metric]} (+{change:.0f}%)")
+        # A new failure mode is a regression even at a low rate; allow half a percent of noise
+        if result["error_rate"] > old["error_rate"] + 0.005:
+            violations.append(f"{name}: error_rate {old['error_rate']} -> {result['error_rate']}")
+    return violations
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    """Human-readable summary of a report."""
+    lines = [
+        f"scenario {report['scenario']}: {report['arrival_rate']} req/s offered, "
+        f"{report['throughput_rps']} req/s measured over {report['elapsed_seconds']}s",
+        f"{'endpoint':24s} {'requests':>8s} {'errors':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}"
+    ]
+    for name, result in report["endpoints"].items():
+        lines.append(
+            f"{name:24s} {result['requests']:>8d} {result['error_rate'] * 100:>6.1f}% "
+            f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Optional
+import json
+import random
+from pydantic import BaseModel, Field
+
+
+class RequestSpec(BaseModel):
+    """One endpoint of the mix; {session_id} and {video_path} placeholders are filled per request."""
+    name: str = Field(..., min_length=1, description="Label in the report")
+    weight: float = Field(..., gt=0, description="Relative share of arrivals")
+    method: str = Field(default="GET")
+    path: str = Field(..., description="Path including query string")
+    json_body: Optional[Dict[str, Any]] = Field(default=None, alias="json")
+
+
+class Thresholds(BaseModel):
+    """Limits a run must stay within; checked on the whole mix and on every endpoint."""
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    error_rate: Optional[float] = Field(default=None, ge=0, le=1)
+
+
+class Scenario(BaseModel):
+    """Weighted endpoint mix driven at an open-loop arrival rate."""
+    name: str
+    arrival_rate: float = Field(..., gt=0, description="Requests per second, Poisson arrivals")
+    duration_seconds: float = Field(..., gt=0)
+    warmup_seconds: float = Field(default=0, ge=0, description="Arrivals in this window are not reported")
+    max_in_flight: int = Field(default=1000, gt=0, description="Arrivals beyond this are counted as dropped")
+    timeout_seconds: float = Field(default=30, gt=0)
+    seed_sessions: int = Field(default=5, ge=1, description="Completed sessions created by the local stack")
+    thresholds: Thresholds = Field(default_factory=Thresholds)
+    requests: List[RequestSpec] = Field(..., min_length=1)
+
+    def pick(self, rng: random.Random) -> RequestSpec:
+        """Random request spec by weight."""
+        return rng.choices(self.requests, weights=[spec.weight for spec in self.requests])[0]
+
+
+def load_scenario(path: str) -> Scenario:
+    """Read and validate a scenario file."""
+    with open(path) as f:
+        return Scenario(**json.load(f))
+
+
+def fill(value: Any, context: Dict[str, Any], rng: random.Random) -> Any:
+    """Replace {placeholders} in strings, recursively; list values are sampled at random."""
+    if isinstance(value, str):
+        for key, replacement in context.items():
+            placeholder = "{" + key + "}"
+            if placeholder in value:
+                replacement = rng.choice(replacement) if isinstance(replacement, list) else replacement
+                value = value.replace(placeholder, str(replacement))
+        return value
+    if isinstance(value, dict):
+        return {key: fill(item, context, rng) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, context, rng) for item in value]
+    return value
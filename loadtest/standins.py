@@ -0,0 +1,227 @@
+"""The service on a local port with SQLite, an in-process Redis and a stub Ollama in place of the real backends."""
+
+import asyncio
+import math
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+def free_port() -> int:
+    """A port nothing listens on right now."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubOllamaThread:
+    """StubOllamaServer running on its own event loop, so the stub's latency does not load the app's loop."""
+
+    def __init__(self, latency_ms: float, token_delay_ms: float):
+        self.latency_ms = latency_ms
+        self.token_delay_ms = token_delay_ms
+        self.server = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stub-ollama", daemon=True)
+
+    def start(self) -> str:
+        """Start the stub; returns its base URL."""
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise RuntimeError("Stub Ollama server did not start")
+        return self.server.base_url
+
+    def stop(self) -> None:
+        """Stop the stub and its loop."""
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.server.stop(), self._loop).result(5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+    def _run(self) -> None:
+        from benchmarks.stub_ollama import StubOllamaServer
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self.server = StubOllamaServer(latency_ms=self.latency_ms, token_delay_ms=self.token_delay_ms)
+        self._loop.run_until_complete(self.server.start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+
+class LocalStack:
+    """Starts the app under uvicorn with stand-ins for Postgres, Redis, Ollama and YOLO.
+
+    - Postgres: a SQLite file in a temporary directory
+    - Redis: fakeredis when installed, otherwise Redis is disabled and only the in-process L1 cache is used
+    - Ollama: benchmarks.stub_ollama with a configurable latency
+    - YOLO: ground-truth boxes of a synthetic video (benchmarks.synthetic_video)
+
+    The environment is set before any app module is imported, since settings and the engine are
+    created at import time. Completed sessions are seeded so read endpoints have data to serve.
+    """
+
+    def __init__(
+        self,
+        seed_sessions: int = 5,
+        video_frames: int = 300,
+        video_people: int = 8,
+        ollama_latency_ms: float = 200.0,
+        ollama_token_delay_ms: float = 0.0,
+        api_key: str = "loadtest-api-key"
+    ):
+        self.seed_sessions = seed_sessions
+        self.video_frames = video_frames
+        self.video_people = video_people
+        self.api_key = api_key
+        self.ollama = StubOllamaThread(ollama_latency_ms, ollama_token_delay_ms)
+        self.context: Dict[str, Any] = {}
+        self.base_url: Optional[str] = None
+        self.redis_backend: Optional[str] = None
+        self._workdir: Optional[tempfile.TemporaryDirectory] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "LocalStack":
+        """Configure the stand-ins, seed data and start the server."""
+        self._workdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+        workdir = self._workdir.name
+        video_path = os.path.join(workdir, "synthetic.mp4")
+
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+        os.environ["OLLAMA_BASE_URL"] = self.ollama.start()
+        os.environ["LLM_PROVIDER"] = "ollama"
+        os.environ["LLM_SECONDARY_PROVIDER"] = ""
+        os.environ["API_KEY"] = self.api_key
+        os.environ["VIDEO_SOURCE"] = "file"
+        os.environ["VIDEO_SOURCE_PATH"] = video_path
+        os.environ["DEBUG"] = "false"
+
+        from benchmarks.synthetic_video import SyntheticScene, GroundTruthDetectionStrategy
+        from app.core.config import settings
+        from app.core.redis_cache import redis_cache
+        from app.database.connection import create_tables
+        from app.routes import video as video_routes
+        from app.services.detection_service import DetectionService
+        from main import app
+
+        if settings.api_key != self.api_key:
+            raise RuntimeError("Settings were created before the load-test environment was set")
+
+        scene = SyntheticScene(frames=self.video_frames, people=self.video_people)
+        scene.write(video_path)
+
+        # YOLO would make every analyze request measure model loading; the scene's boxes stand in for it
+        app.dependency_overrides[video_routes.get_detection_service] = (
+            lambda: DetectionService(GroundTruthDetectionStrategy(scene))
+        )
+
+        # Seeding runs on its own event loop; the cache client is attached afterwards to the server's
+        redis_cache.enabled = False
+        create_tables()
+        self.context = {
+            "session_id": self._seed(video_path, scene),
+            "video_path": video_path
+        }
+        self._use_local_redis(redis_cache)
+        self._serve(app)
+        logger.info(
+            "Load-test stack started",
+            base_url=self.base_url,
+            ollama=os.environ["OLLAMA_BASE_URL"],
+            redis=self.redis_backend,
+            sessions=len(self.context["session_id"])
+        )
+        return self
+
+    def stop(self) -> None:
+        """Stop the server and the stub, and remove the temporary files."""
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(30)
+        self.ollama.stop()
+        if self._workdir:
+            self._workdir.cleanup()
+
+    def __enter__(self) -> "LocalStack":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _use_local_redis(self, redis_cache) -> None:
+        """Point the cache at fakeredis, or disable Redis when it is not installed."""
+        try:
+            from fakeredis import aioredis as fake_aioredis
+        except ImportError:
+            redis_cache.enabled = False
+            self.redis_backend = "disabled (in-process cache only)"
+            return
+
+        redis_cache.client = fake_aioredis.FakeRedis()
+        redis_cache.enabled = True
+        self.redis_backend = "fakeredis"
+
+    def _seed(self, video_path: str, scene) -> List[str]:
+        """Run the pipeline for the seeded sessions; returns their ids."""
+        from benchmarks.synthetic_video import GroundTruthDetectionStrategy
+        from app.database.connection import SessionLocal
+        from app.repositories.video_session_repository import VideoSessionRepository
+        from app.repositories.detection_repository import DetectionRepository
+        from app.routes.video import _process_video_analysis
+        from app.services.analytics_service import AnalyticsService
+        from app.services.detection_service import DetectionService
+        from app.services.tracking_service import TrackingService
+        from app.services.video_service import VideoService, FileVideoSource
+
+        session_ids = []
+        db = SessionLocal()
+        try:
+            session_repo = VideoSessionRepository(db)
+            for index in range(self.seed_sessions):
+                session_id = f"loadtest-{index}"
+                session_repo.create_session(session_id=session_id, source_type="file", source_path=video_path)
+                asyncio.run(_process_video_analysis(
+                    session_id,
+                    VideoService(FileVideoSource(video_path)),
+                    DetectionService(GroundTruthDetectionStrategy(scene)),
+                    TrackingService.create_simple_tracker(),
+                    None,
+                    AnalyticsService(session_repo, DetectionRepository(db)),
+                    session_repo,
+                    math.ceil(self.video_frames / 30) + 1,
+                    [],
+                    []
+                ))
+                session_ids.append(session_id)
+        finally:
+            db.close()
+        return session_ids
+
+    def _serve(self, app) -> None:
+        """Run uvicorn in a background thread; the load generator keeps the main thread's loop to itself."""
+        import uvicorn
+
+        port = free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+        self._server = uvicorn.Server(config)
+        # Signal handlers can only be installed in the main thread
+        self._server.install_signal_handlers = lambda: None
+        self._thread = threading.Thread(target=self._server.run, name="loadtest-server", daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Server did not start")
+            time.sleep(0.05)
+        self.base_url = f"http://127.0.0.1:{port}"
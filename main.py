@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import structlog
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from app.core.config import settings
@@ -11,11 +12,22 @@ from app.core.middleware import (
     CORSMiddleware as CustomCORSMiddleware,
     LoggingMiddleware,
     ErrorHandlingMiddleware,
-    PrometheusMetricsMiddleware
+    PrometheusMetricsMiddleware,
+    ProfilingMiddleware
 )
+from app.core.redis_cache import redis_cache
+from app.services.llm_service import LLMService
+from app.services.model_registry import model_registry
+from app.services.analysis_queue import AnalysisQueueFactory
+from app.services.analysis_worker import AnalysisWorker
+from app.services.session_control import session_registry
+from app.services.live_updates import live_broker
+from app.services.report_job_service import ReportJobQueue
 from app.database.connection import create_tables
 from app.routes.video import router as video_router
 from app.routes.reports import router as reports_router
+from app.routes.live import router as live_router
+from app.routes.admin import router as admin_router
 from app.utils.response_helper import success_response
 
 # Configure structured logging
@@ -54,10 +66,41 @@ async def lifespan(app: FastAPI):
         logger.error("Failed to create database tables", error=str(e))
         raise
 
+    await redis_cache.connect()
+    await live_broker.connect()
+
+    # Processes that analyze video can pay the model load up front; the API alone never imports torch
+    if settings.yolo_preload:
+        await asyncio.to_thread(model_registry.get, settings.yolo_model)
+
+    # One LLM service per process, so its HTTP connection pool is reused across requests
+    app.state.llm_service = LLMService()
+
+    # Report jobs share the LLM service and limit concurrent calls per provider
+    app.state.report_jobs = ReportJobQueue(app.state.llm_service)
+    await app.state.report_jobs.start()
+
+    # Video analysis runs inline, or is queued for workers (run.py --role worker, or in-process for "local")
+    app.state.analysis_queue = AnalysisQueueFactory.create(settings.analysis_mode)
+    app.state.analysis_worker = None
+    if settings.analysis_mode == "local":
+        app.state.analysis_worker = AnalysisWorker(app.state.analysis_queue)
+        await app.state.analysis_worker.start()
+
     yield
 
     # Shutdown
     logger.info("Shutting down AI Video Analytics Microservice")
+    if app.state.analysis_worker:
+        await app.state.analysis_worker.stop()
+    # Inline analyses checkpoint and are marked interrupted, so they can be resumed
+    await session_registry.drain()
+    if app.state.analysis_queue:
+        await app.state.analysis_queue.close()
+    await app.state.report_jobs.stop()
+    await app.state.llm_service.close()
+    await live_broker.close()
+    await redis_cache.close()
 
 
 # Create FastAPI application
@@ -100,6 +143,8 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 # Add middleware (order matters!)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)  # innermost, so it profiles just the endpoint
 app.add_middleware(PrometheusMetricsMiddleware)  # Prometheus metrics first
 app.add_middleware(ErrorHandlingMiddleware)
 app.add_middleware(LoggingMiddleware)
@@ -119,6 +164,9 @@ app.add_middleware(
 # Include routers
 app.include_router(video_router, prefix="/api/v1")
 app.include_router(reports_router, prefix="/api/v1")
+app.include_router(live_router, prefix="/api/v1")
+if settings.profiling_enabled:
+    app.include_router(admin_router, prefix="/api/v1")
 
 
 @app.get("/")
@@ -2,16 +2,53 @@
 """
 AI Video Analytics Microservice
 Запуск сервера с настройками по умолчанию
+
+    python run.py                  # HTTP API
+    python run.py --role worker    # обработка видео из очереди (ANALYSIS_MODE=redis)
 """
 
+import argparse
+import asyncio
 import uvicorn
 from app.core.config import settings
 
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that interrupts running analyses before it waits for open requests.
+
+    Inline analyses run as background tasks of their analyze request, so uvicorn would
+    otherwise wait for whole videos before the application shutdown even starts.
+    """
+
+    def handle_exit(self, sig, frame) -> None:
+        from app.services.session_control import session_registry
+
+        session_registry.interrupt_all()
+        super().handle_exit(sig, frame)
+
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.debug,
-        log_level=settings.log_level.lower()
-    )
+    parser = argparse.ArgumentParser(description="AI Video Analytics Microservice")
+    parser.add_argument("--role", choices=["api", "worker"], default="api")
+    args = parser.parse_args()
+
+    if args.role == "worker":
+        from app.services.analysis_worker import run_worker
+
+        asyncio.run(run_worker())
+    elif settings.debug:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            log_level=settings.log_level.lower()
+        )
+    else:
+        DrainingServer(uvicorn.Config(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            log_level=settings.log_level.lower(),
+            timeout_graceful_shutdown=int(settings.analysis_drain_timeout) + 1
+        )).run()
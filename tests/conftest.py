@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads its settings on import: point it at a throwaway SQLite database first
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+
+from app.core.redis_cache import redis_cache  # noqa: E402
+from app.database.connection import create_tables, drop_tables  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    """Empty tables for one test."""
+    create_tables()
+    yield
+    drop_tables()
+
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    """Keep the shared cache in process memory, empty for every test."""
+    monkeypatch.setattr(redis_cache, "enabled", False)
+    redis_cache.l1.clear()
+    yield
+    redis_cache.l1.clear()
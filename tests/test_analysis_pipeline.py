@@ -0,0 +1,360 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.database.connection import SessionLocal
+from app.database.models import (
+    Detection as DetectionModel,
+    HeatmapGrid,
+    HeatmapTile,
+    MinuteRollup,
+    PipelineCheckpoint,
+    TrackedObject,
+    VideoSession,
+    ZoneRollup,
+)
+from app.models.schemas import BoundingBox, Detection, LineDefinition, ZoneDefinition
+from app.repositories.bulk_writer import BulkWriter
+from app.repositories.checkpoint_repository import CheckpointRepository
+from app.repositories.detection_repository import DetectionRepository
+from app.repositories.video_session_repository import VideoSessionRepository
+from app.routes.video import _process_video_analysis
+from app.services.analysis_queue import AnalysisJob, LocalJobQueue
+from app.services.analysis_worker import AnalysisWorker
+from app.services.analytics_service import AnalyticsService
+from app.services.checkpoint_service import PipelineCheckpointer, load_checkpoint_state
+from app.services.detection_service import DetectionService, DetectionStrategy
+from app.services.heatmap_service import decode_grid
+from app.services.model_registry import model_registry
+from app.services.session_control import session_registry, CANCELLED, INTERRUPTED
+from app.services.tracking_service import TrackingService
+from app.services.video_service import VideoService, VideoSource, VideoSourceFactory
+from benchmarks.synthetic_video import SyntheticScene
+
+REQUEST = {"source_type": "file", "source_path": "video.mp4"}
+# Two seconds before a full minute, so the 90 frames close a minute bucket halfway through
+START = datetime(2024, 1, 1, 12, 0, 58, 500000)
+SCENE = SyntheticScene(frames=90, people=4)
+ZONES = [ZoneDefinition(name="left", polygon=[(0, 0), (320, 0), (320, 480), (0, 480)])]
+LINES = [LineDefinition(name="middle", start=(320, 0), end=(320, 480))]
+
+
+class SceneSource(VideoSource):
+    """Blank frames of the synthetic scene, timed and seekable like a 30 fps file."""
+
+    def __init__(self, on_frame: Optional[Callable[[int], None]] = None):
+        self.on_frame = on_frame
+        self.position = 0
+        self.frame = np.zeros((SCENE.height, SCENE.width, 3), dtype=np.uint8)
+
+    def get_frames(self):
+        while self.position < SCENE.frames:
+            if self.on_frame:
+                self.on_frame(self.position)
+            self.position += 1
+            yield True, self.frame
+
+    def seek(self, frame_index: int) -> bool:
+        self.position = frame_index
+        return True
+
+    def frame_offset(self, frame_index: int) -> Optional[float]:
+        return frame_index / SCENE.fps
+
+    def release(self) -> None:
+        pass
+
+    def is_opened(self) -> bool:
+        return True
+
+
+class SceneDetector(DetectionStrategy):
+    """Ground-truth boxes of the frame the source handed out last."""
+
+    def __init__(self, source: SceneSource):
+        self.source = source
+
+    def detect(self, frame: np.ndarray) -> List[Detection]:
+        return [
+            Detection(class_id=0, class_name="person", confidence=0.9, bbox=BoundingBox(x1=x1, y1=y1, x2=x2, y2=y2))
+            for _, x1, y1, x2, y2 in SCENE.boxes[self.source.position - 1]
+        ]
+
+
+def create_session(session_id: str, status: str = "active") -> None:
+    db = SessionLocal()
+    repo = VideoSessionRepository(db)
+    repo.create_session(session_id, "file", "video.mp4", status=status)
+    repo.update(session_id, {"start_time": START})
+    db.close()
+
+
+def run_pipeline(session_id: str, source: SceneSource, resume: bool = False) -> None:
+    """Run the pipeline on the scene with ground-truth detections."""
+    db = SessionLocal()
+    session_repo = VideoSessionRepository(db)
+    try:
+        asyncio.run(_process_video_analysis(
+            session_id,
+            VideoService(source),
+            DetectionService(SceneDetector(source)),
+            TrackingService.create_simple_tracker(),
+            None,
+            AnalyticsService(session_repo, DetectionRepository(db)),
+            session_repo,
+            zones=ZONES,
+            lines=LINES,
+            resume=resume
+        ))
+    finally:
+        db.close()
+
+
+def session_status(session_id: str) -> str:
+    db = SessionLocal()
+    status = VideoSessionRepository(db).get_status(session_id)
+    db.close()
+    return status
+
+
+def detection_frames(session_id: str) -> List[int]:
+    db = SessionLocal()
+    frames = sorted(row.frame_number for row in db.query(DetectionModel.frame_number).filter_by(session_id=session_id))
+    db.close()
+    return frames
+
+
+def get_checkpoint(session_id: str) -> Optional[PipelineCheckpoint]:
+    db = SessionLocal()
+    checkpoint = CheckpointRepository(db).get_checkpoint(session_id)
+    db.close()
+    return checkpoint
+
+
+def pipeline_output(session_id: str) -> dict:
+    """Everything the pipeline wrote for a session, without row ids."""
+    db = SessionLocal()
+    session = db.get(VideoSession, session_id)
+
+    def rows(model, *columns):
+        return sorted(tuple(getattr(row, column) for column in columns) for row in db.query(model).filter_by(session_id=session_id))
+
+    output = {
+        "session": (session.status, session.total_frames, session.total_people, session.peak_people_count,
+                    round(session.average_stay_time, 6)),
+        "detections": rows(DetectionModel, "frame_number", "timestamp", "bbox_x", "bbox_y", "bbox_width", "bbox_height"),
+        "tracked_objects": rows(TrackedObject, "track_id", "first_seen", "last_seen", "total_detections"),
+        "minute_rollups": rows(MinuteRollup, "minute_start", "frames", "detections", "people_sum", "people_max", "entries"),
+        "zone_rollups": rows(ZoneRollup, "kind", "name", "minute_start", "frames", "occupancy_sum", "in_count", "out_count"),
+        "grids": sorted(
+            (str(grid.bucket_start), grid.points_count, round(float(decode_grid(grid.data).sum()), 3))
+            for grid in db.query(HeatmapGrid).filter_by(session_id=session_id)
+        ),
+        "tiles": sorted(
+            (tile.granularity, tile.bucket_index, tile.level, tile.tile_x, tile.tile_y, round(float(decode_grid(tile.data).sum()), 3))
+            for tile in db.query(HeatmapTile).filter_by(session_id=session_id)
+        ),
+    }
+    db.close()
+    return output
+
+
+class Counter:
+    """Pipeline component with checkpointable state."""
+
+    def __init__(self, value: int = 0):
+        self.value = value
+
+    def get_state(self) -> dict:
+        return {"value": self.value}
+
+    def load_state(self, state: dict) -> None:
+        self.value = state["value"]
+
+
+def test_checkpoint_commits_buffered_rows_with_the_component_state(database):
+    create_session("s1")
+    db = SessionLocal()
+    bulk_writer = BulkWriter(db, defaults={"session_id": "s1"}, autoflush=False)
+    checkpointer = PipelineCheckpointer("s1", CheckpointRepository(db), bulk_writer, {"counter": Counter(7)}, {"duration": None})
+    bulk_writer.add(DetectionModel, {
+        "frame_number": 1, "timestamp": START, "class_name": "person", "confidence": 0.9,
+        "bbox_x": 1.0, "bbox_y": 2.0, "bbox_width": 3.0, "bbox_height": 4.0
+    })
+
+    checkpointer.save(12)
+    db.rollback()  # nothing is left uncommitted by the checkpoint
+    checkpoint = get_checkpoint("s1")
+    restored = Counter()
+    resumed = PipelineCheckpointer("s1", CheckpointRepository(db), BulkWriter(db), {"counter": restored}, {})
+
+    assert detection_frames("s1") == [1]
+    assert (checkpoint.frame_index, checkpoint.rows_written) == (12, 1)
+    assert resumed.restore(checkpoint) == 12
+    assert restored.value == 7
+    assert resumed.rows_before == 1
+    db.close()
+
+
+def test_checkpoint_of_another_layout_is_not_resumed():
+    checkpoint = PipelineCheckpoint(session_id="s1", frame_index=5, state=json.dumps({"version": 1}))
+
+    with pytest.raises(ValueError, match="Unsupported checkpoint version"):
+        load_checkpoint_state(checkpoint)
+
+
+def test_resume_after_a_crash_writes_the_same_output_without_duplicates(database, monkeypatch):
+    create_session("reference")
+    create_session("crashed")
+    run_pipeline("reference", SceneSource())
+
+    def crash(frame_index: int) -> None:
+        if frame_index == 60:
+            raise RuntimeError("worker died")
+
+    source = SceneSource(on_frame=crash)
+    # One checkpoint, after frame 41: the rows of frames 42-60 are still uncommitted when it crashes
+    monkeypatch.setattr(PipelineCheckpointer, "due", lambda self: source.position == 41)
+    run_pipeline("crashed", source)
+
+    assert session_status("crashed") == "failed"
+    assert get_checkpoint("crashed").frame_index == 41
+    assert detection_frames("crashed") == detection_frames("reference")[:len(detection_frames("crashed"))]
+    assert max(detection_frames("crashed")) == 41
+
+    run_pipeline("crashed", SceneSource(), resume=True)
+
+    assert pipeline_output("crashed") == pipeline_output("reference")
+    assert get_checkpoint("crashed") is None
+
+
+def test_cancel_keeps_the_output_up_to_where_it_stopped(database):
+    create_session("s1")
+
+    def cancel(frame_index: int) -> None:
+        if frame_index == 30:
+            session_registry.cancel("s1")
+
+    run_pipeline("s1", SceneSource(on_frame=cancel))
+
+    output = pipeline_output("s1")
+    assert session_status("s1") == CANCELLED
+    assert max(detection_frames("s1")) == 30
+    assert output["session"][1] == 30
+    assert sum(rollup[1] for rollup in output["minute_rollups"]) == 30
+    assert get_checkpoint("s1") is None
+
+
+def test_cancel_from_another_process_is_seen_through_the_session_status(database, monkeypatch):
+    monkeypatch.setattr(settings, "analysis_cancel_poll_interval", 0.0)
+    create_session("s1")
+
+    def cancel_elsewhere(frame_index: int) -> None:
+        if frame_index == 30:
+            db = SessionLocal()
+            VideoSessionRepository(db).update("s1", {"status": "cancelling"})
+            db.close()
+
+    run_pipeline("s1", SceneSource(on_frame=cancel_elsewhere))
+
+    assert session_status("s1") == CANCELLED
+    assert max(detection_frames("s1")) == 30
+
+
+def test_drain_interrupts_running_analyses_at_a_checkpoint(database):
+    create_session("s1")
+
+    async def scenario():
+        db = SessionLocal()
+        session_repo = VideoSessionRepository(db)
+        source = SceneSource()
+        task = asyncio.create_task(_process_video_analysis(
+            "s1",
+            VideoService(source),
+            DetectionService(SceneDetector(source)),
+            TrackingService.create_simple_tracker(),
+            None,
+            AnalyticsService(session_repo, DetectionRepository(db)),
+            session_repo
+        ))
+        while source.position < 10:
+            await asyncio.sleep(0)
+        drained = await session_registry.drain(timeout=5)
+        await task
+        db.close()
+        return drained
+
+    assert asyncio.run(scenario()) is True
+    checkpoint = get_checkpoint("s1")
+    assert session_status("s1") == INTERRUPTED
+    assert session_registry.running() == []
+    assert 10 <= checkpoint.frame_index < SCENE.frames
+    assert pipeline_output("s1")["session"][1] == checkpoint.frame_index
+
+
+def use_mock_detector_on_scene(monkeypatch, sources: List[SceneSource]) -> None:
+    """Worker jobs read the given sources in turn, and detect with the mock detector (no model)."""
+    remaining = iter(sources)
+    monkeypatch.setattr(VideoSourceFactory, "create", staticmethod(lambda source_type, source_path=None: next(remaining)))
+    monkeypatch.setattr(model_registry, "get", lambda model_name: None)
+
+
+def test_worker_resumes_an_interrupted_job_from_its_checkpoint(database, monkeypatch):
+    def interrupt(frame_index: int) -> None:
+        if frame_index == 40:
+            session_registry.cancel("s1", INTERRUPTED)
+
+    use_mock_detector_on_scene(monkeypatch, [SceneSource(on_frame=interrupt), SceneSource()])
+    create_session("s1", status="queued")
+    queue = LocalJobQueue()
+    worker = AnalysisWorker(queue)
+
+    async def run_next_job():
+        job = await queue.claim("worker-1", block_seconds=0.01)
+        await worker._run(job, "worker-1")
+        return job
+
+    async def scenario():
+        await queue.enqueue(AnalysisJob("s1", REQUEST))
+        await run_next_job()
+        interrupted = (session_status("s1"), get_checkpoint("s1").frame_index, detection_frames("s1"))
+        return interrupted, await run_next_job()
+
+    (status, frame_index, frames), resumed_job = asyncio.run(scenario())
+
+    assert (status, frame_index, frames) == (INTERRUPTED, 40, list(range(1, 41)))
+    assert resumed_job.attempts == 1  # an interruption does not use up an attempt
+    assert session_status("s1") == "completed"
+    assert detection_frames("s1") == list(range(1, SCENE.frames + 1))
+    assert get_checkpoint("s1") is None
+    assert queue.pending == {}
+
+
+def test_worker_resets_partial_output_of_a_job_without_checkpoint(database, monkeypatch):
+    use_mock_detector_on_scene(monkeypatch, [SceneSource()])
+    # A worker died on the job before its first checkpoint, after writing rows of the first frames
+    create_session("s1")
+    db = SessionLocal()
+    db.add_all(
+        DetectionModel(
+            id=f"stale-{frame}", session_id="s1", frame_number=frame, timestamp=START, class_name="person",
+            confidence=0.9, bbox_x=0, bbox_y=0, bbox_width=10, bbox_height=10
+        )
+        for frame in range(1, 6)
+    )
+    db.commit()
+    db.close()
+    queue = LocalJobQueue()
+    job = AnalysisJob("s1", REQUEST, job_id="1", deliveries=2)
+    queue.pending[job.job_id] = (job, 0.0, "worker-1")
+
+    asyncio.run(AnalysisWorker(queue)._run(job, "worker-1"))
+
+    assert session_status("s1") == "completed"
+    assert detection_frames("s1") == list(range(1, SCENE.frames + 1))
+    assert queue.pending == {}
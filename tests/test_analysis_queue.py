@@ -0,0 +1,92 @@
+import asyncio
+
+from app.database.connection import SessionLocal
+from app.repositories.video_session_repository import VideoSessionRepository
+from app.services.analysis_queue import AnalysisJob, LocalJobQueue
+from app.services.analysis_worker import AnalysisWorker
+
+REQUEST = {"source_type": "file", "source_path": "video.mp4"}
+
+
+def test_claimed_job_is_redelivered_after_the_visibility_timeout():
+    async def scenario():
+        queue = LocalJobQueue(visibility_timeout=0.05)
+        await queue.enqueue(AnalysisJob("s1", REQUEST))
+        first = await queue.claim("worker-1", block_seconds=0.01)
+        hidden = await queue.claim("worker-2", block_seconds=0.01)
+        await asyncio.sleep(0.06)
+        return first, hidden, await queue.claim("worker-2", block_seconds=0.01)
+
+    first, hidden, redelivered = asyncio.run(scenario())
+
+    assert first.attempts == 1
+    assert hidden is None
+    assert redelivered.job_id == first.job_id
+    assert redelivered.attempts == 2
+
+
+def test_touch_keeps_the_job_claimed():
+    async def scenario():
+        queue = LocalJobQueue(visibility_timeout=0.1)
+        await queue.enqueue(AnalysisJob("s1", REQUEST))
+        job = await queue.claim("worker-1", block_seconds=0.01)
+        for _ in range(3):
+            await asyncio.sleep(0.05)
+            await queue.touch(job, "worker-1")
+        return await queue.claim("worker-2", block_seconds=0.01)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_retry_counts_an_attempt_and_dead_letters_at_max_attempts():
+    async def scenario():
+        queue = LocalJobQueue(max_attempts=2)
+        await queue.enqueue(AnalysisJob("s1", REQUEST))
+        first = await queue.claim("worker-1", block_seconds=0.01)
+        retried = await queue.retry(first, "source unavailable")
+        second = await queue.claim("worker-1", block_seconds=0.01)
+        given_up = await queue.retry(second, "source unavailable")
+        return queue, second, retried, given_up
+
+    queue, second, retried, given_up = asyncio.run(scenario())
+
+    assert retried is True
+    assert second.attempts == 2
+    assert given_up is False
+    assert [(job.session_id, error) for job, error in queue.dead] == [("s1", "source unavailable")]
+    assert queue.pending == {} and queue.queue.empty()
+
+
+def test_release_requeues_without_counting_an_attempt():
+    async def scenario():
+        queue = LocalJobQueue()
+        await queue.enqueue(AnalysisJob("s1", REQUEST))
+        await queue.release(await queue.claim("worker-1", block_seconds=0.01))
+        return queue, await queue.claim("worker-2", block_seconds=0.01)
+
+    queue, job = asyncio.run(scenario())
+
+    assert job.attempts == 1
+    assert list(queue.pending) == [job.job_id]
+
+
+def test_one_bound_for_retries_and_redeliveries():
+    queue = LocalJobQueue(max_attempts=3)
+
+    assert [queue.attempt_allowed(attempt) for attempt in (1, 3, 4)] == [True, True, False]
+
+
+def test_worker_dead_letters_a_job_redelivered_past_max_attempts(database):
+    db = SessionLocal()
+    VideoSessionRepository(db).create_session("s1", "file", "video.mp4", status="active")
+    queue = LocalJobQueue(max_attempts=2)
+    # Two workers died on it: this is its third delivery
+    job = AnalysisJob("s1", REQUEST, job_id="1", deliveries=3)
+    queue.pending[job.job_id] = (job, 0.0, "worker-1")
+
+    asyncio.run(AnalysisWorker(queue)._run(job, "worker-1"))
+
+    assert [dead.session_id for dead, _ in queue.dead] == ["s1"]
+    assert queue.pending == {}
+    assert VideoSessionRepository(db).get_status("s1") == "failed"
+    db.close()
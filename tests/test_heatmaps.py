@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.database.connection import SessionLocal
+from app.database.models import HeatmapTile, MinuteRollup
+from app.models.schemas import BoundingBox, Detection, TrackedObject, VideoFrame
+from app.repositories.bulk_writer import BulkWriter
+from app.repositories.detection_repository import DetectionRepository
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.video_session_repository import VideoSessionRepository
+from app.services.analytics_service import AnalyticsService, MinuteRollupAccumulator
+from app.services.heatmap_service import HeatmapPyramidBuilder, HeatmapRenderer
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def point_grid(row: int, col: int, size: int = 256) -> np.ndarray:
+    grid = np.zeros((size, size), dtype=np.float32)
+    grid[row, col] = 1.0
+    return grid
+
+
+def frame(timestamp: datetime, *track_ids: int) -> VideoFrame:
+    people = [
+        TrackedObject(
+            id=f"track-{track_id}",
+            track_id=track_id,
+            detection=Detection(class_id=0, class_name="person", confidence=0.9, bbox=BoundingBox(x1=0, y1=0, x2=10, y2=10))
+        )
+        for track_id in track_ids
+    ]
+    return VideoFrame(timestamp=timestamp, frame_number=0, detections=[obj.detection for obj in people], tracked_objects=people)
+
+
+def create_session(session_id: str = "s1") -> None:
+    db = SessionLocal()
+    repo = VideoSessionRepository(db)
+    repo.create_session(session_id, "file", "video.mp4", status="completed")
+    repo.update(session_id, {"frame_width": 1280, "frame_height": 720})
+    db.close()
+
+
+def test_points_are_binned_in_frame_coordinates():
+    renderer = HeatmapRenderer(640, 480)
+
+    grid = renderer.rasterize([0, 639, 320, 320], [0, 479, 240, 240], [1, 1, 1, 2], width=64, height=48)
+
+    assert grid.shape == (48, 64)
+    assert (grid[0, 0], grid[47, 63], grid[24, 32]) == (1, 1, 3)
+    assert grid.sum() == 5
+
+
+def test_non_finite_points_are_dropped():
+    renderer = HeatmapRenderer(100, 100)
+
+    grid = renderer.rasterize([10, np.nan, 20, np.inf], [10, 10, np.nan, 10], [1, 1, 1, 1], width=10, height=10)
+
+    assert grid.sum() == 1
+    assert grid[1, 1] == 1
+
+
+def test_unknown_frame_size_keeps_the_offset_from_the_origin():
+    grid = HeatmapRenderer().rasterize([5, 9], [0, 4], [1, 1], width=10, height=5)
+
+    # The data extent (10 x 5) becomes the frame, anchored at 0 rather than at min(x)
+    assert grid[0, 5] == 1
+    assert grid[4, 9] == 1
+
+
+def test_normalizations_scale_to_one():
+    heatmap = np.array([[0, 1, 4], [2, 100, 0]], dtype=np.float32)
+
+    assert HeatmapRenderer.normalize(heatmap, "none") is heatmap
+    assert HeatmapRenderer.normalize(heatmap, "max")[1, 1] == 1
+    assert HeatmapRenderer.normalize(heatmap, "max")[0, 2] == pytest.approx(0.04)
+    assert HeatmapRenderer.normalize(heatmap, "log")[0, 2] == pytest.approx(np.log1p(4) / np.log1p(100))
+    # The outlier is clipped instead of washing out every other cell
+    clipped = HeatmapRenderer.normalize(heatmap, "percentile", percentile=50)
+    assert clipped[1, 1] == 1 and clipped[0, 2] == 1 and clipped[0, 1] == pytest.approx(1 / 3)
+    assert not HeatmapRenderer.normalize(np.zeros((2, 2)), "max").any()
+
+
+def test_unknown_normalization_is_rejected():
+    with pytest.raises(ValueError):
+        HeatmapRenderer.normalize(np.ones((2, 2)), "sqrt")
+
+
+def test_blur_spreads_a_point_without_losing_mass():
+    blurred = HeatmapRenderer.gaussian_blur(point_grid(20, 20, size=40), sigma=2.0)
+
+    assert blurred.sum() == pytest.approx(1.0, rel=1e-4)
+    assert blurred[20, 20] == blurred.max() < 1
+    assert blurred[20, 22] == pytest.approx(blurred[22, 20])
+
+
+def test_pyramid_emits_only_changed_tiles_of_each_level():
+    builder = HeatmapPyramidBuilder(256, 256, tile_size=64, granularities=["minute"])
+
+    builder.add(point_grid(10, 10), START)
+    builder.add(point_grid(10, 200), START + timedelta(seconds=30))
+    builder.finalize()
+    tiles = builder.pop_tiles()
+
+    assert builder.levels == 3
+    assert sorted((tile["level"], tile["tile_x"], tile["tile_y"]) for tile in tiles) == [
+        (0, 0, 0), (0, 3, 0), (1, 0, 0), (1, 1, 0), (2, 0, 0)
+    ]
+    assert builder.pop_tiles() == []
+
+
+def test_tile_of_a_time_range_is_the_difference_of_prefix_sums(database):
+    create_session()
+    builder = HeatmapPyramidBuilder(256, 256, tile_size=64, granularities=["minute"])
+    for minute, col in enumerate((10, 200, 10)):
+        builder.add(point_grid(10, col), START + timedelta(minutes=minute))
+    builder.finalize()
+    db = SessionLocal()
+    writer = BulkWriter(db, defaults={"session_id": "s1"})
+    writer.add_many(HeatmapTile, builder.pop_tiles())
+    writer.flush()
+    service = AnalyticsService(VideoSessionRepository(db), DetectionRepository(db))
+
+    def total(level, tile_x, start_time=None, end_time=None):
+        return service.get_heatmap_tile("s1", level, tile_x, 0, start_time=start_time, end_time=end_time)["total"]
+
+    assert total(2, 0) == 3
+    assert total(2, 0, start_time=START + timedelta(minutes=1)) == 2
+    assert total(2, 0, end_time=START + timedelta(minutes=1, seconds=59)) == 2
+    assert total(2, 0, START + timedelta(minutes=1), START + timedelta(minutes=1)) == 1
+    assert total(0, 0, start_time=START + timedelta(minutes=1)) == 1
+    assert total(0, 3, end_time=START) == 0  # the tile changed only later
+    assert service.get_heatmap_tile("s1", 2, 0, 0)["bounds"] == {"x1": 0, "y1": 0, "x2": 1280, "y2": 720}
+    assert service.get_heatmap_tile("s1", 0, 0, 0, granularity="hour") is None
+    db.close()
+
+
+def test_minutes_close_as_time_moves_on_and_count_new_tracks_only():
+    accumulator = MinuteRollupAccumulator()
+    accumulator.add_frame(frame(START, 1))
+    accumulator.add_frame(frame(START + timedelta(seconds=30), 1, 2))
+    assert accumulator.pop_rollups() == []
+
+    accumulator.add_frame(frame(START + timedelta(minutes=1), 2, 3))
+    closed = accumulator.pop_rollups()
+    accumulator.finalize()
+    last = accumulator.pop_rollups()
+
+    assert [(r["frames"], r["detections"], r["people_sum"], r["people_max"], r["entries"]) for r in closed] == [(2, 3, 3, 2, 2)]
+    assert closed[0]["minute_start"] == START
+    assert [(r["frames"], r["people_max"], r["entries"]) for r in last] == [(1, 2, 1)]
+
+
+def test_timeline_is_downsampled_from_the_minute_rollups(database):
+    create_session()
+    accumulator = MinuteRollupAccumulator()
+    for minute, track_ids in enumerate([(1,), (1, 2), (3,)]):
+        accumulator.add_frame(frame(START + timedelta(minutes=minute), *track_ids))
+    accumulator.finalize()
+    db = SessionLocal()
+    writer = BulkWriter(db, defaults={"session_id": "s1"})
+    writer.add_many(MinuteRollup, accumulator.pop_rollups())
+    writer.flush()
+
+    timeline = RollupRepository(db).get_timeline("s1", bucket_minutes=2)
+    db.close()
+
+    assert [(bucket["start_time"], bucket["frames"], bucket["people_avg"], bucket["entries"]) for bucket in timeline] == [
+        (START, 2, 1.5, 2),
+        (START + timedelta(minutes=2), 1, 1.0, 1),
+    ]
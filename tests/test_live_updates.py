@@ -0,0 +1,83 @@
+import asyncio
+
+from app.models.schemas import BoundingBox, Detection, TrackedObject
+from app.services.live_updates import LiveSubscription, LocalLiveBroker, encode_delta, end_update, frame_update
+
+
+def person(track_id: int, x1: float) -> TrackedObject:
+    detection = Detection(class_id=0, class_name="person", confidence=0.9, bbox=BoundingBox(x1=x1, y1=10, x2=x1 + 40, y2=110))
+    return TrackedObject(id=f"track-{track_id}", track_id=track_id, detection=detection)
+
+
+def test_first_message_of_a_viewer_is_a_snapshot():
+    update = frame_update(1, [person(1, 100)], {"entrance": 1})
+
+    assert encode_delta(None, update) == {**update, "t": "snapshot"}
+    assert encode_delta(end_update("completed"), update)["t"] == "snapshot"
+
+
+def test_delta_holds_only_the_changes_since_the_previous_message():
+    previous = frame_update(1, [person(1, 100), person(2, 300)], {"entrance": 2, "exit": 0})
+    update = frame_update(2, [person(1, 110), person(3, 500)], {"entrance": 2, "exit": 1})
+
+    message = encode_delta(previous, update)
+
+    assert message == {
+        "t": "delta",
+        "frame": 2,
+        "ts": update["ts"],
+        "tracks": {"1": [110, 10, 150, 110], "3": [500, 10, 540, 110]},
+        "gone": ["2"],
+        "zones": {"exit": 1},
+    }
+
+
+def test_unchanged_frame_sends_an_empty_delta():
+    previous = frame_update(1, [person(1, 100)], {"entrance": 1})
+    update = frame_update(2, [person(1, 100)], {"entrance": 1})
+
+    assert set(encode_delta(previous, update)) == {"t", "frame", "ts"}
+
+
+def test_end_update_is_sent_as_is():
+    previous = frame_update(1, [person(1, 100)], {})
+    update = end_update("cancelled")
+
+    assert encode_delta(previous, update) is update
+
+
+def test_slow_viewer_gets_the_latest_update_only():
+    subscription = LiveSubscription("s1")
+    for frame in range(1, 4):
+        subscription.put(frame_update(frame, [], {}))
+
+    assert asyncio.run(subscription.get())["frame"] == 3
+    assert subscription.dropped == 2
+
+
+def test_initial_state_does_not_replace_a_newer_update():
+    subscription = LiveSubscription("s1")
+    subscription.put(frame_update(5, [], {}))
+    subscription.put_initial(frame_update(4, [], {}))
+
+    assert asyncio.run(subscription.get())["frame"] == 5
+    assert subscription.dropped == 0
+
+
+def test_viewer_connecting_mid_analysis_starts_from_the_last_update():
+    broker = LocalLiveBroker()
+
+    async def scenario():
+        await broker.publish("s1", frame_update(7, [person(1, 100)], {}))
+        async with broker.subscribe("s1") as subscription:
+            viewers = broker.viewers("s1")
+            first = await subscription.get()
+            await broker.publish("s1", end_update("completed"))
+            return viewers, first, await subscription.get()
+
+    viewers, first, last = asyncio.run(scenario())
+
+    assert viewers == 1
+    assert first["frame"] == 7
+    assert last["status"] == "completed"
+    assert broker.viewers("s1") == 0
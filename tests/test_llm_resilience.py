@@ -0,0 +1,149 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.llm_service import FallbackText, LLMProvider, ResilientProvider, SecondaryText
+
+
+class FakeProvider(LLMProvider):
+    """Model that answers with its own name after a delay."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False):
+        self.name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_report(self, data):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        return f"report by {self.name}"
+
+    async def generate_summary(self, text):
+        return await self.generate_report(text)
+
+    async def close(self):
+        pass
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    options = {"window_seconds": 60, "min_requests": 4, "failure_rate": 0.5, "open_seconds": 0.05, "half_open_calls": 1}
+    return CircuitBreaker("test", **{**options, **kwargs})
+
+
+def test_breaker_trips_once_the_failure_rate_is_reached():
+    circuit = breaker()
+    for ok in (True, False, True):
+        circuit.record_success() if ok else circuit.record_failure()
+    assert circuit.state == CLOSED  # too few calls to judge
+
+    circuit.record_failure()
+
+    assert circuit.state == OPEN
+    assert circuit.allow_request() is False
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    circuit = breaker()
+    circuit.trip()
+    asyncio.run(asyncio.sleep(0.06))
+
+    assert circuit.allow_request() is True
+    assert circuit.state == HALF_OPEN
+    assert circuit.allow_request() is False
+
+    circuit.record_success()
+
+    assert circuit.state == CLOSED
+
+
+def test_failed_probe_opens_the_breaker_again():
+    circuit = breaker()
+    circuit.trip()
+    asyncio.run(asyncio.sleep(0.06))
+    circuit.allow_request()
+
+    circuit.record_failure()
+
+    assert circuit.state == OPEN
+    assert circuit.allow_request() is False
+
+
+def test_abandoned_probe_frees_its_slot():
+    circuit = breaker()
+    circuit.trip()
+    asyncio.run(asyncio.sleep(0.06))
+    circuit.allow_request()
+
+    circuit.release()
+
+    assert circuit.allow_request() is True
+
+
+def test_primary_answer_is_plain_text():
+    provider = ResilientProvider(FakeProvider("primary"), FakeProvider("secondary"), hedge_delay=1.0)
+
+    report = asyncio.run(provider.generate_report({}))
+
+    assert report == "report by primary"
+    assert type(report) is str
+
+
+def test_slow_primary_is_hedged_and_the_answer_names_the_secondary():
+    primary, secondary = FakeProvider("primary", delay=1.0), FakeProvider("secondary")
+    provider = ResilientProvider(primary, secondary, hedge_delay=0.01)
+
+    report = asyncio.run(provider.generate_report({}))
+
+    assert isinstance(report, SecondaryText)
+    assert (report, report.provider_name, report.identity) == ("report by secondary", "secondary", secondary.identity)
+    assert primary.cancelled == 1  # the slower call lost the race
+
+
+def test_failed_primary_falls_over_without_waiting_for_the_hedge_delay():
+    provider = ResilientProvider(FakeProvider("primary", fail=True), FakeProvider("secondary"), hedge_delay=10.0)
+
+    report = asyncio.run(asyncio.wait_for(provider.generate_report({}), timeout=1.0))
+
+    assert report == "report by secondary"
+    assert report.provider_name == "secondary"
+
+
+def test_template_report_when_every_provider_fails():
+    provider = ResilientProvider(FakeProvider("primary", fail=True), FakeProvider("secondary", fail=True), hedge_delay=0.01)
+
+    assert isinstance(asyncio.run(provider.generate_report({"total_people": 3})), FallbackText)
+
+
+def test_open_breakers_skip_the_providers():
+    primary = FakeProvider("primary")
+    provider = ResilientProvider(primary)
+    provider.breakers["primary"].trip()
+
+    report = asyncio.run(provider.generate_summary("text"))
+
+    assert isinstance(report, FallbackText)
+    assert primary.calls == 0
+
+
+def test_each_call_holds_the_limit_of_its_own_provider():
+    held = []
+
+    @asynccontextmanager
+    async def limit(provider_name):
+        held.append(provider_name)
+        yield
+
+    provider = ResilientProvider(FakeProvider("primary", delay=1.0), FakeProvider("secondary"), hedge_delay=0.01)
+
+    asyncio.run(provider.generate_report({}, limit))
+
+    assert held == ["primary", "secondary"]
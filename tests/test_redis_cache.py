@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+from app.core.redis_cache import CacheEntry, RedisCache
+
+
+def local_cache() -> RedisCache:
+    """Cache of one process with Redis unavailable."""
+    cache = RedisCache()
+    cache.enabled = False
+    return cache
+
+
+def shared_caches(count: int = 2):
+    """Caches of several processes sharing one (fake) Redis."""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    caches = []
+    for _ in range(count):
+        cache = RedisCache()
+        cache.client = fakeredis.FakeAsyncRedis(server=server)
+        caches.append(cache)
+    return caches
+
+
+def test_concurrent_misses_share_one_load():
+    cache = local_cache()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return {"rows": 3}
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(5)))
+        return results, await cache.get_or_load("key", load)
+
+    results, cached = asyncio.run(scenario())
+
+    assert len(loads) == 1
+    assert results == [{"rows": 3}] * 5
+    assert cached == {"rows": 3}
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    cache = local_cache()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database down")
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_load("key", fail) for _ in range(3)), return_exceptions=True)
+        return results, await cache.get_or_load("key", lambda: "loaded")
+
+    results, retried = asyncio.run(scenario())
+
+    assert [str(result) for result in results] == ["database down"] * 3
+    assert retried == "loaded"
+
+
+def test_entry_with_store_false_is_returned_but_not_cached():
+    cache = local_cache()
+
+    async def scenario():
+        first = await cache.get_or_load("key", lambda: CacheEntry("partial", None, store=False))
+        return first, await cache.get_or_load("key", lambda: "complete")
+
+    assert asyncio.run(scenario()) == ("partial", "complete")
+
+
+def test_bumped_session_version_makes_old_keys_unreachable():
+    cache = local_cache()
+
+    async def scenario():
+        before = await cache.session_key("analytics", "s1", 100)
+        other = await cache.session_key("analytics", "s2", 100)
+        await cache.bump_session_version("s1")
+        return before, other, await cache.session_key("analytics", "s1", 100), await cache.session_key("analytics", "s2", 100)
+
+    before, other, after, other_after = asyncio.run(scenario())
+
+    assert before == "analytics:s1:v0:100"
+    assert after == "analytics:s1:v1:100"
+    assert other_after == other
+
+
+def test_value_cached_by_one_process_is_read_by_another():
+    writer, reader = shared_caches()
+
+    async def scenario():
+        await writer.get_or_load("key", lambda: {"people": 4})
+        return await reader.get_or_load("key", lambda: pytest.fail("loaded again"))
+
+    assert asyncio.run(scenario()) == {"people": 4}
+
+
+def test_bumped_version_is_seen_by_other_processes():
+    writer, reader = shared_caches()
+
+    async def scenario():
+        before = await reader.session_key("analytics", "s1")
+        await writer.bump_session_version("s1")
+        reader.l1.clear()  # the version L1 TTL passed
+        return before, await reader.session_key("analytics", "s1"), await reader.sessions_key("sessions")
+
+    before, after, sessions = asyncio.run(scenario())
+
+    assert (before, after, sessions) == ("analytics:s1:v0", "analytics:s1:v1", "sessions:v1")
+
+
+def test_session_index_lives_as_long_as_its_longest_entry():
+    (cache,) = shared_caches(1)
+
+    async def scenario():
+        index_key = cache._session_index_key("s1")
+        await cache.set("a", 1, 60, session_id="s1")
+        await cache.set("b", 2, 10, session_id="s1")
+        expiring = await cache.client.ttl(index_key)
+        await cache.set("c", 3, None, session_id="s1")
+        return expiring, await cache.client.ttl(index_key)
+
+    expiring, completed = asyncio.run(scenario())
+
+    assert 50 < expiring <= 60
+    assert completed == -1  # no expiry
+
+
+def test_clear_session_cache_drops_keys_index_and_version():
+    (cache,) = shared_caches(1)
+
+    async def scenario():
+        await cache.bump_session_version("s1")
+        await cache.set("a", 1, None, session_id="s1")
+        await cache.set("other", 2, None, session_id="s2")
+        await cache.clear_session_cache("s1")
+        return sorted(key.decode() for key in await cache.client.keys("*"))
+
+    assert asyncio.run(scenario()) == ["cache:keys:session:s2", "cache:version:sessions", "other"]
+
+
+def test_undecodable_payload_is_a_miss_not_a_redis_failure():
+    (cache,) = shared_caches(1)
+
+    async def scenario():
+        await cache.client.set("key", b"\x01{not json")
+        value = await cache.get("key")
+        return value, await cache.client.exists("key")
+
+    assert asyncio.run(scenario()) == (None, 0)
+    assert not cache.breaker.is_open
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.database.connection import SessionLocal
+from app.database.models import ReportJob
+from app.repositories.report_job_repository import ReportJobRepository
+from app.repositories.video_session_repository import VideoSessionRepository
+from app.services.report_job_service import ReportJobQueue, report_job_dedup_key
+
+
+class FakeLLMService:
+    """LLM service whose reports name the session's people count."""
+
+    provider_name = "ollama"
+    model_identity = "FakeProvider:model"
+    template_version = "v1"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_report(self, data, limit=None):
+        self.calls += 1
+        return f"{data['total_people']} people"
+
+
+def create_job(repo: ReportJobRepository, session_id: str = "s1", report_type: str = "summary") -> ReportJob:
+    return repo.create_job(session_id, report_type, 0, report_job_dedup_key(session_id, report_type))
+
+
+def age(repo: ReportJobRepository, job_id: str, seconds: float, column: str = "created_at") -> None:
+    """Move a timestamp of the job into the past."""
+    repo.update(job_id, {column: datetime.utcnow() - timedelta(seconds=seconds)})
+
+
+def job_state(job_id: str) -> tuple:
+    db = SessionLocal()
+    job = db.get(ReportJob, job_id)
+    state = (job.status, job.result, job.error)
+    db.close()
+    return state
+
+
+def setup_session(session_id: str = "s1", total_people: int = 4) -> None:
+    db = SessionLocal()
+    repo = VideoSessionRepository(db)
+    repo.create_session(session_id, "file", "video.mp4", status="completed")
+    repo.update(session_id, {"total_people": total_people})
+    db.close()
+
+
+def test_a_job_is_claimed_once(database):
+    setup_session()
+    repo = ReportJobRepository(SessionLocal())
+    job = create_job(repo)
+
+    claimed = repo.claim_job(job.id)
+
+    assert claimed.status == "running" and claimed.claimed_by
+    assert repo.claim_job(job.id) is None
+
+
+def test_heartbeats_keep_the_lease(database):
+    setup_session()
+    repo = ReportJobRepository(SessionLocal())
+    job = create_job(repo)
+    claim = repo.claim_job(job.id).claimed_by
+    age(repo, job.id, 60, "heartbeat_at")
+
+    repo.touch_jobs([claim])
+
+    assert repo.reset_stale_jobs(lease_timeout=30) == []
+
+
+def test_stale_job_is_taken_over_and_its_old_owner_cannot_finish_it(database):
+    setup_session()
+    repo = ReportJobRepository(SessionLocal())
+    job = create_job(repo)
+    old_claim = repo.claim_job(job.id).claimed_by
+    age(repo, job.id, 60, "heartbeat_at")
+
+    assert [stale.id for stale in repo.reset_stale_jobs(lease_timeout=30)] == [job.id]
+    new_claim = repo.claim_job(job.id).claimed_by
+    assert repo.mark_finished(job.id, old_claim, result="old") is False
+    assert repo.mark_finished(job.id, new_claim, result="new") is True
+    assert job_state(job.id) == ("completed", "new", None)
+
+
+def test_only_long_pending_jobs_count_as_orphaned(database):
+    setup_session()
+    repo = ReportJobRepository(SessionLocal())
+    fresh = create_job(repo, report_type="summary")
+    old = create_job(repo, report_type="detailed")
+    age(repo, old.id, 60)
+
+    assert [job.id for job in repo.get_pending_jobs(older_than=30)] == [old.id]
+    assert {job.id for job in repo.get_pending_jobs()} == {fresh.id, old.id}
+
+
+def test_submitted_job_is_generated_and_deduplicated(database):
+    setup_session(total_people=7)
+    llm_service = FakeLLMService()
+    queue = ReportJobQueue(llm_service, workers=1)
+
+    async def scenario():
+        await queue.start()
+        db = SessionLocal()
+        job, _ = queue.submit(db, "s1", "summary")
+        _, deduplicated = queue.submit(db, "s1", "summary")
+        db.close()
+        await queue.queue.join()
+        await queue.stop()
+        return job.id, deduplicated
+
+    job_id, deduplicated = asyncio.run(scenario())
+
+    assert deduplicated is True
+    assert job_state(job_id) == ("completed", "7 people", None)
+    assert llm_service.calls == 1
+
+
+def test_pending_job_of_a_dead_process_is_picked_up(database):
+    setup_session()
+    queue = ReportJobQueue(FakeLLMService(), workers=1, lease_timeout=0.2)
+
+    async def scenario():
+        await queue.start()
+        # Queued in the memory of another process, which then died
+        repo = ReportJobRepository(SessionLocal())
+        job = create_job(repo)
+        age(repo, job.id, 1)
+        for _ in range(50):
+            if job_state(job.id)[0] == "completed":
+                break
+            await asyncio.sleep(0.02)
+        await queue.stop()
+        return job.id
+
+    assert job_state(asyncio.run(scenario())) == ("completed", "4 people", None)
+
+
+def test_job_of_an_unknown_session_fails(database):
+    setup_session()
+    repo = ReportJobRepository(SessionLocal())
+    job = create_job(repo, session_id="missing")
+    queue = ReportJobQueue(FakeLLMService())
+
+    asyncio.run(queue._run(job.id, 0.0))
+
+    status, result, error = job_state(job.id)
+    assert (status, result) == ("failed", None)
+    assert "Session not found" in error
@@ -0,0 +1,157 @@
+import asyncio
+from typing import List
+
+from app.core.redis_cache import redis_cache
+from app.database.connection import SessionLocal
+from app.database.models import Report
+from app.repositories.report_repository import ReportRepository
+from app.repositories.video_session_repository import VideoSessionRepository
+from app.services.llm_service import FallbackText, LLMProvider, LLMService, ResilientProvider, SecondaryText
+from app.services.report_service import ReportService, normalize_report_data, report_content_hash
+
+DATA = {"total_people": 4, "average_stay_time": 3.14159, "peak_hours": ["12:00"]}
+
+
+class FakeProvider(LLMProvider):
+    """Model that answers with its own name after a delay and counts its calls."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False):
+        self.name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def generate_report(self, data):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        return f"report by {self.name}"
+
+    async def generate_summary(self, text):
+        return await self.generate_report(text)
+
+    async def stream_report(self, data):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        for word in ("report", "by", self.name):
+            yield f"{word} "
+
+    async def close(self):
+        pass
+
+
+def create_sessions(*session_ids: str) -> None:
+    db = SessionLocal()
+    for session_id in session_ids:
+        VideoSessionRepository(db).create_session(session_id, "file", "video.mp4", status="completed")
+    db.close()
+
+
+def report_service(provider: LLMProvider) -> ReportService:
+    return ReportService(LLMService(provider), ReportRepository(SessionLocal()))
+
+
+def stored_reports() -> List[tuple]:
+    db = SessionLocal()
+    reports = sorted((report.session_id, report.model, report.content) for report in db.query(Report))
+    db.close()
+    return reports
+
+
+def test_normalized_data_hashes_equally():
+    reordered = {"peak_hours": ["12:00"], "average_stay_time": 3.1400001, "total_people": 4}
+
+    assert normalize_report_data(reordered) == normalize_report_data(DATA)
+    assert report_content_hash("v1", "m", normalize_report_data(reordered), "summary") == \
+        report_content_hash("v1", "m", normalize_report_data(DATA), "summary")
+    assert report_content_hash("v1", "m", DATA, "summary") != report_content_hash("v2", "m", DATA, "summary")
+    assert report_content_hash("v1", "m", DATA, "summary") != report_content_hash("v1", "m2", DATA, "summary")
+
+
+def test_sessions_with_equal_analytics_share_one_generation(database):
+    create_sessions("s1", "s2", "s3")
+    primary = FakeProvider("primary", delay=0.01)
+    generate = LLMService(primary).generate_report
+
+    async def scenario():
+        together = await asyncio.gather(
+            report_service(primary).get_or_generate("s1", "summary", DATA, generate),
+            report_service(primary).get_or_generate("s2", "summary", DATA, generate)
+        )
+        return together, await report_service(primary).get_or_generate("s3", "summary", DATA, generate)
+
+    together, later = asyncio.run(scenario())
+
+    assert together == ["report by primary"] * 2
+    assert later == "report by primary"
+    assert primary.calls == 1
+    # Every session gets its own row
+    assert [session_id for session_id, _, _ in stored_reports()] == ["s1", "s2", "s3"]
+
+
+def test_stored_report_is_reused_after_the_cache_is_gone(database):
+    create_sessions("s1", "s2")
+    primary = FakeProvider("primary")
+    generate = LLMService(primary).generate_report
+
+    asyncio.run(report_service(primary).get_or_generate("s1", "summary", DATA, generate))
+    redis_cache.l1.clear()
+    content = asyncio.run(report_service(primary).get_or_generate("s2", "summary", DATA, generate))
+
+    assert content == "report by primary"
+    assert primary.calls == 1
+
+
+def test_fallback_report_is_not_stored(database):
+    create_sessions("s1")
+    primary = FakeProvider("primary")
+
+    async def fallback(data):
+        return FallbackText("template report")
+
+    first = asyncio.run(report_service(primary).get_or_generate("s1", "summary", DATA, fallback))
+    second = asyncio.run(report_service(primary).get_or_generate("s1", "summary", DATA, LLMService(primary).generate_report))
+
+    assert (first, second) == ("template report", "report by primary")
+    assert stored_reports() == [("s1", "FakeProvider:primary-model", "report by primary")]
+
+
+def test_secondary_answer_is_stored_under_the_secondary_model_only(database):
+    create_sessions("s1", "s2")
+    primary, secondary = FakeProvider("primary", fail=True), FakeProvider("secondary")
+    llm_service = LLMService(ResilientProvider(primary, secondary, hedge_delay=1.0))
+    service = ReportService(llm_service, ReportRepository(SessionLocal()))
+
+    answered = asyncio.run(service.get_or_generate("s1", "summary", DATA, llm_service.generate_report))
+    primary.fail = False
+    regenerated = asyncio.run(service.get_or_generate("s2", "summary", DATA, llm_service.generate_report))
+
+    assert answered == "report by secondary"
+    assert not isinstance(answered, SecondaryText)
+    # The primary's content address never served the secondary's text
+    assert regenerated == "report by primary"
+    assert stored_reports() == [
+        ("s1", "FakeProvider:secondary-model", "report by secondary"),
+        ("s2", "FakeProvider:primary-model", "report by primary"),
+    ]
+
+
+def test_streamed_report_is_stored_once_complete(database):
+    create_sessions("s1", "s2")
+    primary = FakeProvider("primary")
+    llm_service = LLMService(ResilientProvider(primary))
+
+    async def stream(session_id):
+        service = ReportService(llm_service, ReportRepository(SessionLocal()))
+        return [chunk async for chunk in service.stream_report(session_id, "summary", DATA, llm_service.stream_report)]
+
+    streamed = asyncio.run(stream("s1"))
+    cached = asyncio.run(stream("s2"))
+
+    assert streamed == ["report ", "by ", "primary "]
+    assert cached == ["report by primary"]
+    assert primary.calls == 1
+    assert [row[:2] for row in stored_reports()] == [("s1", "FakeProvider:primary-model"), ("s2", "FakeProvider:primary-model")]
@@ -0,0 +1,46 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.database.schema import upgrade_tables
+from app.database.models import Base
+
+ADDED_COLUMNS = {
+    "video_sessions": ["frame_width", "frame_height", "zones_config", "timing_summary"],
+    "reports": ["content_hash", "model", "template_version"],
+    "report_jobs": ["heartbeat_at", "claimed_by"],
+}
+
+
+def old_database(path):
+    """Current schema without the columns added since the tables were first created, with a row in it."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_reports_content_hash"))
+        for table, columns in ADDED_COLUMNS.items():
+            for column in columns:
+                connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        connection.execute(text(
+            "INSERT INTO video_sessions (id, source_type, source_path, status, start_time) "
+            "VALUES ('s1', 'file', 'video.mp4', 'completed', '2024-01-01 00:00:00')"
+        ))
+    return engine
+
+
+def test_upgrade_adds_missing_columns_and_keeps_rows(tmp_path):
+    engine = old_database(tmp_path / "old.db")
+
+    assert upgrade_tables(engine) == sum(len(columns) for columns in ADDED_COLUMNS.values())
+
+    inspector = inspect(engine)
+    for table, columns in ADDED_COLUMNS.items():
+        assert set(columns) <= {column["name"] for column in inspector.get_columns(table)}
+    assert "ix_reports_content_hash" in {index["name"] for index in inspector.get_indexes("reports")}
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id, frame_width FROM video_sessions")).all() == [("s1", None)]
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = old_database(tmp_path / "old.db")
+    upgrade_tables(engine)
+
+    assert upgrade_tables(engine) == 0
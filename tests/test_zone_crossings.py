@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.schemas import BoundingBox, Detection, LineDefinition, VideoAnalysisRequest, ZoneDefinition
+from app.services.tracking_service import TrackingService
+from app.services.zone_service import ZoneCounter
+
+LINE = LineDefinition(name="door", start=(320, 0), end=(320, 480))
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def person(center_x: float) -> Detection:
+    return Detection(
+        class_id=0,
+        class_name="person",
+        confidence=0.9,
+        bbox=BoundingBox(x1=center_x - 20, y1=200, x2=center_x + 20, y2=300)
+    )
+
+
+def walk(frames):
+    """Run the default tracker and a zone counter over frames of detections; returns (in, out) of the line."""
+    tracking_service = TrackingService.create_simple_tracker()
+    counter = ZoneCounter([], [LINE])
+    counter.set_frame_size(640, 480)
+    totals = [0, 0]
+    for frame_index, detections in enumerate(frames):
+        timestamp = START + timedelta(seconds=frame_index / 30)
+        crossings = counter.process(tracking_service.track_objects(detections, timestamp), timestamp)["crossings"]
+        in_count, out_count = crossings["door"]
+        totals[0] += in_count
+        totals[1] += out_count
+    return totals
+
+
+def test_person_walking_across_line_is_counted_once():
+    frames = [[person(270 + 10 * step)] for step in range(11)]
+
+    assert sum(walk(frames)) == 1
+
+
+def test_walking_back_counts_the_other_direction():
+    forward = walk([[person(270 + 10 * step)] for step in range(11)])
+    backward = walk([[person(370 - 10 * step)] for step in range(11)])
+
+    assert forward[::-1] == backward
+
+
+def test_crossing_during_missed_detections_is_counted():
+    frames = [[person(270 + 10 * step)] for step in range(11)]
+    frames[4] = frames[5] = frames[6] = []  # detector misses the person right at the line
+
+    assert sum(walk(frames)) == 1
+
+
+def test_duplicate_zone_names_are_rejected():
+    zone = ZoneDefinition(name="entrance", polygon=[(0, 0), (10, 0), (10, 10)])
+
+    with pytest.raises(ValidationError, match="Duplicate names: entrance"):
+        VideoAnalysisRequest(source_type="file", source_path="video.mp4", zones=[zone, zone])